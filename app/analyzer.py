@@ -1,41 +1,177 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict
+from bisect import bisect_left
+
+from .batch import TransactionBatch, TransactionView
+
+class TransactionDateIndex:
+    """
+    Transakcje posortowane raz po dacie - zapytania o zakres dat przez wyszukiwanie binarne
+    """
+    
+    def __init__(self, transactions: List[Dict[str, Any]]):
+        # Sortowanie stabilne - transakcje z tą samą datą zachowują kolejność z pliku
+        self.days: Optional[List[int]] = None
+        
+        if isinstance(transactions, TransactionBatch):
+            # Paczka: wyszukiwanie po numerach dni, transakcje jako widok posortowanych wierszy
+            order = sorted(range(len(transactions)), key=transactions.days.__getitem__)
+            self.transactions = TransactionView(transactions, order)
+            self.days = list(map(transactions.days.__getitem__, order))
+            return
+        
+        self.transactions = sorted(transactions, key=lambda transaction: transaction['date'])
+        self.dates = [transaction['date'] for transaction in self.transactions]
+    
+    def between(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Zwraca transakcje z zakresu [start, end) w kolejności dat
+        """
+        if self.days is not None:
+            return self.transactions[bisect_left(self.days, self._first_day(start)):bisect_left(self.days, self._first_day(end))]
+        return self.transactions[bisect_left(self.dates, start):bisect_left(self.dates, end)]
+    
+    def __len__(self) -> int:
+        return len(self.transactions)
+    
+    def _first_day(self, value: datetime) -> int:
+        """
+        Numer pierwszego dnia, którego północ nie jest wcześniejsza niż value
+        """
+        day = value.toordinal()
+        return day if value == datetime.fromordinal(day) else day + 1
 
 class ExpenseAnalyzer:
     """
     Klasa odpowiedzialna za analizę wydatków i porównania tygodniowe
     """
     
-    def __init__(self):
+    # Od tej liczby transakcji analiza korzysta z tablic NumPy/pandas
+    COLUMNAR_THRESHOLD = 1000
+    
+    def __init__(self, columnar_threshold: Optional[int] = COLUMNAR_THRESHOLD):
         self.categories = [
             'jedzenie', 'chemia', 'paliwo', 'transport', 'rozrywka',
             'rachunki', 'zdrowie', 'ubrania', 'nieprzypisane', 'inne'
         ]
+        
+        # None wyłącza ścieżkę kolumnową
+        self.columnar_threshold = columnar_threshold
     
     def analyze_expenses(self, transactions: List[Dict[str, Any]], week_start_date: Optional[str] = None) -> Dict[str, Any]:
         """
         Analizuje wydatki z transakcji i tworzy raport tygodniowy
         
+        Dla paczki od columnar_threshold transakcji tydzień jest wybierany
+        maską logiczną, a sumy kategorii liczone na tablicach NumPy/pandas -
+        z wynikiem identycznym jak w pętli po transakcjach.
+        
         Args:
-            transactions: Lista transakcji z kategoriami
+            transactions: Lista transakcji z kategoriami albo TransactionBatch
             week_start_date: Data rozpoczęcia tygodnia (opcjonalna)
             
         Returns:
             Słownik z wynikami analizy
         """
+        # Duże pliki analizujemy na tablicach zamiast pętli po transakcjach
+        columns = self.build_columns(transactions) if self._use_columnar(transactions) else None
+        
         # Określ datę rozpoczęcia tygodnia
         if week_start_date:
             week_start = datetime.strptime(week_start_date, '%Y-%m-%d')
+        elif columns is not None:
+            week_start = self._week_start_for(datetime.fromordinal(int(columns['days'].min())))
         else:
             week_start = self._get_week_start(transactions)
         
-        # Filtruj transakcje z danego tygodnia
-        week_transactions = self._filter_week_transactions(transactions, week_start)
+        if columns is not None:
+            week_transactions, category_totals = self._analyze_week_columnar(transactions, columns, week_start)
+        else:
+            # Filtruj transakcje z danego tygodnia
+            week_transactions = self._filter_week_transactions(transactions, week_start)
+            
+            # Analizuj wydatki według kategorii
+            category_totals = self._calculate_category_totals(week_transactions)
         
-        # Analizuj wydatki według kategorii
-        category_totals = self._calculate_category_totals(week_transactions)
+        return self._build_week_report(week_start, week_transactions, category_totals, datetime.now())
+    
+    def analyze_all_weeks(self, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Analizuje wszystkie tygodnie z pliku w jednym przebiegu
         
+        Transakcje są rozdzielane na tygodnie (poniedziałek-niedziela) w jednym
+        przejściu po liście, a raport każdego tygodnia jest taki sam jak wynik
+        analyze_expenses dla tego tygodnia. Tygodnie bez transakcji pomiędzy
+        pierwszym a ostatnim też dostają raport, żeby porównania dotyczyły
+        sąsiednich tygodni.
+        
+        Args:
+            transactions: Lista transakcji z kategoriami albo TransactionBatch
+            
+        Returns:
+            Słownik z raportami tygodni ('weeks'), porównaniami z poprzednim
+            tygodniem ('comparisons') i indeksem dat ('index') do zapytań o zakres
+        """
+        analysis_date = datetime.now()
+        
+        # Podział na tygodnie - klucz to numer dnia poniedziałku danego tygodnia
+        buckets = defaultdict(list)
+        weekly_totals = None
+        is_batch = isinstance(transactions, TransactionBatch)
+        columns = self.build_columns(transactions) if self._use_columnar(transactions) else None
+        if columns is not None:
+            # Duże pliki dzielimy i sumujemy na tablicach zamiast pętli po wierszach
+            buckets, weekly_totals = self._split_weeks_columnar(columns)
+        elif is_batch:
+            # Numery wierszy według numerów dni z kolumny paczki - dzień 1 (1 stycznia roku 1) to poniedziałek
+            for index, day in enumerate(transactions.days):
+                buckets[day - (day + 6) % 7].append(index)
+        else:
+            for transaction in transactions:
+                date = transaction['date']
+                buckets[date.toordinal() - date.weekday()].append(transaction)
+        
+        weeks = []
+        comparisons = []
+        
+        if buckets:
+            first_monday = min(buckets)
+            last_monday = max(buckets)
+            
+            for monday in range(first_monday, last_monday + 1, 7):
+                week_start = datetime.fromordinal(monday)
+                week_transactions = buckets.get(monday, [])
+                if weekly_totals is not None:
+                    category_totals = weekly_totals.get(monday, {})
+                    week_transactions = TransactionView(transactions, week_transactions)
+                elif is_batch:
+                    category_totals = self._calculate_batch_category_totals(transactions, week_transactions)
+                    week_transactions = TransactionView(transactions, week_transactions)
+                else:
+                    category_totals = self._calculate_category_totals(week_transactions)
+                
+                report = self._build_week_report(week_start, week_transactions, category_totals, analysis_date)
+                
+                if weeks:
+                    comparison = self.compare_with_previous_week(report, weeks[-1])
+                    comparison['week_start'] = report['week_start']
+                    comparison['previous_week_start'] = weeks[-1]['week_start']
+                    comparisons.append(comparison)
+                
+                weeks.append(report)
+        
+        return {
+            'weeks': weeks,
+            'comparisons': comparisons,
+            'index': TransactionDateIndex(transactions)
+        }
+    
+    def _build_week_report(self, week_start: datetime, week_transactions: List[Dict[str, Any]],
+                           category_totals: Dict[str, float], analysis_date: datetime) -> Dict[str, Any]:
+        """
+        Buduje raport tygodniowy z przefiltrowanych transakcji i sum kategorii
+        """
         # Oblicz statystyki
         total_expenses = sum(category_totals.values())
         avg_daily_expense = total_expenses / 7 if week_transactions else 0
@@ -44,12 +180,13 @@ class ExpenseAnalyzer:
         analysis_result = {
             'week_start': week_start.strftime('%Y-%m-%d'),
             'week_end': (week_start + timedelta(days=6)).strftime('%Y-%m-%d'),
+            'iso_week': '%d-W%02d' % week_start.isocalendar()[:2],
             'total_expenses': total_expenses,
             'avg_daily_expense': avg_daily_expense,
             'category_totals': category_totals,
             'transaction_count': len(week_transactions),
             'transactions': week_transactions,
-            'analysis_date': datetime.now().isoformat()
+            'analysis_date': analysis_date.isoformat()
         }
         
         return analysis_result
@@ -97,9 +234,14 @@ class ExpenseAnalyzer:
         # Znajdź najwcześniejszą datę
         earliest_date = min(transaction['date'] for transaction in transactions)
         
-        # Oblicz początek tygodnia (poniedziałek)
-        days_since_monday = earliest_date.weekday()
-        week_start = earliest_date - timedelta(days=days_since_monday)
+        return self._week_start_for(earliest_date)
+    
+    def _week_start_for(self, date: datetime) -> datetime:
+        """
+        Zwraca początek tygodnia (poniedziałek, północ) dla podanej daty
+        """
+        days_since_monday = date.weekday()
+        week_start = date - timedelta(days=days_since_monday)
         
         return week_start.replace(hour=0, minute=0, second=0, microsecond=0)
     
@@ -127,6 +269,135 @@ class ExpenseAnalyzer:
         
         return dict(category_totals)
     
+    def _calculate_batch_category_totals(self, batch: TransactionBatch, indices: List[int]) -> Dict[str, float]:
+        """
+        Oblicza sumy wydatków według kategorii dla wierszy paczki - w tej samej
+        kolejności co _calculate_category_totals, więc z identycznym wynikiem
+        """
+        category_totals = defaultdict(float)
+        amounts, categories = batch.amounts, batch.categories
+        
+        for index in indices:
+            amount = amounts[index]
+            if amount < 0:  # Tylko wydatki (ujemne kwoty)
+                category_totals[categories[index]] += abs(amount)
+        
+        return dict(category_totals)
+    
+    def build_columns(self, batch: TransactionBatch) -> Optional[Dict[str, Any]]:
+        """
+        Udostępnia dni, kwoty i kategorie paczki jako tablice NumPy
+        
+        Returns:
+            Słownik z tablicami 'days' (numer dnia, datetime.toordinal),
+            'amounts' i 'categories' lub None, gdy NumPy nie jest dostępny
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        
+        # Kolumny paczki są już tablicami - bez kopiowania dni i kwot (paczki nie
+        # można powiększać, dopóki istnieją te widoki)
+        return {
+            'days': np.frombuffer(batch.days, dtype=np.int64),
+            'amounts': np.frombuffer(batch.amounts, dtype=np.float64),
+            'categories': np.array(batch.categories, dtype=object)
+        }
+    
+    def _use_columnar(self, transactions: List[Dict[str, Any]]) -> bool:
+        """
+        Sprawdza czy dla danej liczby transakcji opłaca się ścieżka kolumnowa
+        
+        Tylko paczka ma kolumny gotowe do użycia jako tablice - przepisanie
+        listy słowników do tablic kosztuje więcej niż analiza w pętli.
+        """
+        return (
+            isinstance(transactions, TransactionBatch)
+            and self.columnar_threshold is not None
+            and len(transactions) > 0
+            and len(transactions) >= self.columnar_threshold
+        )
+    
+    def _analyze_week_columnar(self, batch: TransactionBatch, columns: Dict[str, Any], week_start: datetime):
+        """
+        Filtruje tydzień maską logiczną i sumuje wydatki według kategorii na tablicach
+        
+        Returns:
+            Krotka (transakcje z tygodnia, sumy według kategorii) - identyczna
+            z wynikiem _filter_week_transactions i _calculate_category_totals
+        """
+        import numpy as np
+        
+        # Tydzień zaczyna się o północy, więc porównanie numerów dni jest dokładne
+        days = columns['days']
+        first_day = week_start.toordinal()
+        indices = np.flatnonzero((days >= first_day) & (days < first_day + 7))
+        
+        category_totals = self._group_category_totals(
+            np.zeros(len(indices), dtype=np.int64), columns['amounts'][indices], columns['categories'][indices], 1
+        )[0]
+        
+        return TransactionView(batch, indices.tolist()), category_totals
+    
+    def _split_weeks_columnar(self, columns: Dict[str, Any]):
+        """
+        Dzieli wiersze na tygodnie i sumuje wydatki według kategorii na tablicach
+        
+        Returns:
+            Krotka (numery wierszy według poniedziałku tygodnia, sumy kategorii
+            według poniedziałku tygodnia) - identyczna z podziałem w pętli
+            i wynikiem _calculate_batch_category_totals
+        """
+        import numpy as np
+        
+        days = columns['days']
+        
+        # Dzień 1 (1 stycznia roku 1) to poniedziałek
+        mondays, week_ids = np.unique(days - (days + 6) % 7, return_inverse=True)
+        mondays = mondays.tolist()
+        
+        # Sortowanie stabilne - wiersze tygodnia zachowują kolejność z pliku
+        order = np.argsort(week_ids, kind='stable')
+        groups = np.split(order, np.cumsum(np.bincount(week_ids))[:-1])
+        buckets = {monday: group.tolist() for monday, group in zip(mondays, groups)}
+        
+        weekly_totals = self._group_category_totals(week_ids, columns['amounts'], columns['categories'], len(mondays))
+        
+        return buckets, dict(zip(mondays, weekly_totals))
+    
+    def _group_category_totals(self, group_ids, amounts, categories, group_count: int) -> List[Dict[str, float]]:
+        """
+        Sumuje wydatki według kategorii osobno w każdej grupie wierszy (np. tygodniu)
+        
+        Returns:
+            Sumy kategorii kolejnych grup - kategorie w kolejności pierwszego
+            wydatku w grupie, tak jak w słowniku z _calculate_category_totals
+        """
+        import numpy as np
+        import pandas as pd
+        
+        # Tylko wydatki (ujemne kwoty) - klucz łączy grupę i kod kategorii
+        codes, uniques = pd.factorize(categories, use_na_sentinel=False)
+        expenses = np.flatnonzero(amounts < 0)
+        keys = group_ids[expenses] * len(uniques) + codes[expenses]
+        
+        # bincount sumuje po kolei tak jak pętla - groupby().sum() w pandas sumuje
+        # z kompensacją i mógłby różnić się od ścieżki słownikowej na ostatnich bitach
+        sums = np.bincount(keys, weights=np.abs(amounts[expenses])).tolist()
+        
+        # factorize zamienia None na NaN - bierzemy oryginalne wartości kategorii
+        _, code_first = np.unique(codes, return_index=True)
+        names = [categories[index] for index in code_first.tolist()]
+        
+        totals: List[Dict[str, float]] = [{} for _ in range(group_count)]
+        present, key_first = np.unique(keys, return_index=True)
+        for key in present[np.argsort(key_first, kind='stable')].tolist():
+            group, code = divmod(key, len(uniques))
+            totals[group][names[code]] = sums[key]
+        
+        return totals
+    
     def _calculate_percentage_change(self, current: float, previous: float) -> float:
         """
         Oblicza procentową zmianę
@@ -0,0 +1,142 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from . import storage
+from .analyzer import ExpenseAnalyzer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+def _default(value: Any) -> Any:
+    """
+    Serializacja typów, których nie obsługuje moduł json
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Nie można zserializować obiektu typu {type(value).__name__}")
+
+def dumps(data: Any) -> bytes:
+    """
+    Serializuje dane do JSON (orjson, jeśli jest zainstalowany)
+
+    Daty są zapisywane w formacie ISO 8601 tak samo w obu wariantach.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class FastJSONResponse(Response):
+    """
+    Odpowiedź JSON serializowana przez dumps()
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def analysis_etag(analysis_id: int, analysis_date: str, revision: int) -> str:
+    """
+    Silny ETag analizy: ID, data analizy i rewizja zmieniana przy zmianie kategorii transakcji
+    """
+    stamp = datetime.fromisoformat(analysis_date).strftime('%Y%m%d%H%M%S%f')
+    return f'"analysis-{analysis_id}-{stamp}-{revision}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """
+    Sprawdza nagłówek If-None-Match (porównanie słabe, zgodnie z RFC 9110)
+    """
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+
+    candidates = {candidate.strip() for candidate in header.split(',')}
+    candidates = {candidate[2:] if candidate.startswith('W/') else candidate for candidate in candidates}
+    return etag in candidates
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def _json(content: Any, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+@router.get("/analyses")
+def list_analyses(request: Request, limit: int = 10):
+    """
+    Historia analiz (bez transakcji)
+    """
+    history = storage.get_analysis_history(limit)
+
+    # ETag listy zależy od analiz na liście i ich kolejności
+    etag = '"analyses-%d-%s"' % (limit, '.'.join(
+        analysis_etag(analysis['id'], analysis['analysis_date'], analysis['revision']).strip('"') for analysis in history
+    ))
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    return _json(history, etag)
+
+@router.get("/analyses/{analysis_id}")
+def get_analysis(request: Request, analysis_id: int):
+    """
+    Analiza z transakcjami
+
+    Aktualny ETag z If-None-Match daje odpowiedź 304 po odczycie samej daty
+    i rewizji analizy - bez wczytywania transakcji. Rewizja jest w bazie,
+    więc zmiana kategorii w dowolnym procesie od razu zmienia ETag.
+    """
+    version = storage.get_analysis_version(analysis_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono analizy")
+
+    etag = analysis_etag(analysis_id, version['analysis_date'], version['revision'])
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    analysis = storage.get_analysis_by_id(analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono analizy")
+
+    # ETag wczytanej treści - rewizja mogła się zmienić po pierwszym odczycie
+    etag = analysis_etag(analysis['id'], analysis['analysis_date'], analysis['revision'])
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    return _json(analysis, etag)
+
+@router.get("/analyses/{analysis_id}/comparison")
+def compare_analysis(request: Request, analysis_id: int):
+    """
+    Porównanie analizy z najnowszą analizą poprzedniego tygodnia
+    """
+    current = storage.get_analysis_summary(analysis_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono analizy")
+
+    previous = storage.get_previous_week_summary(current['week_start'])
+
+    # Porównanie zmienia się, gdy pojawi się nowsza analiza poprzedniego tygodnia
+    etag = analysis_etag(current['id'], current['analysis_date'], current['revision'])
+    if previous is not None:
+        etag = etag[:-1] + '-' + analysis_etag(previous['id'], previous['analysis_date'], previous['revision'])[1:]
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    comparison: Optional[Dict[str, Any]] = None
+    if previous is not None:
+        comparison = ExpenseAnalyzer().compare_with_previous_week(current, previous)
+
+    return _json({
+        'analysis': current,
+        'previous_analysis': previous,
+        'comparison': comparison
+    }, etag)
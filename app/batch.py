@@ -0,0 +1,294 @@
+import math
+import sys
+from array import array
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+class TransactionRow:
+    """
+    Lekki widok jednej transakcji z TransactionBatch
+
+    Zachowuje się jak słownik transakcji z analyzer.py (transaction['date'],
+    transaction.get('balance'), zapis 'category' i 'is_manual'), ale nie
+    przechowuje danych - odczytuje je z kolumn paczki.
+    """
+
+    __slots__ = ('batch', 'index')
+
+    FIELDS = ('date', 'description', 'amount', 'balance', 'category', 'is_manual')
+    WRITABLE_FIELDS = ('category', 'is_manual')
+
+    def __init__(self, batch: 'TransactionBatch', index: int):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def date(self) -> datetime:
+        return self.batch.date(self.index)
+
+    @property
+    def description(self) -> str:
+        return self.batch.descriptions[self.index]
+
+    @property
+    def amount(self) -> float:
+        return self.batch.amounts[self.index]
+
+    @property
+    def balance(self) -> Optional[float]:
+        return self.batch.balance(self.index)
+
+    @property
+    def category(self) -> Optional[str]:
+        return self.batch.categories[self.index]
+
+    @category.setter
+    def category(self, value: Optional[str]):
+        self.batch.categories[self.index] = value
+
+    @property
+    def is_manual(self) -> bool:
+        return bool(self.batch.manual[self.index])
+
+    @is_manual.setter
+    def is_manual(self, value: bool):
+        self.batch.manual[self.index] = bool(value)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            getter = _FIELD_GETTERS[key]
+        except KeyError:
+            raise KeyError(key) from None
+        return getter(self.batch, self.index)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.WRITABLE_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, TransactionRow):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TransactionRow({self.to_dict()!r})"
+
+class TransactionView:
+    """
+    Wybrane wiersze paczki (np. transakcje jednego tygodnia) jako sekwencja
+
+    Widoki TransactionRow powstają dopiero przy odczycie, więc podział
+    paczki na tygodnie nie tworzy obiektu na każdą transakcję.
+    """
+
+    __slots__ = ('batch', 'indices')
+
+    def __init__(self, batch: 'TransactionBatch', indices: List[int]):
+        self.batch = batch
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TransactionRow, 'TransactionView']:
+        if isinstance(index, slice):
+            return TransactionView(self.batch, self.indices[index])
+        return TransactionRow(self.batch, self.indices[index])
+
+    def __iter__(self) -> Iterator[TransactionRow]:
+        batch = self.batch
+        for index in self.indices:
+            yield TransactionRow(batch, index)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (TransactionView, list)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TransactionView({len(self)} transakcji)"
+
+class TransactionBatch:
+    """
+    Transakcje pliku zapisane kolumnami zamiast słownika na wiersz
+
+    Daty są numerami dni (date.toordinal), kwoty i salda tablicami liczb
+    (brak salda to NaN), a opisy i kategorie napisami współdzielonymi przez
+    sys.intern - powtarzające się opisy (ten sam sklep) zajmują pamięć raz.
+    Paczkę przyjmuje każdy etap przetwarzania: parsery ją budują,
+    kategoryzator wpisuje kategorie do kolumny, a analizator i zapis do bazy
+    czytają transakcje przez widoki TransactionRow.
+    """
+
+    def __init__(self):
+        self.days = array('q')
+        self.amounts = array('d')
+        self.balances = array('d')
+        self.descriptions: List[str] = []
+        self.categories: List[Optional[str]] = []
+        self.manual = bytearray()
+        # Numer dnia -> datetime, żeby transakcje z tego samego dnia dzieliły obiekt daty
+        self._dates: Dict[int, datetime] = {}
+
+    @classmethod
+    def from_dicts(cls, transactions: Iterable[Dict[str, Any]]) -> 'TransactionBatch':
+        """
+        Buduje paczkę ze słowników transakcji w formacie analyzer.py
+        """
+        batch = cls()
+        for transaction in transactions:
+            batch.append(transaction['date'].toordinal(), transaction['description'], transaction['amount'],
+                         transaction.get('balance'), transaction.get('category'), transaction.get('is_manual', False))
+        return batch
+
+    def append(self, day: int, description: str, amount: float, balance: Optional[float] = None,
+               category: Optional[str] = None, is_manual: bool = False):
+        """
+        Dodaje transakcję
+
+        Args:
+            day: Numer dnia (date.toordinal)
+            description: Opis transakcji
+            amount: Kwota
+            balance: Saldo (None - brak salda)
+            category: Kategoria
+            is_manual: Czy kategoria została przypisana ręcznie
+        """
+        self.days.append(day)
+        self.amounts.append(amount)
+        self.balances.append(math.nan if balance is None else balance)
+        self.descriptions.append(sys.intern(description))
+        self.categories.append(category)
+        self.manual.append(bool(is_manual))
+
+    def extend(self, other: 'TransactionBatch'):
+        """
+        Dopisuje transakcje innej paczki (np. kawałka parsowanego w innym procesie)
+        """
+        self.days.extend(other.days)
+        self.amounts.extend(other.amounts)
+        self.balances.extend(other.balances)
+        # Napisy z innego procesu trzeba ponownie współdzielić w tym procesie
+        self.descriptions.extend(sys.intern(description) for description in other.descriptions)
+        self.categories.extend(other.categories)
+        self.manual.extend(other.manual)
+
+    def fill_missing_balances(self, value: float = 0.0):
+        """
+        Zastępuje brakujące salda podaną wartością
+        """
+        for index, balance in enumerate(self.balances):
+            if balance != balance:
+                self.balances[index] = value
+
+    def date(self, index: int) -> datetime:
+        day = self.days[index]
+        value = self._dates.get(day)
+        if value is None:
+            value = self._dates[day] = datetime.fromordinal(day)
+        return value
+
+    def balance(self, index: int) -> Optional[float]:
+        balance = self.balances[index]
+        return None if balance != balance else balance
+
+    def to_columns(self) -> Dict[str, list]:
+        """
+        Zwraca kolumny paczki jako listy do zapisu w JSON (brak salda to None)
+        """
+        return {
+            'days': self.days.tolist(),
+            'amounts': self.amounts.tolist(),
+            'balances': [None if balance != balance else balance for balance in self.balances],
+            'descriptions': self.descriptions,
+            'categories': self.categories,
+            'manual': list(self.manual),
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list]) -> 'TransactionBatch':
+        """
+        Odtwarza paczkę z kolumn zwróconych przez to_columns
+        """
+        batch = cls()
+        batch.days = array('q', columns['days'])
+        batch.amounts = array('d', columns['amounts'])
+        batch.balances = array('d', (math.nan if balance is None else balance for balance in columns['balances']))
+        batch.descriptions = [sys.intern(description) for description in columns['descriptions']]
+        batch.categories = list(columns['categories'])
+        batch.manual = bytearray(columns['manual'])
+        return batch
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Zwraca transakcje jako słowniki w formacie analyzer.py
+        """
+        return [row.to_dict() for row in self]
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, index: int) -> TransactionRow:
+        if index < 0:
+            index += len(self.days)
+        if not 0 <= index < len(self.days):
+            raise IndexError("Indeks transakcji poza paczką")
+        return TransactionRow(self, index)
+
+    def __iter__(self) -> Iterator[TransactionRow]:
+        for index in range(len(self.days)):
+            yield TransactionRow(self, index)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TransactionBatch):
+            return NotImplemented
+        # Porównanie przez widoki - NaN (brak salda) jest równy NaN
+        return len(self) == len(other) and self.to_dicts() == other.to_dicts()
+
+    __hash__ = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Obiekty dat są odtwarzane przy odczycie - nie trzeba ich serializować
+        state = self.__dict__.copy()
+        state['_dates'] = {}
+        return state
+
+    def __repr__(self) -> str:
+        return f"TransactionBatch({len(self)} transakcji)"
+
+# Odczyt pól bez przechodzenia przez właściwości TransactionRow (transaction['amount'] w pętlach)
+_FIELD_GETTERS = {
+    'date': TransactionBatch.date,
+    'description': lambda batch, index: batch.descriptions[index],
+    'amount': lambda batch, index: batch.amounts[index],
+    'balance': TransactionBatch.balance,
+    'category': lambda batch, index: batch.categories[index],
+    'is_manual': lambda batch, index: bool(batch.manual[index]),
+}
+
+def day_number(value: Union[str, date]) -> int:
+    """
+    Zamienia datę (lub napis YYYY-MM-DD zwracany przez parse_date) na numer dnia
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
@@ -1,5 +1,12 @@
-import re
-from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from .batch import TransactionBatch, TransactionRow
+from .matcher import RuleMatcher
+from .metrics import CATEGORIZED_TRANSACTIONS, CATEGORIZER_CACHE_LOOKUPS
 
 class TransactionCategorizer:
     """
@@ -7,7 +14,10 @@ class TransactionCategorizer:
     z obsługą uczenia się na podstawie ręcznych przypisań
     """
     
-    def __init__(self, manual_categories: Optional[List[Dict[str, Any]]] = None):
+    # Domyślna liczba opisów zapamiętanych w pamięci podręcznej
+    DEFAULT_CACHE_SIZE = 10000
+    
+    def __init__(self, manual_categories: Optional[List[Dict[str, Any]]] = None, cache_size: int = DEFAULT_CACHE_SIZE):
         # Słownik z wzorcami dla różnych kategorii
         self.category_patterns = {
             'jedzenie': [
@@ -46,22 +56,65 @@ class TransactionCategorizer:
         
         # Ręczne kategorie z bazy danych
         self.manual_categories = manual_categories or []
+        
+        # Skompilowany zestaw reguł - budowany przy pierwszym użyciu po zmianie reguł
+        self._matcher: Optional[RuleMatcher] = None
+        
+        # Pamięć podręczna LRU: opis (małe litery) -> (kategoria, źródło reguły).
+        # Czyszczona przy każdej zmianie reguł (rules_version). Kategoryzator
+        # z ManualRulesCache.get_categorizer zachowuje ją między plikami.
+        self.cache_size = cache_size
+        self.rules_version = 0
+        self._cache: 'OrderedDict[str, Tuple[str, str]]' = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._fingerprint: Optional[str] = None
+        
+        # Kategoryzator z ManualRulesCache jest współdzielony przez wątki obsługi
+        # żądań i zadań importu - pamięć podręczną zmienia jeden wątek naraz
+        self._lock = threading.RLock()
     
     def categorize_transactions(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Przypisuje kategorie do listy transakcji
         
         Args:
-            transactions: Lista transakcji do kategoryzacji
+            transactions: Lista transakcji do kategoryzacji albo TransactionBatch
+                (kategorie trafiają wtedy do kolumny paczki)
             
         Returns:
-            Lista transakcji z przypisanymi kategoriami
+            Lista transakcji z przypisanymi kategoriami (dla paczki - ta sama paczka)
+        """
+        # Metryki zapisywane raz na wywołanie, a nie dla każdej transakcji
+        counts: Counter = Counter()
+        
+        with self._lock:
+            hits_before, misses_before = self._cache_hits, self._cache_misses
+            
+            if isinstance(transactions, TransactionBatch):
+                categorized_transactions, unassigned_transactions = self._categorize_batch(transactions, counts)
+            else:
+                categorized_transactions, unassigned_transactions = self._categorize_list(transactions, counts)
+            
+            hits, misses = self._cache_hits - hits_before, self._cache_misses - misses_before
+        
+        for (category, source), count in counts.items():
+            CATEGORIZED_TRANSACTIONS.inc(count, category=category, source=source)
+        CATEGORIZER_CACHE_LOOKUPS.inc(hits, result='hit')
+        CATEGORIZER_CACHE_LOOKUPS.inc(misses, result='miss')
+        
+        return categorized_transactions, unassigned_transactions
+    
+    def _categorize_list(self, transactions: List[Dict[str, Any]], counts: Counter):
+        """
+        Przypisuje kategorie słownikom transakcji
         """
         categorized_transactions = []
         unassigned_transactions = []
         
         for transaction in transactions:
-            category = self._categorize_single_transaction(transaction)
+            category, source = self._categorize_with_source(transaction)
+            counts[category, source] += 1
             
             if category == 'nieprzypisane':
                 # Dodaj do listy nieprzypisanych transakcji
@@ -77,6 +130,23 @@ class TransactionCategorizer:
         
         return categorized_transactions, unassigned_transactions
     
+    def _categorize_batch(self, batch: TransactionBatch, counts: Counter):
+        """
+        Wpisuje kategorie do kolumny paczki - bez słownika i widoku na każdą transakcję
+        """
+        unassigned_transactions: List[TransactionRow] = []
+        categories = batch.categories
+        
+        for index, description in enumerate(batch.descriptions):
+            category, source = self._categorize_description(description)
+            counts[category, source] += 1
+            categories[index] = category
+            if category == 'nieprzypisane':
+                unassigned_transactions.append(TransactionRow(batch, index))
+        
+        batch.manual[:] = bytes(len(batch))
+        return batch, unassigned_transactions
+    
     def _categorize_single_transaction(self, transaction: Dict[str, Any]) -> str:
         """
         Przypisuje kategorię do pojedynczej transakcji
@@ -87,21 +157,76 @@ class TransactionCategorizer:
         Returns:
             Nazwa kategorii lub 'nieprzypisane' jeśli nie znaleziono dopasowania
         """
-        description = transaction['description'].lower()
+        return self._categorize_with_source(transaction)[0]
+    
+    def _categorize_with_source(self, transaction: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Przypisuje kategorię i zwraca ją razem ze źródłem reguły
+        
+        Returns:
+            Krotka (kategoria, źródło): 'manual' dla ręcznych reguł, 'builtin'
+            dla standardowych wzorców i 'none', gdy nic nie pasuje
+        """
+        return self._categorize_description(transaction['description'])
+    
+    def _categorize_description(self, description: str) -> Tuple[str, str]:
+        """
+        Przypisuje kategorię i źródło reguły na podstawie opisu transakcji
+        """
+        description = description.lower()
+        
+        # Powtarzające się opisy (ten sam sklep) biorą kategorię z pamięci podręcznej
+        cached = self._cache.get(description)
+        if cached is not None:
+            self._cache.move_to_end(description)
+            self._cache_hits += 1
+            return cached
         
-        # Najpierw sprawdź ręczne kategorie (mają priorytet)
-        for manual_rule in self.manual_categories:
-            if re.search(manual_rule['fraza'], description, re.IGNORECASE):
-                return manual_rule['kategoria']
+        self._cache_misses += 1
         
-        # Następnie sprawdź standardowe wzorce
-        for category, patterns in self.category_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, description, re.IGNORECASE):
-                    return category
+        # Wszystkie reguły sprawdzane są w jednym przebiegu po opisie
+        matcher = self._get_matcher()
+        priority = matcher.match_priority(description)
         
         # Jeśli nie znaleziono dopasowania, zwróć 'nieprzypisane'
-        return 'nieprzypisane'
+        if priority is None:
+            result = ('nieprzypisane', 'none')
+        else:
+            # Ręczne reguły są na początku listy reguł
+            source = 'manual' if priority < len(self.manual_categories) else 'builtin'
+            result = (matcher.categories[priority], source)
+        
+        if self.cache_size > 0:
+            self._cache[description] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
+        return result
+    
+    def _get_matcher(self) -> RuleMatcher:
+        """
+        Zwraca skompilowany zestaw reguł, budując go po zmianie reguł
+        
+        Kolejność reguł odpowiada priorytetowi: najpierw ręczne kategorie,
+        następnie standardowe wzorce w kolejności kategorii. Ręczne reguły
+        z bazy mają typ dopasowania ('typ_dopasowania'), a reguły bez typu
+        i standardowe wzorce są dopasowywane według zawartości wzorca.
+        """
+        if self._matcher is None:
+            rules = [(rule['fraza'], rule['kategoria'], rule.get('typ_dopasowania')) for rule in self.manual_categories]
+            for category, patterns in self.category_patterns.items():
+                rules.extend((pattern, category) for pattern in patterns)
+            
+            self._matcher = RuleMatcher(rules)
+        
+        return self._matcher
+    
+    def compile_rules(self):
+        """
+        Kompiluje reguły z wyprzedzeniem (np. przy starcie aplikacji), a nie przy pierwszej transakcji
+        """
+        with self._lock:
+            self._get_matcher()
     
     def add_custom_pattern(self, category: str, pattern: str):
         """
@@ -111,10 +236,12 @@ class TransactionCategorizer:
             category: Nazwa kategorii
             pattern: Wzorzec regex do dopasowania
         """
-        if category not in self.category_patterns:
-            self.category_patterns[category] = []
-        
-        self.category_patterns[category].append(pattern)
+        with self._lock:
+            if category not in self.category_patterns:
+                self.category_patterns[category] = []
+            
+            self.category_patterns[category].append(pattern)
+            self._invalidate_rules()
     
     def update_manual_categories(self, manual_categories: List[Dict[str, Any]]):
         """
@@ -123,7 +250,54 @@ class TransactionCategorizer:
         Args:
             manual_categories: Lista słowników z ręcznymi kategoriami
         """
-        self.manual_categories = manual_categories
+        with self._lock:
+            self.manual_categories = manual_categories
+            self._invalidate_rules()
+    
+    def _invalidate_rules(self):
+        """
+        Unieważnia skompilowane reguły i pamięć podręczną po zmianie reguł
+        """
+        with self._lock:
+            self._matcher = None
+            self._fingerprint = None
+            self._cache.clear()
+            self.rules_version += 1
+    
+    def rules_fingerprint(self) -> str:
+        """
+        Zwraca odcisk (SHA-256) reguł wpływających na wynik kategoryzacji
+        
+        Uwzględnia frazy, kategorie i typy dopasowania ręcznych reguł w kolejności
+        priorytetu oraz standardowe wzorce - liczniki użyć i daty reguł są pomijane.
+        
+        Returns:
+            Odcisk reguł w postaci szesnastkowej
+        """
+        if self._fingerprint is None:
+            rules = [
+                [[rule['fraza'], rule['kategoria'], rule.get('typ_dopasowania')] for rule in self.manual_categories],
+                sorted(self.category_patterns.items())
+            ]
+            payload = json.dumps(rules, ensure_ascii=False)
+            self._fingerprint = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        
+        return self._fingerprint
+    
+    def cache_info(self) -> Dict[str, int]:
+        """
+        Zwraca statystyki pamięci podręcznej kategoryzacji
+        
+        Returns:
+            Słownik z liczbą trafień, chybień, rozmiarem i wersją reguł
+        """
+        return {
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
+            'size': len(self._cache),
+            'max_size': self.cache_size,
+            'rules_version': self.rules_version
+        }
     
     def get_unassigned_transactions(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
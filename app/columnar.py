@@ -0,0 +1,174 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from typing import Any, BinaryIO, Dict, Optional, Sequence, Tuple
+
+from .batch import TransactionBatch, day_number
+from .parser import DATE_SAMPLE_SIZE, infer_date_format, normalize_amount, parse_date
+
+def _factorize(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Zamienia kolumnę na kody i tablicę różnych wartości
+
+    Brakujące wartości (None/NaN) dostają kod -1. Wyciągi mają dużo powtórzeń
+    (daty, stałe opłaty), więc konwersje liczone są raz dla każdej różnej wartości.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    return codes, np.asarray(uniques, dtype=object)
+
+def parse_amount_column(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parsuje kolumnę kwot - wynik dla każdego wiersza jest taki sam jak z clean_amount
+
+    Separatory są normalizowane przez normalize_amount (tę samą funkcję, której
+    używa clean_amount), a poprawne liczby wyznacza jedno wywołanie pd.to_numeric.
+    pd.to_numeric zaokrągla długie wartości inaczej niż float(), więc same liczby
+    są liczone rzutowaniem tablicy na float64 (to samo zaokrąglenie co float()).
+    Wartości odrzucone przez pd.to_numeric (np. '1_000', 'Infinity') sprawdza float().
+
+    Args:
+        values: Surowe wartości kolumny kwot
+
+    Returns:
+        Krotka (kwoty jako float64, maska wierszy z nieprawidłową kwotą)
+    """
+    codes, uniques = _factorize(values)
+
+    # Pusta kwota to 0.0, tak jak w clean_amount
+    cleaned = np.array([normalize_amount(value) if value else '0' for value in uniques], dtype=object)
+
+    # Ostatni element dla brakujących wartości (kod -1)
+    amounts = np.zeros(len(uniques) + 1, dtype=np.float64)
+    invalid = np.zeros(len(uniques) + 1, dtype=bool)
+
+    numeric = pd.to_numeric(pd.Series(cleaned, dtype=object), errors='coerce').notna().to_numpy()
+    try:
+        amounts[:-1][numeric] = cleaned[numeric].astype(np.float64)
+    except ValueError:
+        numeric[:] = False
+
+    for position in np.flatnonzero(~numeric):
+        try:
+            amounts[position] = float(cleaned[position])
+        except ValueError:
+            invalid[position] = True
+
+    return amounts[codes], invalid[codes]
+
+def parse_date_column(values: Sequence[Optional[str]], date_format: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parsuje kolumnę dat - wynik dla każdego wiersza jest taki sam jak z parse_date
+
+    Różne wartości kolumny są parsowane jednym wywołaniem pd.to_datetime z formatem
+    wykrytym z próbki. Wartości odstające (inny format, daty spoza zakresu pandas)
+    przechodzą przez parse_date.
+
+    Args:
+        values: Surowe wartości kolumny dat
+        date_format: Format dat (domyślnie wykrywany z pierwszych wierszy)
+
+    Returns:
+        Krotka (daty 'YYYY-MM-DD' lub None, maska wierszy z nieprawidłową datą)
+    """
+    codes, uniques = _factorize(values)
+
+    if date_format is None:
+        date_format = infer_date_format(uniques[codes[:DATE_SAMPLE_SIZE][codes[:DATE_SAMPLE_SIZE] >= 0]])
+
+    # Ostatni element dla brakujących wartości (kod -1)
+    dates = np.full(len(uniques) + 1, None, dtype=object)
+    parsed = np.zeros(len(uniques), dtype=bool)
+
+    if date_format and len(uniques):
+        converted = pd.to_datetime(pd.Series(uniques, dtype=object).str.strip(), format=date_format, errors='coerce')
+        parsed = converted.notna().to_numpy()
+        dates[:-1][parsed] = converted[parsed].dt.strftime('%Y-%m-%d').to_numpy()
+
+    # Wartości odstające - pełne próbowanie formatów
+    for position in np.flatnonzero(~parsed):
+        dates[position] = parse_date(uniques[position])
+
+    dates = dates[codes]
+    return dates, pd.isna(dates)
+
+def parse_transaction_columns(columns: Dict[str, Sequence[Optional[str]]], column_mapping: Dict[str, str],
+                              stats: Optional[Dict[str, int]] = None) -> Tuple[TransactionBatch, np.ndarray]:
+    """
+    Zamienia kolumny CSV na transakcje - kolumnowy odpowiednik parse_transaction_rows
+
+    Args:
+        columns: Surowe wartości kolumn (nazwa kolumny w pliku -> wartości)
+        column_mapping: Mapowanie 'data'/'kwota'/'opis' (i opcjonalnie 'saldo') -> nazwa kolumny w pliku
+        stats: Słownik, do którego dodawane są liczby odrzuconych wierszy
+            (tak jak w parse_transaction_rows)
+
+    Returns:
+        Krotka (TransactionBatch z poprawnymi wierszami - identyczny z wynikiem
+        parse_transaction_rows, maska logiczna pominiętych wierszy pliku)
+    """
+    raw_dates = columns[column_mapping["data"]]
+    raw_amounts = columns[column_mapping["kwota"]]
+    descriptions = np.asarray(columns[column_mapping["opis"]], dtype=object)
+
+    dates, invalid_dates = parse_date_column(raw_dates)
+    amounts, invalid_amounts = parse_amount_column(raw_amounts)
+
+    for position in np.flatnonzero(invalid_dates):
+        print(f"Invalid date: {raw_dates[position]}")
+    for position in np.flatnonzero(invalid_amounts & ~invalid_dates):
+        print(f"Invalid amount: {raw_amounts[position]}")
+
+    invalid = invalid_dates | invalid_amounts
+    valid = ~invalid
+
+    if stats is not None:
+        stats['rejected_date'] = stats.get('rejected_date', 0) + int(invalid_dates.sum())
+        stats['rejected_amount'] = stats.get('rejected_amount', 0) + int((invalid_amounts & ~invalid_dates).sum())
+
+    # Kolumny paczki budowane z tablic - numery dni z różnych dat, brak salda jako NaN
+    codes, unique_dates = _factorize(dates[valid])
+    days = np.array([day_number(value) for value in unique_dates], dtype=np.int64)[codes]
+
+    if "saldo" in column_mapping:
+        balances, invalid_balances = parse_amount_column(columns[column_mapping["saldo"]])
+        balances = np.where(invalid_balances, np.nan, balances)[valid]
+    else:
+        balances = np.full(len(days), np.nan)
+
+    transactions = TransactionBatch()
+    transactions.days.frombytes(days.astype(np.int64).tobytes())
+    transactions.amounts.frombytes(amounts[valid].astype(np.float64).tobytes())
+    transactions.balances.frombytes(balances.astype(np.float64).tobytes())
+    transactions.descriptions = [sys.intern(description.strip()) for description in descriptions[valid]]
+    transactions.categories = [None] * len(days)
+    transactions.manual = bytearray(len(days))
+
+    return transactions, invalid
+
+def read_csv_columns(source: BinaryIO, dialect: Any, column_mapping: Dict[str, str], encoding: str = 'utf-8') -> Dict[str, np.ndarray]:
+    """
+    Wczytuje z pliku tylko zmapowane kolumny jako tablice surowych napisów
+
+    Wartości nie są konwertowane przez pandas (dtype=str, bez rozpoznawania NA),
+    żeby kwoty i daty były parsowane z tych samych napisów co w csv.DictReader.
+    Brakujące pola w krótkich wierszach są zamieniane na None.
+    """
+    source.seek(0)
+    names = list(dict.fromkeys(column_mapping[key] for key in ("data", "kwota", "opis", "saldo") if key in column_mapping))
+    frame = pd.read_csv(source, dialect=dialect, encoding=encoding, usecols=names,
+                        dtype=str, keep_default_na=False)
+
+    columns = {}
+    for name in names:
+        column = frame[name].to_numpy(dtype=object)
+        column[pd.isna(column)] = None
+        columns[name] = column
+    return columns
+
+def parse_csv_columnar(source: BinaryIO, dialect: Any, column_mapping: Dict[str, str]) -> TransactionBatch:
+    """
+    Parsuje cały plik kolumnowo i zwraca paczkę transakcji
+    """
+    transactions, _ = parse_transaction_columns(read_csv_columns(source, dialect, column_mapping), column_mapping)
+    return transactions
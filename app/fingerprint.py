@@ -0,0 +1,58 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Długość odcisku transakcji w znakach szesnastkowych (16 bajtów BLAKE2b)
+FINGERPRINT_LENGTH = 32
+
+def normalize_description(description: str) -> str:
+    """
+    Normalizuje opis do porównań: małe litery, pojedyncze spacje, bez spacji na brzegach
+    """
+    return ' '.join(description.casefold().split())
+
+def fingerprint_key(date: datetime, amount: float, description: str, balance: Optional[float]) -> Tuple[str, str, str, str]:
+    """
+    Zwraca znormalizowane pola transakcji, z których liczony jest odcisk
+
+    Kwoty są zaokrąglane do groszy (bez ujemnego zera), brak salda to pusty napis.
+    """
+    return (
+        date.isoformat(),
+        f"{round(amount, 2) + 0.0:.2f}",
+        normalize_description(description),
+        f"{round(balance, 2) + 0.0:.2f}" if balance is not None else ''
+    )
+
+def transaction_fingerprint(key: Tuple[str, str, str, str], occurrence: int = 0) -> str:
+    """
+    Liczy odcisk transakcji z pól zwróconych przez fingerprint_key
+
+    Args:
+        key: Znormalizowane pola transakcji (data, kwota, opis, saldo)
+        occurrence: Numer wystąpienia identycznej transakcji w tym samym wyciągu
+
+    Returns:
+        Odcisk w postaci szesnastkowej (FINGERPRINT_LENGTH znaków)
+    """
+    payload = '\x1f'.join(key + (str(occurrence),))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=FINGERPRINT_LENGTH // 2).hexdigest()
+
+def fingerprint_transactions(transactions: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    Liczy odciski transakcji jednego wyciągu (format analyzer.py)
+
+    Identyczne transakcje w jednym wyciągu (np. dwie takie same opłaty tego
+    samego dnia bez salda) są kolejnymi wystąpieniami i dostają różne odciski.
+    Ten sam wyciąg przesłany ponownie albo nakładający się wyciąg z innego
+    okresu daje te same odciski dla tych samych transakcji.
+    """
+    occurrences: Dict[Tuple[str, str, str, str], int] = {}
+    fingerprints = []
+    for transaction in transactions:
+        key = fingerprint_key(transaction['date'], transaction['amount'],
+                              transaction['description'], transaction.get('balance'))
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        fingerprints.append(transaction_fingerprint(key, occurrence))
+    return fingerprints
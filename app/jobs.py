@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from . import storage
+from .pipeline import IngestionError, IngestionPipeline, MissingColumnsError
+from .streaming import CHUNK_SIZE
+from .upload_cache import UploadCache, upload_cache
+
+# Katalog plików czekających na przetworzenie (musi przetrwać restart aplikacji)
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(tempfile.gettempdir(), "budget-control-jobs"))
+
+# Liczba wątków przetwarzających zadania i limit niedokończonych zadań
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+MAX_PENDING_JOBS = 50
+
+# Pliki od tego rozmiaru przesłane przez formularz są przetwarzane w tle
+ASYNC_UPLOAD_MIN_BYTES = 2 * 1024 * 1024
+
+# Minimalny odstęp między zapisami postępu do bazy (zmiana etapu zapisuje się zawsze)
+PROGRESS_INTERVAL = 0.5
+
+class JobQueueFullError(Exception):
+    """
+    Kolejka ma już MAX_PENDING_JOBS niedokończonych zadań
+    """
+
+class JobQueue:
+    """
+    Kolejka zadań importu przetwarzanych w tle przez ograniczoną pulę wątków
+
+    Stan zadań jest w tabeli zadania_importu, a przesłany plik na dysku do
+    końca przetwarzania - po restarcie resume() wznawia niedokończone zadania.
+    Zadanie przetwarza IngestionPipeline, a jego postęp (etap i liczba
+    przeczytanych wierszy) jest zapisywany w zadaniu.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = MAX_PENDING_JOBS,
+                 directory: str = JOBS_DIR, cache: Optional[UploadCache] = None):
+        """
+        Args:
+            workers: Liczba wątków przetwarzających zadania
+            max_pending: Limit zadań czekających i przetwarzanych
+            directory: Katalog plików zadań
+            cache: Pamięć podręczna wyników przekazywana do IngestionPipeline
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.directory = directory
+        self.cache = cache
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fileobj: BinaryIO, file_name: Optional[str] = None,
+               column_mapping: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Zapisuje plik na dysku, tworzy zadanie i przekazuje je do puli wątków
+
+        Args:
+            fileobj: Przesłany plik
+            file_name: Nazwa pliku podana przez użytkownika
+            column_mapping: Ręcznie wybrane kolumny (None - wykrywanie z nagłówków)
+
+        Returns:
+            Utworzone zadanie
+
+        Raises:
+            JobQueueFullError: Gdy kolejka jest pełna
+        """
+        with self._lock:
+            if storage.count_unfinished_jobs() >= self.max_pending:
+                raise JobQueueFullError(f"Zbyt wiele plików w kolejce ({self.max_pending}), spróbuj za chwilę")
+
+            job_id = uuid.uuid4().hex
+            os.makedirs(self.directory, exist_ok=True)
+            file_path = os.path.join(self.directory, f"{job_id}.csv")
+
+            fileobj.seek(0)
+            with open(file_path, "wb") as target:
+                shutil.copyfileobj(fileobj, target, CHUNK_SIZE)
+                file_size = target.tell()
+
+            try:
+                job = storage.create_job(job_id, file_path, file_name, file_size, column_mapping)
+            except Exception:
+                os.remove(file_path)
+                raise
+
+        self._get_executor().submit(self._run, job_id)
+        return job
+
+    def resume(self) -> List[str]:
+        """
+        Wznawia zadania przerwane restartem aplikacji
+
+        Returns:
+            ID wznowionych zadań
+        """
+        job_ids = storage.requeue_unfinished_jobs()
+        for job_id in job_ids:
+            self._get_executor().submit(self._run, job_id)
+        if job_ids:
+            print(f"Wznowiono zadania importu: {len(job_ids)}")
+        return job_ids
+
+    def shutdown(self, wait: bool = False):
+        """
+        Zatrzymuje pulę wątków - zadania z kolejki zostaną wznowione po restarcie
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import-job")
+            return self._executor
+
+    def _run(self, job_id: str):
+        """
+        Przetwarza jedno zadanie w wątku puli
+        """
+        if not storage.claim_job(job_id):
+            return
+
+        job = storage.get_job(job_id)
+        progress = JobProgress(job_id)
+
+        try:
+            with open(job['file_path'], "rb") as source:
+                pipeline = IngestionPipeline(column_mapping=job['column_mapping'], cache=self.cache, progress=progress)
+                result = pipeline.run(source)
+        except MissingColumnsError as e:
+            self._finish(job, status='failed', error=str(e), detected_columns=e.detected_columns)
+        except IngestionError as e:
+            self._finish(job, status='failed', error=str(e))
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, status='failed', error=f"Błąd przetwarzania pliku: {e}")
+        else:
+            if not result.transactions:
+                self._finish(job, status='failed', error="Nie znaleziono prawidłowych transakcji w pliku")
+            else:
+                self._finish(job, status='done', stage=None, rows_parsed=len(result.transactions),
+                             analysis_ids=result.analysis_ids, deduplicated=result.deduplicated)
+
+    def _finish(self, job: Dict[str, Any], **fields):
+        """
+        Zapisuje wynik zadania i usuwa jego plik
+        """
+        storage.update_job(job['id'], finished_at=datetime.now(), **fields)
+        try:
+            os.remove(job['file_path'])
+        except OSError:
+            pass
+
+class JobProgress:
+    """
+    Zapisuje postęp IngestionPipeline w zadaniu, nie częściej niż co PROGRESS_INTERVAL
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.stage: Optional[str] = None
+        self._last_update = 0.0
+
+    def __call__(self, stage: str, rows: int):
+        now = time.monotonic()
+        if stage == self.stage and now - self._last_update < PROGRESS_INTERVAL:
+            return
+
+        self.stage = stage
+        self._last_update = now
+        storage.update_job(self.job_id, stage=stage, rows_parsed=rows)
+
+job_queue = JobQueue(cache=upload_cache)
@@ -1,105 +1,46 @@
 import os
 import uvicorn
-import csv
-import io
-import pandas as pd
 from datetime import datetime
-from dateutil import parser as date_parser
+from typing import List, Optional
+from urllib.parse import urlencode
 from fastapi import FastAPI, Request, UploadFile, File, Form
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+from .api import router as api_router, FastJSONResponse
+from .jobs import ASYNC_UPLOAD_MIN_BYTES, JobQueueFullError, job_queue
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from .parallel import close_process_pool, upload_size
+from .pipeline import IngestionPipeline, IngestionError, MissingColumnsError
+from .profiling import request_profiler
+from . import storage
+from .storage import get_job, get_transactions_page, iter_transactions, count_transactions, DEFAULT_PAGE_SIZE
+from .upload_cache import upload_cache
+from .warmup import preload_modules, warm_up_in_background
+
 app = FastAPI(title="Budget Control Web", description="Aplikacja do analizy wydatków")
 
+# Ustawiane po rozgrzaniu aplikacji - do tego czasu /health zwraca 503
+app.state.ready = False
+
+# Czasy obsługi żądań według tras (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Endpointy JSON
+app.include_router(api_router)
+
 # Montowanie plików statycznych
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Konfiguracja szablonów Jinja2
 templates = Jinja2Templates(directory="templates")
 
-# Mapa kolumn do rozpoznawania różnych formatów CSV
-COLUMN_MAPPING = {
-    "data": ["data", "Data", "Data operacji", "Transaction Date", "DATA", "Date", "Transaction date"],
-    "kwota": ["kwota", "Kwota", "Amount", "Wartość", "Cena", "Kwota operacji", "KWOTA"],
-    "opis": ["opis", "Opis", "Tytuł", "Description", "Tytuł operacji", "OPIS", "Title"],
-    "saldo": ["saldo", "Saldo", "Balance", "SALDO"]
-}
-
-def detect_column_mapping(headers):
-    """
-    Wykrywa mapowanie kolumn na podstawie nagłówków CSV
-    """
-    mapping = {}
-    detected_columns = []
-    
-    for standard_name, possible_names in COLUMN_MAPPING.items():
-        for header in headers:
-            if header.strip() in possible_names:
-                mapping[standard_name] = header.strip()
-                detected_columns.append(header.strip())
-                break
-    
-    return mapping, detected_columns
+# Liczba fragmentów szablonu łączonych w jeden kawałek odpowiedzi strumieniowej
+STREAM_BUFFER_SIZE = 200
 
-def clean_amount(amount_str):
-    """
-    Czyści i konwertuje kwotę na float
-    """
-    if not amount_str:
-        return 0.0
-    
-    # Usuń cudzysłowy i apostrofy
-    cleaned = amount_str.replace('"', '').replace("'", '').strip()
-    
-    # Usuń spacje z liczb
-    cleaned = cleaned.replace(' ', '')
-    
-    # Zamień przecinki na kropki w liczbach
-    if ',' in cleaned and '.' not in cleaned:
-        # Jeśli jest tylko przecinek, to prawdopodobnie separator dziesiętny
-        cleaned = cleaned.replace(',', '.')
-    elif ',' in cleaned and '.' in cleaned:
-        # Jeśli są oba, to przecinek to separator tysięcy
-        cleaned = cleaned.replace(',', '')
-    
-    try:
-        return float(cleaned)
-    except ValueError:
-        print(f"Invalid amount: {amount_str}")
-        return None
-
-def parse_date(date_str):
-    """
-    Parsuje datę w różnych formatach
-    """
-    if not date_str:
-        return None
-    
-    date_str = date_str.strip()
-    
-    # Próbuj różne formaty dat
-    date_formats = [
-        "%Y-%m-%d",
-        "%d.%m.%Y",
-        "%m/%d/%Y",
-        "%d-%m-%Y",
-        "%Y/%m/%d"
-    ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
-        except ValueError:
-            continue
-    
-    # Jeśli nie udało się z datetime, spróbuj dateutil
-    try:
-        parsed_date = date_parser.parse(date_str)
-        return parsed_date.strftime("%Y-%m-%d")
-    except:
-        print(f"Invalid date format: {date_str}")
-        return None
+# Liczba transakcji pobieranych z bazy naraz w trybie strumieniowym
+STREAM_BATCH_SIZE = 1000
 
 def debug_csv_data(df, column_mapping=None, detected_columns=None):
     """
@@ -132,6 +73,135 @@ def debug_csv_data(df, column_mapping=None, detected_columns=None):
     except Exception as e:
         print(f"DEBUG ERROR: Nie udało się zapisać danych debug: {e}")
 
+def run_ingestion(request: Request, csv_file: UploadFile, column_mapping=None):
+    """
+    Przetwarza przesłany plik przez IngestionPipeline i buduje odpowiedź
+    
+    Args:
+        request: Żądanie HTTP
+        csv_file: Przesłany plik CSV
+        column_mapping: Ręcznie wybrane kolumny (None - wykrywanie z nagłówków)
+    """
+    try:
+        result = IngestionPipeline(column_mapping=column_mapping, cache=upload_cache).run(csv_file.file)
+    except MissingColumnsError as e:
+        if column_mapping is not None:
+            return RedirectResponse(url=f"/?error={str(e)}", status_code=303)
+        
+        # Przekieruj na stronę przypisywania kolumn z wykrytymi kolumnami
+        columns_param = ','.join(e.detected_columns)
+        return RedirectResponse(url=f"/assign-columns?columns={columns_param}", status_code=303)
+    except IngestionError as e:
+        return RedirectResponse(url=f"/?error={str(e)}", status_code=303)
+    
+    if not result.transactions:
+        # Debuguj dane przed zwróceniem błędu
+        try:
+            # pandas jest importowany dopiero tutaj - nie spowalnia startu aplikacji
+            import pandas as pd
+            
+            result.source.seek(0)
+            df = pd.read_csv(result.source, dialect=result.dialect, encoding='utf-8')
+            debug_csv_data(df, result.column_mapping, result.detected_columns)
+        except Exception as e:
+            print(f"DEBUG ERROR: Nie udało się utworzyć dataframe: {e}")
+        
+        return RedirectResponse(url="/?error=Nie znaleziono prawidłowych transakcji w pliku", status_code=303)
+    
+    # Pierwsza strona zapisanych transakcji z pomiarami etapów
+    return render_transactions(request, result.analysis_ids, metrics=result.metrics(),
+                               deduplicated=result.deduplicated,
+                               headers={"Server-Timing": result.server_timing()})
+
+def enqueue_upload(request: Request, csv_file: UploadFile, column_mapping=None):
+    """
+    Przekazuje przesłany plik do przetwarzania w tle i zwraca stronę postępu (202)
+    
+    Args:
+        request: Żądanie HTTP
+        csv_file: Przesłany plik CSV
+        column_mapping: Ręcznie wybrane kolumny (None - wykrywanie z nagłówków)
+    """
+    try:
+        job = job_queue.submit(csv_file.file, csv_file.filename, column_mapping)
+    except JobQueueFullError as e:
+        return RedirectResponse(url=f"/?error={str(e)}", status_code=303)
+    
+    return templates.TemplateResponse("job.html", {
+        "request": request,
+        "job": job_status(job)
+    }, status_code=202, headers={"Location": f"/jobs/{job['id']}"})
+
+def job_status(job) -> dict:
+    """
+    Stan zadania importu dla klienta - z adresem wyniku po zakończeniu
+    """
+    status = {key: job[key] for key in (
+        'id', 'status', 'stage', 'rows_parsed', 'file_name', 'file_size',
+        'deduplicated', 'error', 'created_at', 'finished_at'
+    )}
+    status["status_url"] = f"/jobs/{job['id']}/status"
+    status["result_url"] = transactions_url(job_id=job['id']) if job['status'] == 'done' else None
+    status["assign_columns_url"] = None
+    if job['status'] == 'failed' and job['detected_columns'] and job['column_mapping'] is None:
+        status["assign_columns_url"] = f"/assign-columns?columns={','.join(job['detected_columns'])}"
+    return status
+
+def transactions_url(analysis_ids: Optional[List[int]] = None, job_id: Optional[str] = None, **params) -> str:
+    """
+    Buduje adres widoku transakcji dla podanych analiz albo wyniku zadania importu
+    
+    Wynik zadania jest wskazywany przez ID zadania - analiz z wieloletniego
+    wyciągu mogą być setki, a ich lista w adresie przekroczyłaby limity
+    długości adresu serwerów pośredniczących.
+    """
+    if job_id is not None:
+        query = {"job": job_id}
+    else:
+        query = {"ids": ','.join(str(analysis_id) for analysis_id in analysis_ids)}
+    query.update({key: value for key, value in params.items() if value is not None})
+    return f"/transactions?{urlencode(query, safe=',')}"
+
+def render_transactions(request: Request, analysis_ids: List[int], after=None, stream: bool = False,
+                        metrics=None, deduplicated: int = 0, job_id: Optional[str] = None, headers=None):
+    """
+    Renderuje transakcje analiz jedną stroną albo strumieniowo
+    
+    Strona to DEFAULT_PAGE_SIZE transakcji od klucza (date, id) `after`.
+    W trybie strumieniowym szablon jest renderowany przez Template.stream()
+    (generate() z buforowaniem), a transakcje są pobierane z bazy paczkami
+    w trakcie wysyłania - pamięć i czas do pierwszego bajtu nie zależą od
+    liczby transakcji. Adresy kolejnych stron wskazują zadanie job_id,
+    jeśli je podano, a w przeciwnym razie listę analiz.
+    """
+    context = {
+        "request": request,
+        "total_count": count_transactions(analysis_ids),
+        "metrics": metrics,
+        "deduplicated": deduplicated,
+        "streaming": stream,
+        "stream_url": transactions_url(analysis_ids, job_id, stream=1),
+        "first_url": transactions_url(analysis_ids, job_id) if after is not None else None,
+        "next_url": None
+    }
+    
+    if stream:
+        context["transactions"] = iter_transactions(analysis_ids, batch_size=STREAM_BATCH_SIZE)
+        template_stream = templates.get_template("analyze.html").stream(context)
+        template_stream.enable_buffering(STREAM_BUFFER_SIZE)
+        return StreamingResponse(template_stream, media_type="text/html", headers=headers)
+    
+    # O jedną transakcję więcej - wiadomo wtedy, czy istnieje następna strona
+    page = get_transactions_page(analysis_ids, after=after, limit=DEFAULT_PAGE_SIZE + 1)
+    if len(page) > DEFAULT_PAGE_SIZE:
+        page = page[:DEFAULT_PAGE_SIZE]
+        context["next_url"] = transactions_url(
+            analysis_ids, job_id, after_date=page[-1]['date'].isoformat(), after_id=page[-1]['id']
+        )
+    
+    context["transactions"] = page
+    return templates.TemplateResponse("analyze.html", context, headers=headers)
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """
@@ -146,92 +216,63 @@ async def index(request: Request):
     })
 
 @app.post("/analyze")
-async def analyze_csv(
+@request_profiler.profile("analyze_csv")
+def analyze_csv(
     request: Request,
     csv_file: UploadFile = File(...)
 ):
     """
     Analizuje przesłany plik CSV z transakcjami
+    
+    Zwykła funkcja, nie async - FastAPI wykonuje ją w puli wątków, więc
+    parsowanie i zapis do bazy nie blokują pętli zdarzeń (/health, /metrics,
+    status zadań).
     """
     try:
         if not csv_file:
             return RedirectResponse(url="/?error=Nie wybrano pliku", status_code=303)
         
-        # Wczytaj plik CSV
-        content = await csv_file.read()
-        csv_text = content.decode('utf-8')
-        
-        # Użyj csv.Sniffer do wykrycia formatu
-        try:
-            dialect = csv.Sniffer().sniff(csv_text[:1024])
-        except:
-            dialect = csv.excel  # Fallback do standardowego formatu
-        
-        # Parsuj CSV z wykrytym formatem
-        csv_reader = csv.DictReader(io.StringIO(csv_text), dialect=dialect)
-        
-        # Wykryj mapowanie kolumn
-        headers = csv_reader.fieldnames
-        if not headers:
-            return RedirectResponse(url="/?error=Nie można odczytać nagłówków CSV", status_code=303)
+        # Duże pliki są przetwarzane w tle - żądanie nie czeka na koniec przetwarzania
+        if upload_size(csv_file.file) >= ASYNC_UPLOAD_MIN_BYTES:
+            return enqueue_upload(request, csv_file)
         
-        column_mapping, detected_columns = detect_column_mapping(headers)
-        
-        # Sprawdź czy znaleziono wymagane kolumny
-        required_columns = ["data", "kwota", "opis"]
-        missing_columns = [col for col in required_columns if col not in column_mapping]
-        
-        if missing_columns:
-            # Przekieruj na stronę przypisywania kolumn z wykrytymi kolumnami
-            columns_param = ','.join(detected_columns)
-            return RedirectResponse(url=f"/assign-columns?columns={columns_param}", status_code=303)
-        
-        # Przetwórz transakcje
-        transactions = []
-        for row in csv_reader:
-            # Pobierz wartości z odpowiednich kolumn
-            date_raw = row.get(column_mapping["data"], "")
-            amount_raw = row.get(column_mapping["kwota"], "")
-            description_raw = row.get(column_mapping["opis"], "")
-            
-            # Parsuj datę
-            parsed_date = parse_date(date_raw)
-            if not parsed_date:
-                print(f"Invalid date: {date_raw}")
-                continue
-            
-            # Parsuj kwotę
-            parsed_amount = clean_amount(amount_raw)
-            if parsed_amount is None:
-                continue
-            
-            transaction = {
-                'data': parsed_date,
-                'opis': description_raw.strip(),
-                'kwota': parsed_amount
-            }
-            transactions.append(transaction)
-        
-        if not transactions:
-            # Debuguj dane przed zwróceniem błędu
-            try:
-                df = pd.read_csv(io.StringIO(csv_text), dialect=dialect)
-                debug_csv_data(df, column_mapping, detected_columns)
-            except Exception as e:
-                print(f"DEBUG ERROR: Nie udało się utworzyć dataframe: {e}")
-            
-            return RedirectResponse(url="/?error=Nie znaleziono prawidłowych transakcji w pliku", status_code=303)
-        
-        # Przekaż listę transakcji do szablonu
-        return templates.TemplateResponse("analyze.html", {
-            "request": request,
-            "transactions": transactions
-        })
+        # Przetwórz plik z kolumnami wykrytymi z nagłówków
+        return run_ingestion(request, csv_file)
         
     except Exception as e:
         # Przekieruj z komunikatem o błędzie
         return RedirectResponse(url=f"/?error={str(e)}", status_code=303)
 
+@app.get("/transactions", response_class=HTMLResponse)
+def transactions_page(
+    request: Request,
+    ids: Optional[str] = None,
+    job: Optional[str] = None,
+    after_date: Optional[str] = None,
+    after_id: Optional[int] = None,
+    stream: bool = False
+):
+    """
+    Transakcje zapisanych analiz - stronicowane kluczem (date, id) lub strumieniowo
+    
+    Analizy są podane listą ID (ids) albo jako wynik zakończonego zadania importu (job).
+    """
+    try:
+        analysis_ids = [int(analysis_id) for analysis_id in (ids or '').split(',') if analysis_id]
+        after = (datetime.fromisoformat(after_date), after_id) if after_date and after_id is not None else None
+    except ValueError:
+        return RedirectResponse(url="/?error=Nieprawidłowy adres strony transakcji", status_code=303)
+    
+    if job is None:
+        return render_transactions(request, analysis_ids, after=after, stream=stream)
+    
+    job_row = get_job(job)
+    if job_row is None or job_row['status'] != 'done':
+        return RedirectResponse(url="/?error=Nie znaleziono wyniku zadania", status_code=303)
+    
+    return render_transactions(request, job_row['analysis_ids'], after=after, stream=stream,
+                               deduplicated=job_row['deduplicated'], job_id=job_row['id'])
+
 @app.get("/assign-columns", response_class=HTMLResponse)
 async def assign_columns_page(request: Request):
     """
@@ -246,7 +287,8 @@ async def assign_columns_page(request: Request):
     })
 
 @app.post("/process-csv")
-async def process_csv_with_columns(
+@request_profiler.profile("process_csv_with_columns")
+def process_csv_with_columns(
     request: Request,
     csv_file: UploadFile = File(...),
     data_column: str = Form(...),
@@ -254,88 +296,112 @@ async def process_csv_with_columns(
     opis_column: str = Form(...)
 ):
     """
-    Przetwarza CSV z ręcznie przypisanymi kolumnami
+    Przetwarza CSV z ręcznie przypisanymi kolumnami (w puli wątków, jak analyze_csv)
     """
     try:
         if not csv_file:
             return RedirectResponse(url="/?error=Nie wybrano pliku", status_code=303)
         
-        # Wczytaj plik CSV
-        content = await csv_file.read()
-        csv_text = content.decode('utf-8')
-        
-        # Użyj csv.Sniffer do wykrycia formatu
-        try:
-            dialect = csv.Sniffer().sniff(csv_text[:1024])
-        except:
-            dialect = csv.excel
-        
-        # Parsuj CSV z wykrytym formatem
-        csv_reader = csv.DictReader(io.StringIO(csv_text), dialect=dialect)
-        
-        # Sprawdź czy wybrane kolumny istnieją
-        headers = csv_reader.fieldnames
-        if not headers:
-            return RedirectResponse(url="/?error=Nie można odczytać nagłówków CSV", status_code=303)
-        
-        # Sprawdź czy wybrane kolumny istnieją
-        missing_columns = []
-        for col in [data_column, kwota_column, opis_column]:
-            if col not in headers:
-                missing_columns.append(col)
-        
-        if missing_columns:
-            error_msg = f"Wybrane kolumny nie istnieją: {', '.join(missing_columns)}. Dostępne kolumny: {', '.join(headers)}"
-            return RedirectResponse(url=f"/?error={error_msg}", status_code=303)
-        
-        # Przetwórz transakcje z ręcznie przypisanymi kolumnami
-        transactions = []
-        for row in csv_reader:
-            # Pobierz wartości z wybranych kolumn
-            date_raw = row.get(data_column, "")
-            amount_raw = row.get(kwota_column, "")
-            description_raw = row.get(opis_column, "")
-            
-            # Parsuj datę
-            parsed_date = parse_date(date_raw)
-            if not parsed_date:
-                print(f"Invalid date: {date_raw}")
-                continue
-            
-            # Parsuj kwotę
-            parsed_amount = clean_amount(amount_raw)
-            if parsed_amount is None:
-                continue
-            
-            transaction = {
-                'data': parsed_date,
-                'opis': description_raw.strip(),
-                'kwota': parsed_amount
-            }
-            transactions.append(transaction)
-        
-        if not transactions:
-            # Debuguj dane przed zwróceniem błędu
-            try:
-                df = pd.read_csv(io.StringIO(csv_text), dialect=dialect)
-                debug_csv_data(df, {"data": data_column, "kwota": kwota_column, "opis": opis_column}, [data_column, kwota_column, opis_column])
-            except Exception as e:
-                print(f"DEBUG ERROR: Nie udało się utworzyć dataframe: {e}")
-            
-            return RedirectResponse(url="/?error=Nie znaleziono prawidłowych transakcji w pliku", status_code=303)
-        
-        # Przekaż listę transakcji do szablonu
-        return templates.TemplateResponse("analyze.html", {
-            "request": request,
-            "transactions": transactions
-        })
+        # Przetwórz plik z ręcznie przypisanymi kolumnami
+        column_mapping = {"data": data_column, "kwota": kwota_column, "opis": opis_column}
+        if upload_size(csv_file.file) >= ASYNC_UPLOAD_MIN_BYTES:
+            return enqueue_upload(request, csv_file, column_mapping)
+        return run_ingestion(request, csv_file, column_mapping)
         
     except Exception as e:
         return RedirectResponse(url=f"/?error={str(e)}", status_code=303)
 
-# Prosty healthcheck endpoint
+@app.post("/jobs", status_code=202)
+def create_job(
+    csv_file: UploadFile = File(...),
+    data_column: Optional[str] = Form(None),
+    kwota_column: Optional[str] = Form(None),
+    opis_column: Optional[str] = Form(None)
+):
+    """
+    Przyjmuje plik CSV do przetwarzania w tle i zwraca zadanie (202)
+    
+    Kolumny są wykrywane z nagłówków, chyba że podano wszystkie trzy.
+    Postęp i adres wyniku zwraca GET /jobs/{id}/status.
+    """
+    column_mapping = None
+    if data_column and kwota_column and opis_column:
+        column_mapping = {"data": data_column, "kwota": kwota_column, "opis": opis_column}
+    
+    try:
+        job = job_queue.submit(csv_file.file, csv_file.filename, column_mapping)
+    except JobQueueFullError as e:
+        return FastJSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": "30"})
+    
+    status = job_status(job)
+    return FastJSONResponse(status, status_code=202, headers={"Location": status["status_url"]})
+
+@app.get("/jobs/{job_id}/status")
+def job_status_endpoint(job_id: str):
+    """
+    Stan zadania importu: etap, liczba przeczytanych wierszy i adres wyniku
+    """
+    job = get_job(job_id)
+    if job is None:
+        return FastJSONResponse({"detail": "Nie znaleziono zadania"}, status_code=404)
+    
+    return FastJSONResponse(job_status(job), headers={"Cache-Control": "no-store"})
+
+@app.get("/jobs/{job_id}", response_class=HTMLResponse)
+def job_page(request: Request, job_id: str):
+    """
+    Strona postępu zadania importu - przechodzi do wyniku po zakończeniu
+    """
+    job = get_job(job_id)
+    if job is None:
+        return RedirectResponse(url="/?error=Nie znaleziono zadania", status_code=303)
+    
+    return templates.TemplateResponse("job.html", {
+        "request": request,
+        "job": job_status(job)
+    })
+
+@app.on_event("startup")
+async def startup_database():
+    """
+    Migruje schemat bazy i uruchamia rozgrzewanie aplikacji w tle
+    
+    Schemat jest gotowy, zanim serwer przyjmie pierwsze połączenie. Reguły,
+    szablony i pamięć podręczna plików są rozgrzewane w tle - do końca
+    rozgrzewania /health zwraca 503. Potem wznawiane są przerwane zadania
+    importu, a ciężkie moduły (pandas) importuje w tle preload_modules.
+    """
+    storage.init_db()
+    warm_up_in_background(templates.env, on_ready=mark_ready)
+
+def mark_ready():
+    """
+    Wznawia przerwane zadania importu i zgłasza gotowość aplikacji
+    """
+    job_queue.resume()
+    app.state.ready = True
+    preload_modules()
+
+@app.on_event("shutdown")
+async def shutdown_process_pool():
+    """
+    Zamyka pulę procesów do równoległego parsowania i pulę zadań importu
+    """
+    job_queue.shutdown()
+    close_process_pool()
+
+@app.get("/metrics")
+def metrics():
+    """
+    Metryki aplikacji w formacie tekstowym Prometheusa
+    """
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Prosty healthcheck endpoint - 503 do końca rozgrzewania aplikacji
 @app.get("/health")
 async def health_check():
+    if not app.state.ready:
+        return FastJSONResponse({"message": "Budget Control Web API", "status": "starting"}, status_code=503)
     return {"message": "Budget Control Web API", "status": "healthy"}
 
 if __name__ == "__main__":
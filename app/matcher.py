@@ -0,0 +1,201 @@
+import re
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Znaki, które mają specjalne znaczenie w wyrażeniach regularnych
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+# Sposoby dopasowania reguły: fraza w dowolnym miejscu opisu, na początku opisu, wyrażenie regularne
+MATCH_LITERAL = 'literal'
+MATCH_PREFIX = 'prefix'
+MATCH_REGEX = 'regex'
+MATCH_TYPES = (MATCH_LITERAL, MATCH_PREFIX, MATCH_REGEX)
+
+def is_literal_pattern(pattern: str) -> bool:
+    """
+    Sprawdza czy wzorzec regex jest zwykłym tekstem (bez metaznaków)
+    """
+    return not any(char in REGEX_METACHARACTERS for char in pattern)
+
+def detect_match_type(pattern: str) -> str:
+    """
+    Sposób dopasowania wzorca bez podanego typu: tekst bez metaznaków to fraza, reszta to regex
+    """
+    return MATCH_LITERAL if is_literal_pattern(pattern) else MATCH_REGEX
+
+class RuleMatcher:
+    """
+    Skompilowany zestaw reguł kategoryzacji sprawdzany w jednym przebiegu po opisie
+
+    Reguły są podawane w kolejności priorytetu (pierwsza pasująca wygrywa).
+    Frazy (MATCH_LITERAL) trafiają do automatu Aho-Corasick, który znajduje
+    wszystkie wystąpienia w jednym przejściu po tekście, a prefiksy
+    (MATCH_PREFIX) do drzewa przechodzonego od początku tekstu. Koszt obu nie
+    zależy od liczby reguł. Wyrażenia regularne (MATCH_REGEX) są kompilowane
+    raz i sprawdzane tylko wtedy, gdy mają wyższy priorytet niż najlepsze
+    dopasowanie fraz i prefiksów.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, ...]]):
+        """
+        Args:
+            rules: Lista krotek (wzorzec, kategoria) lub (wzorzec, kategoria, typ
+                dopasowania) w kolejności priorytetu - bez typu (lub z None) typ
+                wynika z wzorca (detect_match_type)
+        """
+        self.categories = [rule[1] for rule in rules]
+        self.regex_rules: List[Tuple[int, re.Pattern]] = []
+
+        # Automat: przejścia, stan-porażka i najlepszy (najniższy) priorytet w stanie
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[Optional[int]] = [None]
+
+        # Drzewo prefiksów: przejścia i najlepszy priorytet prefiksu kończącego się w stanie
+        self._prefix_goto: List[Dict[str, int]] = [{}]
+        self._prefix_output: List[Optional[int]] = [None]
+
+        for priority, rule in enumerate(rules):
+            pattern = rule[0]
+            match_type = rule[2] if len(rule) > 2 and rule[2] is not None else detect_match_type(pattern)
+
+            if match_type == MATCH_LITERAL:
+                self._add_literal(pattern.lower(), priority)
+            elif match_type == MATCH_PREFIX:
+                self._add_prefix(pattern.lower(), priority)
+            elif match_type == MATCH_REGEX:
+                try:
+                    self.regex_rules.append((priority, re.compile(pattern, re.IGNORECASE)))
+                except re.error as e:
+                    print(f"Nieprawidłowe wyrażenie reguły '{pattern}' - reguła pominięta: {e}")
+            else:
+                raise ValueError(f"Nieznany typ dopasowania reguły: {match_type}")
+
+        self._delta = self._build_transitions()
+        self._has_prefixes = bool(self._prefix_goto[0]) or self._prefix_output[0] is not None
+
+    def _add_literal(self, literal: str, priority: int):
+        """
+        Dodaje wzorzec tekstowy do drzewa automatu
+        """
+        state = 0
+        for char in literal:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                self._goto.append({})
+                self._output.append(None)
+                next_state = len(self._goto) - 1
+                self._goto[state][char] = next_state
+            state = next_state
+
+        if self._output[state] is None or priority < self._output[state]:
+            self._output[state] = priority
+
+    def _add_prefix(self, prefix: str, priority: int):
+        """
+        Dodaje prefiks do drzewa prefiksów
+        """
+        state = 0
+        for char in prefix:
+            next_state = self._prefix_goto[state].get(char)
+            if next_state is None:
+                self._prefix_goto.append({})
+                self._prefix_output.append(None)
+                next_state = len(self._prefix_goto) - 1
+                self._prefix_goto[state][char] = next_state
+            state = next_state
+
+        if self._prefix_output[state] is None or priority < self._prefix_output[state]:
+            self._prefix_output[state] = priority
+
+    def _build_transitions(self) -> List[Dict[str, int]]:
+        """
+        Wylicza stany-porażki i pełną tablicę przejść (BFS po drzewie)
+        """
+        fail = [0] * len(self._goto)
+        delta: List[Dict[str, int]] = [{} for _ in self._goto]
+        delta[0] = dict(self._goto[0])
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fallback = fail[state]
+
+            # Stan dziedziczy przejścia i dopasowania po swoim stanie-porażce
+            delta[state] = {**delta[fallback], **self._goto[state]}
+            inherited = self._output[fallback]
+            if inherited is not None and (self._output[state] is None or inherited < self._output[state]):
+                self._output[state] = inherited
+
+            for char, child in self._goto[state].items():
+                fail[child] = delta[fallback].get(char, 0)
+                queue.append(child)
+
+        return delta
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Zwraca kategorię reguły o najwyższym priorytecie pasującej do tekstu
+
+        Args:
+            text: Opis transakcji zapisany małymi literami
+
+        Returns:
+            Nazwa kategorii lub None jeśli żadna reguła nie pasuje
+        """
+        priority = self.match_priority(text)
+        return self.categories[priority] if priority is not None else None
+
+    def match_priority(self, text: str) -> Optional[int]:
+        """
+        Zwraca pozycję (priorytet) najważniejszej reguły pasującej do tekstu
+
+        Args:
+            text: Opis transakcji zapisany małymi literami
+
+        Returns:
+            Indeks reguły na liście przekazanej do konstruktora lub None
+        """
+        delta = self._delta
+        output = self._output
+        state = 0
+        best = output[0] if output[0] is not None else len(self.categories)
+
+        for char in text:
+            state = delta[state].get(char, 0)
+            priority = output[state]
+            if priority is not None and priority < best:
+                best = priority
+
+        if self._has_prefixes:
+            best = self._match_prefix(text, best)
+
+        for priority, regex in self.regex_rules:
+            if priority >= best:
+                break
+            if regex.search(text):
+                best = priority
+                break
+
+        if best < len(self.categories):
+            return best
+        return None
+
+    def _match_prefix(self, text: str, best: int) -> int:
+        """
+        Przechodzi drzewo prefiksów od początku tekstu i zwraca lepszy z priorytetów
+        """
+        goto = self._prefix_goto
+        output = self._prefix_output
+        state = 0
+        if output[0] is not None and output[0] < best:
+            best = output[0]
+
+        for char in text:
+            state = goto[state].get(char)
+            if state is None:
+                break
+            priority = output[state]
+            if priority is not None and priority < best:
+                best = priority
+
+        return best
@@ -0,0 +1,244 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Progi histogramów czasu (sekundy) i rozmiaru przesłanych plików (bajty)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(10))  # 1 KB - 256 MB
+
+# Typ odpowiedzi formatu tekstowego (Response z Starlette dopisuje charset=utf-8)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def _escape_help(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n')
+
+def _escape(value: str) -> str:
+    return _escape_help(value).replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    """
+    Wspólna część metryk: nazwa, opis, etykiety i blokada
+    """
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metryka {self.name} wymaga etykiet {self.labelnames}, podano {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    """
+    Licznik rosnący monotonicznie
+    """
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: str):
+        if amount < 0:
+            raise ValueError("Licznik nie może maleć")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(Metric):
+    """
+    Histogram z progami 'le' (wartość trafia do każdego progu >= wartości), sumą i liczbą obserwacji
+    """
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Etykiety -> [liczniki przedziałów (ostatni: powyżej progów), suma]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        if not self.labelnames:
+            self._values[()] = [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Mierzy czas wykonania bloku
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        names = self.labelnames + ('le',)
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (le,))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    """
+    Zbiór metryk procesu renderowany w formacie tekstowym Prometheusa
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metryka {metric.name} jest już zarejestrowana")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+# Metryki aplikacji - licznik lub histogram dla każdej gorącej ścieżki
+HTTP_REQUEST_SECONDS = histogram(
+    'http_request_duration_seconds', 'Czas obsługi żądania HTTP (do wysłania całej odpowiedzi)',
+    ('method', 'route', 'status')
+)
+UPLOAD_SIZE_BYTES = histogram('upload_size_bytes', 'Rozmiar przesłanych plików CSV', buckets=SIZE_BUCKETS)
+INGESTION_STAGE_SECONDS = histogram(
+    'ingestion_stage_duration_seconds', 'Czas etapów przetwarzania przesłanego pliku', ('stage',)
+)
+UPLOAD_CACHE_LOOKUPS = counter(
+    'upload_cache_lookups_total', 'Wyszukiwania wyników w pamięci podręcznej przesłanych plików', ('result',)
+)
+PARSED_ROWS = counter('parser_rows_parsed_total', 'Wiersze CSV zamienione na transakcje')
+REJECTED_ROWS = counter(
+    'parser_rows_rejected_total', 'Wiersze CSV odrzucone przez parse_date (field="date") lub clean_amount (field="amount")',
+    ('field',)
+)
+DEDUPLICATED_ROWS = counter('storage_rows_deduplicated_total', 'Transakcje pominięte jako zapisane wcześniej')
+CATEGORIZED_TRANSACTIONS = counter(
+    'categorizer_transactions_total',
+    'Skategoryzowane transakcje według kategorii i źródła reguły (manual, builtin, none - bez dopasowania)',
+    ('category', 'source')
+)
+CATEGORIZER_CACHE_LOOKUPS = counter(
+    'categorizer_cache_lookups_total', 'Wyszukiwania opisów w pamięci podręcznej kategoryzatora', ('result',)
+)
+MANUAL_RULES_CACHE_LOOKUPS = counter(
+    'manual_rules_cache_lookups_total',
+    'Sprawdzenia ręcznych reguł zapamiętanych w procesie (hit - aktualne, reload - wczytane z bazy)', ('result',)
+)
+DB_QUERY_SECONDS = histogram('db_query_duration_seconds', 'Czas funkcji storage.py', ('function',))
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI mierzące czas żądań HTTP według szablonu ścieżki trasy
+
+    Etykieta 'route' to szablon ścieżki (np. /jobs/{job_id}) albo ścieżka
+    montowania aplikacji (np. /static), a nie adres żądania, więc liczba
+    serii nie rośnie z liczbą różnych adresów.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+        root_path = scope.get('root_path', '')
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Router uzupełnia scope o dopasowaną trasę, a przy zamontowanej
+            # aplikacji (np. StaticFiles pod /static) dopisuje do root_path ścieżkę montowania
+            route = getattr(scope.get('route'), 'path', None)
+            if route is None and scope.get('root_path', '') != root_path:
+                route = scope['root_path'][len(root_path):]
+            route = route or 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope['method'], route=route, status=str(status[0])
+            )
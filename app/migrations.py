@@ -0,0 +1,224 @@
+import re
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .fingerprint import fingerprint_key, transaction_fingerprint
+from .matcher import MATCH_LITERAL, MATCH_REGEX, is_literal_pattern
+from .models import Base, AnalizaTygodnia
+
+# Tabela z numerem wersji schematu - poza Base.metadata, bo nie jest modelem aplikacji
+schema_metadata = MetaData()
+schema_version_table = Table(
+    'schema_version', schema_metadata,
+    Column('version', Integer, nullable=False)
+)
+
+def _migration_1_indexes(connection: Connection):
+    """
+    Indeksy dla zapytań z storage.py, które bez nich przeszukują całe tabele
+    """
+    statements = [
+        # get_nieprzypisane_transakcje: WHERE category = ? ORDER BY date DESC
+        "CREATE INDEX IF NOT EXISTS ix_transakcje_category_date ON transakcje (category, date)",
+        # get_analysis_by_id: WHERE analiza_id = ?
+        "CREATE INDEX IF NOT EXISTS ix_transakcje_analiza_id ON transakcje (analiza_id)",
+        # get_previous_week_analysis: WHERE week_start = ? (najnowsza analiza tygodnia)
+        "CREATE INDEX IF NOT EXISTS ix_analiza_tygodnia_week_start_analysis_date "
+        "ON analiza_tygodnia (week_start, analysis_date)",
+        # get_analysis_history: ORDER BY analysis_date DESC LIMIT ?
+        "CREATE INDEX IF NOT EXISTS ix_analiza_tygodnia_analysis_date ON analiza_tygodnia (analysis_date)",
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+def _migration_2_weekly_category_totals(connection: Connection):
+    """
+    Wypełnia sumy kategorii tygodnia na podstawie zapisanych transakcji
+    """
+    connection.execute(text("DELETE FROM suma_kategorii_tygodnia"))
+    connection.execute(text(
+        "INSERT INTO suma_kategorii_tygodnia "
+        "(analiza_id, week_start, category, total_expenses, transaction_count) "
+        "SELECT t.analiza_id, a.week_start, t.category, SUM(-t.amount), COUNT(*) "
+        "FROM transakcje t JOIN analiza_tygodnia a ON a.id = t.analiza_id "
+        "WHERE t.amount < 0 "
+        "GROUP BY t.analiza_id, t.category"
+    ))
+
+def _migration_3_transaction_date_index(connection: Connection):
+    """
+    Indeks dla stronicowania transakcji po (date, id)
+    """
+    # Indeks na date zawiera rowid (= id), więc kolejność (date, id) wynika wprost z indeksu
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_transakcje_date ON transakcje (date)"))
+
+# Liczba transakcji odczytywanych i aktualizowanych naraz przy wypełnianiu odcisków
+FINGERPRINT_BATCH_SIZE = 10000
+
+def _migration_4_transaction_fingerprints(connection: Connection):
+    """
+    Odciski transakcji z unikalnym indeksem do wykrywania duplikatów
+
+    Wystąpienia identycznych transakcji są numerowane w obrębie analizy, tak jak
+    przy zapisie wyciągu. Duplikaty z nakładających się wcześniej wyciągów
+    zostają w bazie bez odcisku - odcisk dostaje tylko najstarszy wiersz.
+    """
+    columns = {column['name'] for column in inspect(connection).get_columns('transakcje')}
+    if 'fingerprint' not in columns:
+        connection.execute(text("ALTER TABLE transakcje ADD COLUMN fingerprint VARCHAR(32)"))
+
+    seen = set()
+    occurrences = {}
+    current_analysis = None
+    duplicates = 0
+    last = (0, 0)
+    while True:
+        # Stronicowanie kluczem (analiza_id, id) - bez otwartego kursora podczas UPDATE
+        batch = connection.execute(text(
+            "SELECT id, analiza_id, date, amount, description, balance FROM transakcje "
+            "WHERE (analiza_id, id) > (:analiza_id, :id) ORDER BY analiza_id, id LIMIT :limit"
+        ), {'analiza_id': last[0], 'id': last[1], 'limit': FINGERPRINT_BATCH_SIZE}).fetchall()
+        if not batch:
+            break
+        last = (batch[-1][1], batch[-1][0])
+
+        updates = []
+        for transaction_id, analiza_id, date, amount, description, balance in batch:
+            if analiza_id != current_analysis:
+                current_analysis = analiza_id
+                occurrences = {}
+
+            if isinstance(date, str):
+                date = datetime.fromisoformat(date)
+            key = fingerprint_key(date, amount, description, balance)
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+
+            fingerprint = transaction_fingerprint(key, occurrence)
+            if fingerprint in seen:
+                duplicates += 1
+                continue
+            seen.add(fingerprint)
+            updates.append({'id': transaction_id, 'fingerprint': fingerprint})
+
+        if updates:
+            connection.execute(text("UPDATE transakcje SET fingerprint = :fingerprint WHERE id = :id"), updates)
+
+    if duplicates:
+        print(f"Migracja odcisków: {duplicates} zduplikowanych transakcji pozostawiono bez odcisku")
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_transakcje_fingerprint ON transakcje (fingerprint)"
+    ))
+
+def _migration_5_import_jobs(connection: Connection):
+    """
+    Indeks zadań importu do wznawiania niedokończonych zadań po restarcie
+    """
+    # Tabelę zadania_importu tworzy create_all - migracja dodaje tylko indeks
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_zadania_importu_status_created_at ON zadania_importu (status, created_at)"
+    ))
+
+def _migration_6_rule_match_types(connection: Connection):
+    """
+    Typ dopasowania ręcznych reguł kategoryzacji
+
+    Dotąd fraza z metaznakami była traktowana jako wyrażenie regularne. Takie
+    reguły dostają typ 'regex', jeśli wyrażenie jest poprawne - działają jak
+    wcześniej. Pozostałe (w tym frazy, których nie dało się skompilować)
+    dostają typ 'literal'.
+    """
+    columns = {column['name'] for column in inspect(connection).get_columns('reczne_kategorie')}
+    if 'typ_dopasowania' not in columns:
+        connection.execute(text(
+            f"ALTER TABLE reczne_kategorie ADD COLUMN typ_dopasowania VARCHAR(10) NOT NULL DEFAULT '{MATCH_LITERAL}'"
+        ))
+
+    regex_ids = []
+    for rule_id, fraza in connection.execute(text("SELECT id, fraza FROM reczne_kategorie")):
+        if is_literal_pattern(fraza):
+            continue
+        try:
+            re.compile(fraza)
+        except re.error:
+            continue
+        regex_ids.append({'id': rule_id})
+
+    if regex_ids:
+        connection.execute(
+            text(f"UPDATE reczne_kategorie SET typ_dopasowania = '{MATCH_REGEX}' WHERE id = :id"), regex_ids
+        )
+
+def _migration_7_analysis_revision(connection: Connection):
+    """
+    Numer rewizji analizy - zmienia się razem z kategoriami jej transakcji
+    """
+    columns = {column['name'] for column in inspect(connection).get_columns('analiza_tygodnia')}
+    if 'rewizja' not in columns:
+        connection.execute(text("ALTER TABLE analiza_tygodnia ADD COLUMN rewizja INTEGER NOT NULL DEFAULT 0"))
+
+# Migracje w kolejności wersji: (wersja, opis, funkcja).
+# Każda migracja musi być idempotentna - w bazach sprzed migracji część tabel
+# mogła zostać dopiero co utworzona przez create_all w aktualnym kształcie.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, 'Indeksy dla najczęstszych zapytań', _migration_1_indexes),
+    (2, 'Sumy wydatków według kategorii w analizie tygodniowej', _migration_2_weekly_category_totals),
+    (3, 'Indeks dat transakcji do stronicowania', _migration_3_transaction_date_index),
+    (4, 'Odciski transakcji do wykrywania duplikatów', _migration_4_transaction_fingerprints),
+    (5, 'Zadania importu przetwarzane w tle', _migration_5_import_jobs),
+    (6, 'Typ dopasowania ręcznych reguł kategoryzacji', _migration_6_rule_match_types),
+    (7, 'Rewizja analizy tygodnia', _migration_7_analysis_revision),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(connection: Connection) -> int:
+    """
+    Zwraca zapisaną wersję schematu (0 dla baz sprzed migracji)
+    """
+    if not inspect(connection).has_table(schema_version_table.name):
+        return 0
+
+    version = connection.execute(select(schema_version_table.c.version)).scalar()
+    return version or 0
+
+def _set_schema_version(connection: Connection, version: int):
+    """
+    Zapisuje wersję schematu
+    """
+    connection.execute(schema_version_table.delete())
+    connection.execute(schema_version_table.insert().values(version=version))
+
+def migrate(engine: Engine) -> int:
+    """
+    Doprowadza schemat bazy do najnowszej wersji
+
+    Nowa baza dostaje od razu aktualny schemat z modeli. W istniejącej bazie
+    brakujące tabele są tworzone, a następnie uruchamiane są migracje nowsze
+    niż zapisana wersja. Wszystko dzieje się w jednej transakcji.
+
+    Returns:
+        Wersja schematu po migracji
+    """
+    with engine.begin() as connection:
+        schema_metadata.create_all(connection)
+        version = get_schema_version(connection)
+
+        if version == 0 and not inspect(connection).has_table(AnalizaTygodnia.__tablename__):
+            Base.metadata.create_all(connection)
+            _set_schema_version(connection, LATEST_VERSION)
+            return LATEST_VERSION
+
+        Base.metadata.create_all(connection)
+
+        for migration_version, _, apply in MIGRATIONS:
+            if migration_version > version:
+                apply(connection)
+                version = migration_version
+
+        _set_schema_version(connection, version)
+        return version
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -10,6 +10,10 @@ class AnalizaTygodnia(Base):
     Model dla analizy tygodniowej wydatków
     """
     __tablename__ = 'analiza_tygodnia'
+    __table_args__ = (
+        Index('ix_analiza_tygodnia_week_start_analysis_date', 'week_start', 'analysis_date'),
+        Index('ix_analiza_tygodnia_analysis_date', 'analysis_date'),
+    )
     
     id = Column(Integer, primary_key=True)
     week_start = Column(String(10), nullable=False)  # YYYY-MM-DD
@@ -18,9 +22,10 @@ class AnalizaTygodnia(Base):
     avg_daily_expense = Column(Float, nullable=False)
     transaction_count = Column(Integer, nullable=False)
     analysis_date = Column(DateTime, default=datetime.now)
+    rewizja = Column(Integer, nullable=False, default=0, server_default='0')  # Zwiększana przy zmianie kategorii transakcji analizy (ETag API)
     
     # Relacja z transakcjami
-    transakcje = relationship("Transakcja", back_populates="analiza")
+    transakcje = relationship("Transakcja", back_populates="analiza", order_by="Transakcja.id")
     
     def __repr__(self):
         return f"<AnalizaTygodnia(week_start='{self.week_start}', total_expenses={self.total_expenses})>"
@@ -30,6 +35,12 @@ class Transakcja(Base):
     Model dla pojedynczej transakcji
     """
     __tablename__ = 'transakcje'
+    __table_args__ = (
+        Index('ix_transakcje_category_date', 'category', 'date'),
+        Index('ix_transakcje_analiza_id', 'analiza_id'),
+        Index('ix_transakcje_date', 'date'),
+        Index('ux_transakcje_fingerprint', 'fingerprint', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     analiza_id = Column(Integer, ForeignKey('analiza_tygodnia.id'), nullable=False)
@@ -39,6 +50,7 @@ class Transakcja(Base):
     balance = Column(Float, nullable=False)
     category = Column(String(50), nullable=False)
     is_manual = Column(Boolean, default=False)  # Czy kategoria została przypisana ręcznie
+    fingerprint = Column(String(32), nullable=True)  # Odcisk transakcji do wykrywania duplikatów (fingerprint.py)
     
     # Relacja z analizą
     analiza = relationship("AnalizaTygodnia", back_populates="transakcje")
@@ -46,6 +58,60 @@ class Transakcja(Base):
     def __repr__(self):
         return f"<Transakcja(date='{self.date}', amount={self.amount}, category='{self.category}')>"
 
+class SumaKategoriiTygodnia(Base):
+    """
+    Model dla zmaterializowanych sum wydatków według kategorii w analizie tygodniowej
+    
+    Aktualizowany przyrostowo przy zapisie analizy i zmianie kategorii transakcji,
+    żeby historia i porównania nie musiały sumować surowych transakcji.
+    """
+    __tablename__ = 'suma_kategorii_tygodnia'
+    __table_args__ = (
+        Index('ux_suma_kategorii_tygodnia_analiza_category', 'analiza_id', 'category', unique=True),
+        Index('ix_suma_kategorii_tygodnia_week_start', 'week_start'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    analiza_id = Column(Integer, ForeignKey('analiza_tygodnia.id'), nullable=False)
+    week_start = Column(String(10), nullable=False)  # YYYY-MM-DD
+    category = Column(String(50), nullable=False)
+    total_expenses = Column(Float, nullable=False, default=0.0)  # Suma wartości bezwzględnych wydatków
+    transaction_count = Column(Integer, nullable=False, default=0)  # Liczba wydatków w kategorii
+    
+    def __repr__(self):
+        return f"<SumaKategoriiTygodnia(week_start='{self.week_start}', category='{self.category}', total_expenses={self.total_expenses})>"
+
+class ZadanieImportu(Base):
+    """
+    Model dla zadania przetwarzania przesłanego pliku w tle
+    
+    Plik czeka na dysku do końca przetwarzania, więc niedokończone zadania
+    są wznawiane po restarcie aplikacji.
+    """
+    __tablename__ = 'zadania_importu'
+    __table_args__ = (
+        Index('ix_zadania_importu_status_created_at', 'status', 'created_at'),
+    )
+    
+    id = Column(String(32), primary_key=True)  # Losowy identyfikator (uuid4 hex)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, done, failed
+    stage = Column(String(20))  # Bieżący etap IngestionPipeline
+    rows_parsed = Column(Integer, nullable=False, default=0)
+    file_path = Column(Text, nullable=False)
+    file_name = Column(String(255))
+    file_size = Column(Integer, nullable=False, default=0)
+    column_mapping = Column(Text)  # JSON z ręcznie wybranymi kolumnami
+    analysis_ids = Column(Text)  # ID analiz z wynikiem, oddzielone przecinkami
+    deduplicated = Column(Integer, nullable=False, default=0)
+    detected_columns = Column(Text)  # Wykryte kolumny, gdy brakowało wymaganych (oddzielone przecinkami)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<ZadanieImportu(id='{self.id}', status='{self.status}', stage='{self.stage}')>"
+
 class ReczneKategorie(Base):
     """
     Model dla ręcznie przypisanych kategorii - uczenie się na podstawie historii
@@ -55,6 +121,7 @@ class ReczneKategorie(Base):
     id = Column(Integer, primary_key=True)
     fraza = Column(String(200), nullable=False, unique=True)  # Fraza do dopasowania
     kategoria = Column(String(50), nullable=False)  # Kategoria do przypisania
+    typ_dopasowania = Column(String(10), nullable=False, default='literal')  # literal, prefix lub regex (matcher.MATCH_TYPES)
     liczba_uzyc = Column(Integer, default=1)  # Liczba użyć tej reguły
     data_utworzenia = Column(DateTime, default=datetime.now)
     data_ostatniego_uzycia = Column(DateTime, default=datetime.now)
@@ -62,6 +129,21 @@ class ReczneKategorie(Base):
     def __repr__(self):
         return f"<ReczneKategorie(fraza='{self.fraza}', kategoria='{self.kategoria}')>"
 
+class WersjaRegul(Base):
+    """
+    Model licznika zmian ręcznych reguł - jeden wiersz (id = 1)
+    
+    Każdy zapis lub usunięcie reguły zwiększa licznik, więc procesy aplikacji
+    sprawdzają aktualność swoich reguł odczytem jednego wiersza po kluczu.
+    """
+    __tablename__ = 'wersja_regul'
+    
+    id = Column(Integer, primary_key=True)
+    wersja = Column(Integer, nullable=False, default=0)  # Numer zestawu reguł
+    
+    def __repr__(self):
+        return f"<WersjaRegul(wersja={self.wersja})>"
+
 class KategoriaWydatkow(Base):
     """
     Model dla kategorii wydatków (opcjonalny - do przyszłego rozszerzenia)
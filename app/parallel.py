@@ -0,0 +1,175 @@
+import csv
+import io
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .batch import TransactionBatch
+from .parser import parse_transaction_rows
+
+# Pliki od tego rozmiaru są parsowane równolegle
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+# Liczba rekordów CSV w jednym kawałku wysyłanym do procesu roboczego
+ROWS_PER_CHUNK = 10000
+
+# Liczba procesów roboczych (PARSE_WORKERS, domyślnie liczba procesorów, najwyżej 4)
+MAX_WORKERS = int(os.environ.get("PARSE_WORKERS", 0)) or min(os.cpu_count() or 1, 4)
+
+# Sposób uruchamiania procesów roboczych - bez fork, bo pula powstaje w trakcie
+# działania wątków (pula żądań, zadania importu, import modułów w tle), a proces
+# utworzony przez fork dziedziczy zajęte przez nie blokady
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Pula procesów tworzona przy pierwszym dużym pliku i współdzielona między żądaniami
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Zwraca współdzieloną pulę procesów, tworząc ją przy pierwszym użyciu
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context(START_METHOD)
+            )
+        return _process_pool
+
+def close_process_pool():
+    """
+    Zamyka współdzieloną pulę procesów
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(cancel_futures=True)
+            _process_pool = None
+
+def upload_size(fileobj: BinaryIO) -> int:
+    """
+    Zwraca rozmiar pliku w bajtach bez zmiany bieżącej pozycji
+    """
+    position = fileobj.tell()
+    size = fileobj.seek(0, io.SEEK_END)
+    fileobj.seek(position)
+    return size
+
+def should_parse_in_parallel(fileobj: BinaryIO) -> bool:
+    """
+    Sprawdza czy plik jest na tyle duży, że opłaca się parsowanie w puli procesów
+    """
+    return MAX_WORKERS > 1 and upload_size(fileobj) >= PARALLEL_MIN_BYTES
+
+def dialect_params(dialect: Any) -> Dict[str, Any]:
+    """
+    Zamienia dialekt CSV (np. klasę z csv.Sniffer) na słownik parametrów,
+    który można przesłać do innego procesu
+    """
+    return {
+        'delimiter': dialect.delimiter,
+        'quotechar': dialect.quotechar,
+        'escapechar': dialect.escapechar,
+        'doublequote': dialect.doublequote,
+        'skipinitialspace': dialect.skipinitialspace,
+        'lineterminator': dialect.lineterminator,
+        'quoting': dialect.quoting,
+    }
+
+def iter_record_chunks(lines: Iterable[str], dialect: Any, rows_per_chunk: int = ROWS_PER_CHUNK,
+                       stats: Optional[Dict[str, int]] = None) -> Iterator[str]:
+    """
+    Dzieli linie CSV na kawałki tekstu zawierające całe rekordy
+
+    Granice rekordów wyznacza csv.reader z tym samym dialektem, więc pole
+    w cudzysłowach z nową linią nigdy nie zostanie przecięte. csv.reader
+    pobiera kolejne linie tylko wtedy, gdy potrzebuje ich do bieżącego
+    rekordu, więc bufor zawsze kończy się na granicy rekordu.
+    """
+    buffer: List[str] = []
+
+    def feed():
+        for line in lines:
+            buffer.append(line)
+            yield line
+
+    if stats is not None:
+        stats.setdefault('rows', 0)
+
+    rows = 0
+    for _ in csv.reader(feed(), **dialect_params(dialect)):
+        rows += 1
+        if rows >= rows_per_chunk:
+            if stats is not None:
+                stats['rows'] += rows
+            yield ''.join(buffer)
+            buffer.clear()
+            rows = 0
+
+    if stats is not None:
+        stats['rows'] += rows
+
+    if buffer:
+        yield ''.join(buffer)
+
+def parse_chunk(chunk: str, fieldnames: List[str], params: Dict[str, Any],
+                column_mapping: Dict[str, str]) -> Tuple[TransactionBatch, Dict[str, int]]:
+    """
+    Parsuje kawałek CSV bez nagłówka w procesie roboczym
+
+    Returns:
+        Krotka (paczka transakcji - przesyłana do procesu głównego kolumnami, liczby odrzuconych wierszy z parse_transaction_rows)
+    """
+    reader = csv.DictReader(io.StringIO(chunk, newline=''), fieldnames=fieldnames, **params)
+    rejected: Dict[str, int] = {}
+    return parse_transaction_rows(reader, column_mapping, stats=rejected), rejected
+
+def parse_csv_parallel(lines: Iterable[str], fieldnames: List[str], dialect: Any, column_mapping: Dict[str, str],
+                       executor: Optional[Executor] = None, rows_per_chunk: int = ROWS_PER_CHUNK,
+                       stats: Optional[Dict[str, int]] = None) -> TransactionBatch:
+    """
+    Parsuje rekordy CSV w puli procesów i scala wyniki w kolejności z pliku
+
+    Dialekt i mapowanie kolumn są wykrywane raz przez wywołującego. Liczba
+    kawałków w toku jest ograniczona, więc plik nie trafia do pamięci w całości.
+
+    Args:
+        lines: Linie CSV po nagłówku
+        fieldnames: Nagłówki kolumn
+        dialect: Wykryty dialekt CSV
+        column_mapping: Mapowanie 'data'/'kwota'/'opis' -> nazwa kolumny
+        executor: Pula do użycia (domyślnie współdzielona pula procesów)
+        rows_per_chunk: Liczba rekordów w kawałku
+        stats: Słownik, w którym pod kluczem 'rows' zapisywana jest liczba przeczytanych rekordów,
+            a pod 'rejected_date'/'rejected_amount' liczby odrzuconych wierszy
+
+    Returns:
+        Paczka transakcji w kolejności z pliku
+    """
+    executor = executor or get_process_pool()
+    params = dialect_params(dialect)
+    max_in_flight = 2 * MAX_WORKERS
+
+    transactions = TransactionBatch()
+    pending = deque()
+
+    def collect():
+        chunk_transactions, rejected = pending.popleft().result()
+        transactions.extend(chunk_transactions)
+        if stats is not None:
+            for key, count in rejected.items():
+                stats[key] = stats.get(key, 0) + count
+
+    for chunk in iter_record_chunks(lines, dialect, rows_per_chunk, stats):
+        pending.append(executor.submit(parse_chunk, chunk, fieldnames, params, column_mapping))
+        if len(pending) >= max_in_flight:
+            collect()
+
+    while pending:
+        collect()
+
+    return transactions
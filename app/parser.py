@@ -1,7 +1,244 @@
 import csv
 import io
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional
 from datetime import datetime
+from itertools import chain, islice
+
+from .batch import TransactionBatch, day_number
+
+# Mapa kolumn do rozpoznawania różnych formatów CSV
+COLUMN_MAPPING = {
+    "data": ["data", "Data", "Data operacji", "Transaction Date", "DATA", "Date", "Transaction date"],
+    "kwota": ["kwota", "Kwota", "Amount", "Wartość", "Cena", "Kwota operacji", "KWOTA"],
+    "opis": ["opis", "Opis", "Tytuł", "Description", "Tytuł operacji", "OPIS", "Title"],
+    "saldo": ["saldo", "Saldo", "Balance", "SALDO"]
+}
+
+def detect_column_mapping(headers):
+    """
+    Wykrywa mapowanie kolumn na podstawie nagłówków CSV
+    """
+    mapping = {}
+    detected_columns = []
+    
+    for standard_name, possible_names in COLUMN_MAPPING.items():
+        for header in headers:
+            if header.strip() in possible_names:
+                mapping[standard_name] = header.strip()
+                detected_columns.append(header.strip())
+                break
+    
+    return mapping, detected_columns
+
+def normalize_amount(amount_str: str) -> str:
+    """
+    Usuwa z kwoty cudzysłowy i spacje oraz ujednolica separatory do zapisu float
+    """
+    # Usuń cudzysłowy i apostrofy
+    cleaned = amount_str.replace('"', '').replace("'", '').strip()
+    
+    # Usuń spacje z liczb
+    cleaned = cleaned.replace(' ', '')
+    
+    # Zamień przecinki na kropki w liczbach
+    if ',' in cleaned and '.' not in cleaned:
+        # Jeśli jest tylko przecinek, to prawdopodobnie separator dziesiętny
+        cleaned = cleaned.replace(',', '.')
+    elif ',' in cleaned and '.' in cleaned:
+        # Jeśli są oba, to przecinek to separator tysięcy
+        cleaned = cleaned.replace(',', '')
+    
+    return cleaned
+
+def clean_amount(amount_str):
+    """
+    Czyści i konwertuje kwotę na float
+    """
+    if not amount_str:
+        return 0.0
+    
+    try:
+        return float(normalize_amount(amount_str))
+    except ValueError:
+        print(f"Invalid amount: {amount_str}")
+        return None
+
+# Liczba wierszy, na podstawie których wykrywany jest format dat
+DATE_SAMPLE_SIZE = 50
+
+# Obsługiwane formaty dat, w kolejności próbowania
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%d.%m.%Y",
+    "%m/%d/%Y",
+    "%d-%m-%Y",
+    "%Y/%m/%d"
+]
+
+def parse_date(date_str):
+    """
+    Parsuje datę w różnych formatach
+    """
+    if not date_str:
+        return None
+    
+    date_str = date_str.strip()
+    
+    # Próbuj różne formaty dat
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    
+    # Jeśli nie udało się z datetime, spróbuj dateutil (importowany przy pierwszym użyciu)
+    try:
+        from dateutil import parser as date_parser
+        parsed_date = date_parser.parse(date_str)
+        return parsed_date.strftime("%Y-%m-%d")
+    except:
+        print(f"Invalid date format: {date_str}")
+        return None
+
+def infer_date_format(values: Iterable[Optional[str]]) -> Optional[str]:
+    """
+    Wykrywa format dat kolumny na podstawie próbki wartości
+    
+    Returns:
+        Format z DATE_FORMATS pasujący do największej liczby wartości lub None
+    """
+    hits = dict.fromkeys(DATE_FORMATS, 0)
+    
+    for value in values:
+        if not value:
+            continue
+        value = value.strip()
+        for fmt in DATE_FORMATS:
+            try:
+                datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            hits[fmt] += 1
+            break
+    
+    best = max(DATE_FORMATS, key=lambda fmt: hits[fmt])
+    return best if hits[best] else None
+
+class DateParser:
+    """
+    Parser dat jednej kolumny pliku
+    
+    Format jest wykrywany raz (z próbki lub pierwszej poprawnej daty) i używany
+    dla kolejnych wierszy zamiast próbowania wszystkich formatów. Wyciągi mają
+    niewiele różnych dat, więc wyniki są dodatkowo zapamiętywane. Wiersze, które
+    nie pasują do formatu, przechodzą przez pełne parse_date - wynik jest zawsze
+    taki sam jak z parse_date, bo każda data pasuje co najwyżej do jednego formatu.
+    """
+    
+    # Maksymalna liczba zapamiętanych wartości
+    CACHE_SIZE = 4096
+    
+    def __init__(self, date_format: Optional[str] = None):
+        self.date_format = date_format
+        self.fallbacks = 0  # Liczba wierszy sprawdzanych wszystkimi formatami
+        self._cache: Dict[str, Optional[str]] = {}
+    
+    def parse(self, date_str: Optional[str]) -> Optional[str]:
+        """
+        Parsuje datę do formatu YYYY-MM-DD lub zwraca None
+        """
+        if not date_str:
+            return None
+        
+        try:
+            return self._cache[date_str]
+        except KeyError:
+            pass
+        
+        result = self._parse_uncached(date_str)
+        
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[date_str] = result
+        
+        return result
+    
+    def _parse_uncached(self, date_str: str) -> Optional[str]:
+        if self.date_format:
+            try:
+                return datetime.strptime(date_str.strip(), self.date_format).strftime("%Y-%m-%d")
+            except ValueError:
+                pass
+        
+        # Wiersz odstający - pełne próbowanie formatów
+        self.fallbacks += 1
+        if self.date_format is None:
+            self.date_format = infer_date_format([date_str])
+        
+        return parse_date(date_str)
+
+def parse_transaction_rows(rows: Iterable[Dict[str, Optional[str]]], column_mapping: Dict[str, str],
+                           stats: Optional[Dict[str, int]] = None) -> TransactionBatch:
+    """
+    Zamienia wiersze CSV na paczkę transakcji (data, opis, kwota) według mapowania kolumn
+    
+    Wiersze z nieprawidłową datą lub kwotą są pomijane. Jeśli mapowanie zawiera
+    kolumnę 'saldo', transakcje dostają też saldo (brak salda, gdy jest nieprawidłowe).
+    
+    Args:
+        rows: Wiersze z csv.DictReader
+        column_mapping: Mapowanie 'data'/'kwota'/'opis' (i opcjonalnie 'saldo') -> nazwa kolumny w pliku
+        stats: Słownik, do którego dodawana jest liczba wierszy odrzuconych
+            z powodu daty ('rejected_date') i kwoty ('rejected_amount')
+        
+    Returns:
+        Paczka transakcji
+    """
+    date_column = column_mapping["data"]
+    amount_column = column_mapping["kwota"]
+    description_column = column_mapping["opis"]
+    balance_column = column_mapping.get("saldo")
+    
+    # Format dat wykrywany raz z próbki pierwszych wierszy
+    rows = iter(rows)
+    sample = list(islice(rows, DATE_SAMPLE_SIZE))
+    dates = DateParser(infer_date_format(row.get(date_column) for row in sample))
+    
+    transactions = TransactionBatch()
+    # Wyciągi mają niewiele różnych dat - każda jest zamieniana na numer dnia raz
+    days: Dict[str, int] = {}
+    rejected_dates = rejected_amounts = 0
+    for row in chain(sample, rows):
+        # Pobierz wartości z odpowiednich kolumn
+        date_raw = row.get(date_column, "")
+        amount_raw = row.get(amount_column, "")
+        description_raw = row.get(description_column, "")
+        
+        # Parsuj datę
+        parsed_date = dates.parse(date_raw)
+        if not parsed_date:
+            print(f"Invalid date: {date_raw}")
+            rejected_dates += 1
+            continue
+        
+        # Parsuj kwotę
+        parsed_amount = clean_amount(amount_raw)
+        if parsed_amount is None:
+            rejected_amounts += 1
+            continue
+        
+        day = days.get(parsed_date)
+        if day is None:
+            day = days[parsed_date] = day_number(parsed_date)
+        
+        balance = clean_amount(row.get(balance_column, "")) if balance_column is not None else None
+        transactions.append(day, description_raw.strip(), parsed_amount, balance)
+    
+    if stats is not None:
+        stats['rejected_date'] = stats.get('rejected_date', 0) + rejected_dates
+        stats['rejected_amount'] = stats.get('rejected_amount', 0) + rejected_amounts
+    
+    return transactions
 
 class CSVParser:
     """
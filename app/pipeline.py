@@ -0,0 +1,427 @@
+import csv
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+from . import metrics as app_metrics
+from . import storage
+from .analyzer import ExpenseAnalyzer
+from .batch import TransactionBatch, TransactionRow
+from .categorizer import TransactionCategorizer
+from .parallel import parse_csv_parallel, should_parse_in_parallel, upload_size
+from .parser import detect_column_mapping, parse_transaction_rows
+from .rule_cache import manual_rules_cache
+from .streaming import CHUNK_SIZE, iter_decoded_chunks, iter_lines, read_sample, sniff_dialect, spool_upload
+from .upload_cache import UploadCache, upload_cache_key, upload_digest
+
+# Kolumny, bez których nie da się przetworzyć pliku
+REQUIRED_COLUMNS = ["data", "kwota", "opis"]
+
+# Pliki od tego rozmiaru są parsowane kolumnowo przez pandas zamiast wiersz po wierszu
+COLUMNAR_MIN_BYTES = 256 * 1024
+
+# Co ile wierszy parsowanych wiersz po wierszu zgłaszany jest postęp
+PROGRESS_ROWS = 10000
+
+class IngestionError(Exception):
+    """
+    Błąd przetwarzania pliku z komunikatem dla użytkownika
+    """
+
+class MissingColumnsError(IngestionError):
+    """
+    W pliku brakuje wymaganych (lub wybranych ręcznie) kolumn
+    """
+
+    def __init__(self, message: str, missing: List[str], detected_columns: List[str]):
+        super().__init__(message)
+        self.missing = missing
+        self.detected_columns = detected_columns
+
+class StageMetrics:
+    """
+    Pomiary jednego etapu przetwarzania: czas, wiersze na wejściu i wyjściu, bajty
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes': self.bytes
+        }
+
+class IngestionResult:
+    """
+    Wynik przetworzenia pliku wraz z pomiarami wszystkich etapów
+    """
+
+    def __init__(self):
+        self.source: Optional[BinaryIO] = None
+        self.dialect: Any = None
+        self.headers: List[str] = []
+        self.column_mapping: Dict[str, str] = {}
+        self.detected_columns: List[str] = []
+        self.transactions = TransactionBatch()  # Transakcje z pliku
+        self.categorized = TransactionBatch()   # Ta sama paczka po kategoryzacji
+        self.unassigned: List[TransactionRow] = []
+        self.analysis: Optional[Dict[str, Any]] = None
+        self.analysis_ids: List[int] = []
+        self.deduplicated = 0
+        self.cache_hit = False
+        self.stages: List[StageMetrics] = []
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Zwraca pomiary etapów i sumy w postaci słownika
+        """
+        return {
+            'stages': [stage.to_dict() for stage in self.stages],
+            'total_seconds': self.total_seconds,
+            'bytes': max((stage.bytes for stage in self.stages), default=0),
+            'deduplicated': self.deduplicated,
+            'cache_hit': self.cache_hit
+        }
+
+    def server_timing(self) -> str:
+        """
+        Zwraca wartość nagłówka Server-Timing (czasy etapów w milisekundach)
+        """
+        timings = [f"{stage.name};dur={stage.seconds * 1000:.1f}" for stage in self.stages]
+        timings.append(f"total;dur={self.total_seconds * 1000:.1f}")
+        return ', '.join(timings)
+
+    def summary(self) -> str:
+        """
+        Zwraca jednoliniowe podsumowanie etapów do logów
+        """
+        stages = ' '.join(
+            f"{stage.name}={stage.seconds * 1000:.1f}ms({stage.rows_in}->{stage.rows_out})"
+            for stage in self.stages
+        )
+        cache = 'hit' if self.cache_hit else 'miss'
+        return (f"{stages} total={self.total_seconds * 1000:.1f}ms bytes={self.metrics()['bytes']} "
+                f"deduplicated={self.deduplicated} cache={cache}")
+
+class IngestionPipeline:
+    """
+    Przetwarzanie przesłanego pliku CSV etapami: dekodowanie, wykrycie formatu,
+    mapowanie kolumn, parsowanie, kategoryzacja, analiza tygodni i zapis do bazy
+
+    Każdy etap zapisuje czas, liczbę wierszy na wejściu i wyjściu oraz liczbę
+    bajtów. Dekodowanie odbywa się strumieniowo w trakcie mapowania i parsowania,
+    więc jego czas jest mierzony osobno i odejmowany od czasu tych etapów.
+
+    Z pamięcią podręczną (UploadCache) wynik parsowania i kategoryzacji jest
+    zapisywany pod kluczem z SHA-256 pliku, wybranych kolumn i odcisku reguł
+    kategoryzatora. Ponowne przesłanie tego samego pliku pomija wykrywanie
+    formatu, mapowanie, parsowanie i kategoryzację, a gdy zapisane wcześniej
+    analizy nadal istnieją - także analizę i zapis.
+    """
+
+    STAGES = ['decode', 'cache', 'sniff', 'map', 'parse', 'categorize', 'analyze', 'persist']
+
+    def __init__(self, column_mapping: Optional[Dict[str, str]] = None,
+                 categorizer: Optional[TransactionCategorizer] = None,
+                 analyzer: Optional[ExpenseAnalyzer] = None,
+                 persist: bool = True, encoding: str = 'utf-8', chunk_size: int = CHUNK_SIZE,
+                 cache: Optional[UploadCache] = None,
+                 progress: Optional[Callable[[str, int], None]] = None):
+        """
+        Args:
+            column_mapping: Ręcznie wybrane kolumny (domyślnie wykrywane z nagłówków)
+            categorizer: Kategoryzator (domyślnie z ręcznymi regułami z bazy)
+            analyzer: Analizator wydatków
+            persist: Czy zapisywać analizy tygodni do bazy
+            encoding: Kodowanie pliku
+            chunk_size: Rozmiar kawałka czytanego z pliku
+            cache: Pamięć podręczna wyników (None - bez pamięci podręcznej)
+            progress: Funkcja wywoływana z nazwą etapu i liczbą przeczytanych
+                wierszy na początku każdego etapu i co PROGRESS_ROWS wierszy
+        """
+        self.column_mapping = column_mapping
+        self.categorizer = categorizer
+        self.analyzer = analyzer or ExpenseAnalyzer()
+        self.persist = persist
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.progress = progress
+
+    def run(self, fileobj: BinaryIO) -> IngestionResult:
+        """
+        Przetwarza plik i zwraca wynik z pomiarami etapów
+
+        Raises:
+            IngestionError: Gdy nie można odczytać nagłówków lub brakuje kolumn
+        """
+        result = IngestionResult()
+        self._metrics = {name: StageMetrics(name) for name in self.STAGES}
+        result.stages = [self._metrics[name] for name in self.STAGES]
+        self._entered = set()
+        self._run_categorizer = self.categorizer
+        cache_key: Optional[str] = None
+        cached: Optional[Dict[str, Any]] = None
+
+        try:
+            with self._stage('decode') as metrics:
+                result.source = spool_upload(fileobj, chunk_size=self.chunk_size)
+                metrics.bytes = upload_size(result.source)
+                app_metrics.UPLOAD_SIZE_BYTES.observe(metrics.bytes)
+
+            if self.cache is not None:
+                with self._stage('cache') as metrics:
+                    metrics.bytes = self._metrics['decode'].bytes
+                    cache_key = upload_cache_key(
+                        upload_digest(result.source, chunk_size=self.chunk_size),
+                        self.column_mapping,
+                        self._get_categorizer().rules_fingerprint()
+                    )
+                    cached = self.cache.get(cache_key)
+                    app_metrics.UPLOAD_CACHE_LOOKUPS.inc(result='miss' if cached is None else 'hit')
+                    if cached is not None:
+                        self._restore(result, cached)
+                        metrics.rows_out = len(result.categorized)
+
+            if cached is None:
+                with self._stage('sniff') as metrics:
+                    sample = read_sample(result.source, encoding=self.encoding)
+                    result.dialect = sniff_dialect(sample)
+                    metrics.bytes = len(sample.encode(self.encoding))
+
+                with self._stage('map'):
+                    lines = self._open_lines(result.source)
+                    csv_reader = csv.DictReader(lines, dialect=result.dialect)
+                    self._map_columns(result, csv_reader.fieldnames)
+
+                with self._stage('parse') as metrics:
+                    stats: Dict[str, int] = {}
+                    result.transactions = self._parse(result, lines, csv_reader, metrics, stats)
+                    metrics.rows_out = len(result.transactions)
+                    metrics.bytes = self._metrics['decode'].bytes
+
+                app_metrics.PARSED_ROWS.inc(len(result.transactions))
+                app_metrics.REJECTED_ROWS.inc(stats.get('rejected_date', 0), field='date')
+                app_metrics.REJECTED_ROWS.inc(stats.get('rejected_amount', 0), field='amount')
+
+                with self._stage('categorize') as metrics:
+                    metrics.rows_in = len(result.transactions)
+                    result.categorized, result.unassigned = self._categorize(result.transactions)
+                    metrics.rows_out = len(result.categorized)
+
+            with self._stage('analyze') as metrics:
+                metrics.rows_in = len(result.categorized)
+                result.analysis = self.analyzer.analyze_all_weeks(result.categorized)
+                metrics.rows_out = len(result.analysis['weeks'])
+
+            if cached is not None and self.persist and self._analyses_exist(cached):
+                # Plik był już przetworzony i zapisany - wystarczą zapisane analizy
+                result.analysis_ids = list(cached['analysis_ids'])
+                return result
+
+            if self.persist:
+                with self._stage('persist') as metrics:
+                    persist_stats: Dict[str, Any] = {}
+                    for week in result.analysis['weeks']:
+                        if week['transaction_count']:
+                            metrics.rows_in += week['transaction_count']
+                            analysis_id = storage.save_analysis(week, stats=persist_stats)
+                            if analysis_id is not None:
+                                result.analysis_ids.append(analysis_id)
+                    result.deduplicated = persist_stats.get('deduplicated', 0)
+                    metrics.rows_out = metrics.rows_in - result.deduplicated
+                app_metrics.DEDUPLICATED_ROWS.inc(result.deduplicated)
+
+            if cache_key is not None and result.transactions:
+                with self._stage('cache'):
+                    self.cache.put(cache_key, self._cache_entry(result))
+        finally:
+            for stage in result.stages:
+                if stage.name in self._entered:
+                    app_metrics.INGESTION_STAGE_SECONDS.observe(stage.seconds, stage=stage.name)
+            print(f"PIPELINE: {result.summary()}")
+
+        return result
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[StageMetrics]:
+        """
+        Mierzy czas etapu bez czasu dekodowania wykonanego w jego trakcie
+        """
+        metrics = self._metrics[name]
+        self._entered.add(name)
+        if self.progress is not None:
+            self.progress(name, self._metrics['parse'].rows_in)
+
+        decode = self._metrics['decode']
+        decode_before = decode.seconds
+        started = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            elapsed = time.perf_counter() - started
+            if name != 'decode':
+                elapsed -= decode.seconds - decode_before
+            metrics.seconds += elapsed
+
+    def _open_lines(self, source: BinaryIO) -> Iterator[str]:
+        """
+        Otwiera plik jako strumień linii, doliczając dekodowanie do etapu 'decode'
+        """
+        source.seek(0)
+        chunks = iter_decoded_chunks(source, encoding=self.encoding, chunk_size=self.chunk_size)
+        return iter_lines(self._timed(chunks, self._metrics['decode']))
+
+    def _timed(self, iterable: Iterable[Any], metrics: StageMetrics) -> Iterator[Any]:
+        """
+        Dolicza czas pobierania kolejnych elementów do podanego etapu
+        """
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                metrics.seconds += time.perf_counter() - started
+                return
+            metrics.seconds += time.perf_counter() - started
+            yield item
+
+    def _count(self, rows: Iterable[Any], metrics: StageMetrics) -> Iterator[Any]:
+        """
+        Zlicza wiersze przekazywane do parsera
+        """
+        for row in rows:
+            metrics.rows_in += 1
+            if self.progress is not None and metrics.rows_in % PROGRESS_ROWS == 0:
+                self.progress(metrics.name, metrics.rows_in)
+            yield row
+
+    def _map_columns(self, result: IngestionResult, headers: Optional[List[str]]):
+        """
+        Wykrywa kolumny z nagłówków albo sprawdza kolumny wybrane ręcznie
+        """
+        if not headers:
+            raise IngestionError("Nie można odczytać nagłówków CSV")
+
+        result.headers = headers
+
+        if self.column_mapping is not None:
+            result.column_mapping = dict(self.column_mapping)
+            result.detected_columns = [result.column_mapping[key] for key in REQUIRED_COLUMNS]
+
+            missing = [col for col in result.detected_columns if col not in headers]
+            if missing:
+                raise MissingColumnsError(
+                    f"Wybrane kolumny nie istnieją: {', '.join(missing)}. Dostępne kolumny: {', '.join(headers)}",
+                    missing, result.detected_columns
+                )
+            return
+
+        result.column_mapping, result.detected_columns = detect_column_mapping(headers)
+
+        missing = [col for col in REQUIRED_COLUMNS if col not in result.column_mapping]
+        if missing:
+            raise MissingColumnsError(
+                f"Nie wykryto kolumn: {', '.join(missing)}", missing, result.detected_columns
+            )
+
+    def _parse(self, result: IngestionResult, lines: Iterator[str], csv_reader: csv.DictReader,
+               metrics: StageMetrics, stats: Dict[str, int]) -> TransactionBatch:
+        """
+        Parsuje transakcje sposobem dobranym do rozmiaru pliku
+
+        Duże pliki są parsowane równolegle w puli procesów, średnie kolumnowo
+        przez pandas, a małe wiersz po wierszu z csv.DictReader.
+        """
+        source, dialect, column_mapping = result.source, result.dialect, result.column_mapping
+
+        if should_parse_in_parallel(source):
+            transactions = parse_csv_parallel(lines, csv_reader.fieldnames, dialect, column_mapping, stats=stats)
+            metrics.rows_in = stats.get('rows', 0)
+            return transactions
+
+        if upload_size(source) >= COLUMNAR_MIN_BYTES:
+            # pandas jest importowany przy pierwszym takim pliku, a nie przy starcie aplikacji
+            from .columnar import parse_transaction_columns, read_csv_columns
+            
+            try:
+                columns = read_csv_columns(source, dialect, column_mapping, encoding=self.encoding)
+            except ValueError as e:
+                # pandas odczytał plik inaczej niż csv (np. nagłówek z BOM) - parsuj wierszami
+                print(f"Parsowanie kolumnowe nie powiodło się, parsowanie wierszami: {e}")
+                csv_reader = csv.DictReader(self._open_lines(source), dialect=dialect)
+            else:
+                transactions, invalid = parse_transaction_columns(columns, column_mapping, stats=stats)
+                metrics.rows_in = len(invalid)
+                return transactions
+
+        return parse_transaction_rows(self._count(csv_reader, metrics), column_mapping, stats=stats)
+
+    def _get_categorizer(self) -> TransactionCategorizer:
+        """
+        Zwraca kategoryzator bieżącego przetwarzania
+
+        Domyślnie jest to kategoryzator współdzielony w procesie: z bazy
+        odczytywany jest tylko licznik zmian reguł, a reguły są wczytywane
+        i kompilowane ponownie tylko po ich zmianie.
+        """
+        if self._run_categorizer is None:
+            self._run_categorizer = manual_rules_cache.get_categorizer()
+        return self._run_categorizer
+
+    def _cache_entry(self, result: IngestionResult) -> Dict[str, Any]:
+        """
+        Wpis pamięci podręcznej: wynik parsowania i kategoryzacji oraz zapisane analizy
+
+        Wpis zawiera tylko typy JSON - paczka transakcji jest zapisywana
+        kolumnami, a nieprzypisane transakcje numerami wierszy paczki.
+        Kategoryzator wpisuje kategorie do paczki z pliku, więc wystarczy
+        zapisać ją raz. Analiza tygodni jest liczona od nowa z paczki.
+        """
+        return {
+            'headers': result.headers,
+            'column_mapping': result.column_mapping,
+            'detected_columns': result.detected_columns,
+            'batch': result.categorized.to_columns(),
+            'unassigned': [row.index for row in result.unassigned],
+            'analysis_ids': result.analysis_ids,
+            'saved_transaction_count': storage.count_transactions(result.analysis_ids) if result.analysis_ids else 0
+        }
+
+    def _restore(self, result: IngestionResult, cached: Dict[str, Any]):
+        """
+        Odtwarza wynik parsowania i kategoryzacji z wpisu pamięci podręcznej
+        """
+        result.cache_hit = True
+        result.headers = cached['headers']
+        result.column_mapping = cached['column_mapping']
+        result.detected_columns = cached['detected_columns']
+        result.transactions = result.categorized = TransactionBatch.from_columns(cached['batch'])
+        result.unassigned = [TransactionRow(result.categorized, index) for index in cached['unassigned']]
+
+    def _analyses_exist(self, cached: Dict[str, Any]) -> bool:
+        """
+        Sprawdza, czy analizy z poprzedniego przesłania pliku nadal są w bazie
+        """
+        analysis_ids = cached['analysis_ids']
+        return bool(analysis_ids) and storage.count_transactions(analysis_ids) == cached.get('saved_transaction_count')
+
+    def _categorize(self, transactions: TransactionBatch):
+        """
+        Przypisuje kategorie w paczce transakcji z pliku (brak salda zapisywany jest jako 0)
+        """
+        transactions.fill_missing_balances(0.0)
+        return self._get_categorizer().categorize_transactions(transactions)
@@ -0,0 +1,195 @@
+import asyncio
+import cProfile
+import functools
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, List, Optional
+
+from starlette.requests import Request
+
+# Profilowanie jest wyłączone, dopóki nie ustawiono PROFILE_UPLOADS=1
+PROFILE_UPLOADS = os.environ.get("PROFILE_UPLOADS", "") == "1"
+
+# Katalog profili (plik .prof dla pstats/snakeviz i podsumowanie .txt)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "budget-control-profiles"))
+
+# Opcjonalny sekret - nagłówek musi mieć tę wartość (bez sekretu wystarczy dowolna)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+
+# Nagłówek żądania włączający profilowanie i nagłówek odpowiedzi z nazwą profilu
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Liczba przechowywanych profili (najstarsze są usuwane) i funkcji w podsumowaniu
+MAX_PROFILES = 50
+SUMMARY_FUNCTIONS = 30
+
+class RequestProfiler:
+    """
+    Profilowanie wybranych żądań przez cProfile, na żądanie i bez ponownego wdrożenia
+
+    Żądanie jest profilowane tylko przy włączonym profilowaniu i z nagłówkiem
+    X-Profile (równym PROFILE_TOKEN, jeśli jest ustawiony). Jednocześnie
+    profilowane jest jedno żądanie - cProfile mierzy cały wątek, więc
+    równoległe profile mieszałyby się ze sobą; pozostałe żądania są wtedy
+    obsługiwane bez profilowania.
+    """
+
+    def __init__(self, enabled: bool = PROFILE_UPLOADS, directory: str = PROFILE_DIR,
+                 token: Optional[str] = PROFILE_TOKEN, max_profiles: int = MAX_PROFILES,
+                 summary_functions: int = SUMMARY_FUNCTIONS):
+        """
+        Args:
+            enabled: Czy profilowanie jest włączone
+            directory: Katalog zapisu profili
+            token: Wymagana wartość nagłówka X-Profile (None - dowolna niepusta)
+            max_profiles: Liczba przechowywanych profili
+            summary_functions: Liczba funkcji w każdej tabeli podsumowania
+        """
+        self.enabled = enabled
+        self.directory = directory
+        self.token = token
+        self.max_profiles = max_profiles
+        self.summary_functions = summary_functions
+        self._lock = threading.Lock()
+
+    def requested(self, request: Request) -> bool:
+        """
+        Sprawdza, czy żądanie prosi o profilowanie
+        """
+        if not self.enabled:
+            return False
+        value = request.headers.get(PROFILE_HEADER)
+        if not value:
+            return False
+        return self.token is None or value == self.token
+
+    def profile(self, name: str) -> Callable:
+        """
+        Dekorator endpointu (async lub zwykłego) z parametrem `request`
+
+        Profil obejmuje wywołanie endpointu; po zapisie nazwa profilu trafia
+        do nagłówka X-Profile-Id odpowiedzi. Zwykły endpoint FastAPI wywołuje
+        w puli wątków - cProfile mierzy wtedy wątek, który wykonuje endpoint.
+        """
+        def decorator(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+            if asyncio.iscoroutinefunction(endpoint):
+                @functools.wraps(endpoint)
+                async def async_wrapper(*args, **kwargs):
+                    if not self._acquire(kwargs.get("request")):
+                        return await endpoint(*args, **kwargs)
+
+                    profiler = cProfile.Profile()
+                    started = time.perf_counter()
+                    try:
+                        profiler.enable()
+                        try:
+                            response = await endpoint(*args, **kwargs)
+                        finally:
+                            profiler.disable()
+                    finally:
+                        self._lock.release()
+                    return self._finish(profiler, name, started, response)
+                return async_wrapper
+
+            @functools.wraps(endpoint)
+            def wrapper(*args, **kwargs):
+                if not self._acquire(kwargs.get("request")):
+                    return endpoint(*args, **kwargs)
+
+                profiler = cProfile.Profile()
+                started = time.perf_counter()
+                try:
+                    profiler.enable()
+                    try:
+                        response = endpoint(*args, **kwargs)
+                    finally:
+                        profiler.disable()
+                finally:
+                    self._lock.release()
+                return self._finish(profiler, name, started, response)
+            return wrapper
+        return decorator
+
+    def _acquire(self, request: Optional[Request]) -> bool:
+        """
+        Sprawdza, czy żądanie ma być profilowane, i zajmuje blokadę profilowania
+        """
+        return request is not None and self.requested(request) and self._lock.acquire(blocking=False)
+
+    def _finish(self, profiler: cProfile.Profile, name: str, started: float, response: Any) -> Any:
+        """
+        Zapisuje profil i dopisuje jego nazwę do nagłówków odpowiedzi
+        """
+        profile_id = self.save(profiler, name, time.perf_counter() - started)
+        if profile_id is not None:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    def save(self, profiler: cProfile.Profile, name: str, elapsed: float) -> Optional[str]:
+        """
+        Zapisuje profil i podsumowanie najkosztowniejszych funkcji
+
+        Args:
+            profiler: Zatrzymany profiler
+            name: Nazwa profilowanej operacji
+            elapsed: Czas operacji w sekundach
+
+        Returns:
+            Nazwa profilu (pliki <nazwa>.prof i <nazwa>.txt) albo None przy błędzie zapisu
+        """
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, profile_id)
+            profiler.dump_stats(path + ".prof")
+            with open(path + ".txt", "w", encoding="utf-8") as f:
+                f.write(self.summary(profiler, name, elapsed))
+            self._prune()
+        except OSError as e:
+            print(f"Nie udało się zapisać profilu {profile_id}: {e}")
+            return None
+
+        print(f"Zapisano profil {name} ({elapsed:.3f}s): {path}.prof")
+        return profile_id
+
+    def summary(self, profiler: cProfile.Profile, name: str, elapsed: float) -> str:
+        """
+        Podsumowanie profilu: funkcje o największym czasie łącznym i własnym
+        """
+        output = io.StringIO()
+        output.write(f"Profil: {name}\nCzas: {elapsed:.3f}s\n")
+        for sort, title in ((pstats.SortKey.CUMULATIVE, "czas łączny"), (pstats.SortKey.TIME, "czas własny")):
+            output.write(f"\n=== Najkosztowniejsze funkcje ({title}) ===\n")
+            stats = pstats.Stats(profiler, stream=output)
+            stats.strip_dirs().sort_stats(sort).print_stats(self.summary_functions)
+        return output.getvalue()
+
+    def list_profiles(self) -> List[str]:
+        """
+        Zwraca nazwy zapisanych profili od najnowszego
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".prof")]
+        except OSError:
+            return []
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [entry.name[:-len(".prof")] for entry in entries]
+
+    def _prune(self):
+        """
+        Usuwa najstarsze profile ponad max_profiles
+        """
+        for profile_id in self.list_profiles()[self.max_profiles:]:
+            for suffix in (".prof", ".txt"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except OSError:
+                    pass
+
+request_profiler = RequestProfiler()
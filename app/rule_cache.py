@@ -0,0 +1,71 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from . import storage
+from .categorizer import TransactionCategorizer
+from .metrics import MANUAL_RULES_CACHE_LOOKUPS
+
+class ManualRulesCache:
+    """
+    Ręczne reguły kategoryzacji zapamiętane w procesie aplikacji
+
+    Reguły są wczytywane z bazy tylko po zmianie licznika wersja_regul, który
+    zwiększa każdy zapis i usunięcie reguły - także w innym procesie (workerze
+    uvicorn). Przed każdym przetwarzaniem wystarczy więc odczyt jednego
+    wiersza po kluczu zamiast całej tabeli reczne_kategorie.
+
+    Licznik jest czytany przed regułami: jeśli reguły zmienią się w trakcie
+    wczytywania, zapamiętana wersja jest starsza niż w bazie i następne
+    sprawdzenie wczyta je ponownie.
+
+    Razem z regułami zapamiętany jest kategoryzator zbudowany z tych reguł
+    (skompilowany zestaw reguł i pamięć podręczna opisów), współdzielony
+    przez kolejne pliki do następnej zmiany reguł.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manager: Optional[storage.DatabaseManager] = None
+        self._version: Optional[int] = None
+        self._rules: List[Dict[str, Any]] = []
+        self._categorizer: Optional[TransactionCategorizer] = None
+        self._categorizer_rules: Optional[List[Dict[str, Any]]] = None
+
+    def get(self) -> List[Dict[str, Any]]:
+        """
+        Zwraca aktualne reguły w formacie wczytaj_reczne_kategorie
+
+        Lista jest współdzielona między wywołaniami - nie należy jej modyfikować.
+        """
+        version = storage.get_rules_version()
+        with self._lock:
+            # Inna baza (np. podmieniona w testach) ma własny licznik
+            if version == self._version and storage.db_manager is self._manager:
+                MANUAL_RULES_CACHE_LOOKUPS.inc(result='hit')
+                return self._rules
+
+        rules = storage.wczytaj_reczne_kategorie()
+        with self._lock:
+            self._manager = storage.db_manager
+            self._version = version
+            self._rules = rules
+        MANUAL_RULES_CACHE_LOOKUPS.inc(result='reload')
+        return rules
+
+    def get_categorizer(self) -> TransactionCategorizer:
+        """
+        Zwraca kategoryzator z aktualnymi regułami, współdzielony w procesie
+
+        Po zmianie reguł budowany jest nowy kategoryzator zamiast zmiany
+        istniejącego - przetwarzanie w toku kończy plik na regułach, z którymi
+        zaczęło (i z odciskiem reguł użytym w kluczu pamięci podręcznej plików).
+        """
+        rules = self.get()
+        with self._lock:
+            # Każde wczytanie reguł daje nową listę
+            if self._categorizer_rules is not rules:
+                self._categorizer = TransactionCategorizer(rules)
+                self._categorizer_rules = rules
+            return self._categorizer
+
+manual_rules_cache = ManualRulesCache()
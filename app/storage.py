@@ -1,9 +1,17 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from typing import List, Dict, Any, Optional
+from sqlalchemy import create_engine, insert, select, delete, update, func, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker, Session, joinedload, selectinload
+import json
+import re
+from functools import wraps
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 from datetime import datetime
 
-from .models import Base, AnalizaTygodnia, Transakcja, ReczneKategorie
+from .models import AnalizaTygodnia, Transakcja, ReczneKategorie, SumaKategoriiTygodnia, WersjaRegul, ZadanieImportu
+from .fingerprint import fingerprint_transactions
+from .matcher import MATCH_LITERAL, MATCH_PREFIX, MATCH_REGEX, MATCH_TYPES, RuleMatcher
+from .metrics import DB_QUERY_SECONDS
+from .migrations import migrate
 
 class DatabaseManager:
     """
@@ -14,11 +22,11 @@ class DatabaseManager:
         self.engine = create_engine(database_url, echo=False)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
     
-    def init_db(self):
+    def init_db(self) -> int:
         """
-        Inicjalizuje bazę danych - tworzy tabele
+        Inicjalizuje bazę danych - tworzy tabele i uruchamia migracje schematu
         """
-        Base.metadata.create_all(bind=self.engine)
+        return migrate(self.engine)
     
     def get_session(self) -> Session:
         """
@@ -26,56 +34,165 @@ class DatabaseManager:
         """
         return self.SessionLocal()
 
+def _timed(func):
+    """
+    Mierzy czas funkcji w histogramie db_query_duration_seconds (etykieta: nazwa funkcji)
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with DB_QUERY_SECONDS.time(function=func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
 # Globalna instancja menedżera bazy danych
 db_manager = DatabaseManager()
 
-def init_db():
+# Liczba transakcji wstawianych jednym executemany w save_analysis
+DEFAULT_BATCH_SIZE = 1000
+
+# Liczba transakcji na jednej stronie wyników
+DEFAULT_PAGE_SIZE = 100
+
+@_timed
+def init_db() -> int:
     """
     Inicjalizuje bazę danych
+    
+    Returns:
+        Wersja schematu po migracji
     """
-    db_manager.init_db()
+    return db_manager.init_db()
 
-def save_analysis(analysis_result: Dict[str, Any]) -> int:
+@_timed
+def save_analysis(analysis_result: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE,
+                  stats: Optional[Dict[str, Any]] = None) -> Optional[int]:
     """
-    Zapisuje wynik analizy do bazy danych
+    Zapisuje wynik analizy do bazy danych, pomijając transakcje zapisane wcześniej
+    
+    Każda transakcja dostaje odcisk (fingerprint.py) z unikalnym indeksem.
+    Duplikaty z nakładających się wyciągów są wykrywane zbiorczo - jedno
+    zapytanie IN na paczkę odcisków - i pomijane, a sumy analizy są liczone
+    tylko z nowych transakcji. Gdy wszystkie transakcje są duplikatami,
+    analiza nie jest zapisywana.
+    
+    Transakcje są wstawiane przez insert() z Core w paczkach po batch_size
+    wierszy, bez tworzenia obiektów ORM dla każdego wiersza, z ON CONFLICT
+    DO NOTHING na odcisku - transakcje zapisane w tym czasie przez równoległy
+    zapis tego samego wyciągu są pomijane tak jak wykryte wcześniej duplikaty.
+    Całość odbywa się w jednej transakcji.
     
     Args:
         analysis_result: Wynik analizy z analyzer.py
+        batch_size: Liczba wierszy wstawianych jednym executemany
+        stats: Słownik uzupełniany o liczbę pominiętych duplikatów ('deduplicated')
+            i ID analiz, w których już są ('duplicate_analysis_ids')
         
     Returns:
-        ID zapisanej analizy
+        ID zapisanej analizy lub None, gdy wszystkie transakcje były już zapisane
     """
     session = db_manager.get_session()
     
     try:
-        # Utwórz nową analizę tygodniową
+        transactions = analysis_result['transactions']
+        fingerprints = fingerprint_transactions(transactions)
+        
+        # Odciski już zapisanych transakcji (analiza_id, w której są)
+        existing = _existing_fingerprints(session, fingerprints, batch_size)
+        
+        new_transactions = [
+            (transaction_data, fingerprint)
+            for transaction_data, fingerprint in zip(transactions, fingerprints)
+            if fingerprint not in existing
+        ]
+        
+        if existing and not new_transactions:
+            _update_dedup_stats(stats, len(transactions), existing)
+            return None
+        
+        # Utwórz nową analizę tygodniową - sumy są uzupełniane po zapisie transakcji
         analiza = AnalizaTygodnia(
             week_start=analysis_result['week_start'],
             week_end=analysis_result['week_end'],
-            total_expenses=analysis_result['total_expenses'],
-            avg_daily_expense=analysis_result['avg_daily_expense'],
-            transaction_count=analysis_result['transaction_count'],
+            total_expenses=0.0,
+            avg_daily_expense=0.0,
+            transaction_count=0,
             analysis_date=datetime.fromisoformat(analysis_result['analysis_date'])
         )
         
         session.add(analiza)
         session.flush()  # Aby uzyskać ID analizy
         
-        # Zapisz transakcje
-        for transaction_data in analysis_result['transactions']:
-            transakcja = Transakcja(
-                analiza_id=analiza.id,
-                date=transaction_data['date'],
-                description=transaction_data['description'],
-                amount=transaction_data['amount'],
-                balance=transaction_data['balance'],
-                category=transaction_data['category'],
-                is_manual=transaction_data.get('is_manual', False)
-            )
-            session.add(transakcja)
+        # Zapisz transakcje paczkami. Transakcje zapisane w międzyczasie przez
+        # równoległe przetwarzanie (ten sam wyciąg przesłany dwa razy naraz)
+        # pomija unikalny indeks odcisków zamiast IntegrityError - RETURNING
+        # zwraca odciski faktycznie wstawionych wierszy.
+        insert_stmt = (
+            sqlite_insert(Transakcja.__table__)
+            .on_conflict_do_nothing(index_elements=['fingerprint'])
+            .returning(Transakcja.fingerprint)
+        )
+        inserted = set()
+        
+        for start in range(0, len(new_transactions), batch_size):
+            inserted.update(session.execute(insert_stmt, [
+                {
+                    'analiza_id': analiza.id,
+                    'date': transaction_data['date'],
+                    'description': transaction_data['description'],
+                    'amount': transaction_data['amount'],
+                    'balance': transaction_data['balance'],
+                    'category': transaction_data['category'],
+                    'is_manual': transaction_data.get('is_manual', False),
+                    'fingerprint': fingerprint
+                }
+                for transaction_data, fingerprint in new_transactions[start:start + batch_size]
+            ]).scalars())
+        
+        if len(inserted) < len(new_transactions):
+            existing.update(_existing_fingerprints(
+                session, [fingerprint for _, fingerprint in new_transactions if fingerprint not in inserted], batch_size
+            ))
+            new_transactions = [(t, fingerprint) for t, fingerprint in new_transactions if fingerprint in inserted]
+        
+        _update_dedup_stats(stats, len(transactions) - len(new_transactions), existing)
+        
+        if existing and not new_transactions:
+            session.rollback()
+            return None
         
+        # Sumy analizy z wyniku analizy albo, po pominięciu duplikatów, tylko z nowych transakcji
+        if existing:
+            analiza.total_expenses = sum(-t['amount'] for t, _ in new_transactions if t['amount'] < 0)
+            analiza.avg_daily_expense = analiza.total_expenses / 7
+            analiza.transaction_count = len(new_transactions)
+        else:
+            analiza.total_expenses = analysis_result['total_expenses']
+            analiza.avg_daily_expense = analysis_result['avg_daily_expense']
+            analiza.transaction_count = analysis_result['transaction_count']
+        
+        category_totals = {}
+        for transaction_data, _ in new_transactions:
+            if transaction_data['amount'] < 0:
+                totals = category_totals.setdefault(transaction_data['category'], [0.0, 0])
+                totals[0] += abs(transaction_data['amount'])
+                totals[1] += 1
+        
+        # Zapisz sumy kategorii tygodnia
+        if category_totals:
+            session.execute(insert(SumaKategoriiTygodnia.__table__), [
+                {
+                    'analiza_id': analiza.id,
+                    'week_start': analiza.week_start,
+                    'category': category,
+                    'total_expenses': total,
+                    'transaction_count': count
+                }
+                for category, (total, count) in category_totals.items()
+            ])
+        
+        analiza_id = analiza.id
         session.commit()
-        return analiza.id
+        return analiza_id
         
     except Exception as e:
         session.rollback()
@@ -83,6 +200,27 @@ def save_analysis(analysis_result: Dict[str, Any]) -> int:
     finally:
         session.close()
 
+def _existing_fingerprints(session: Session, fingerprints: List[str], batch_size: int) -> Dict[str, int]:
+    """
+    Zwraca odciski już zapisanych transakcji z ID analiz, w których są - jedno zapytanie IN na paczkę
+    """
+    existing = {}
+    for start in range(0, len(fingerprints), batch_size):
+        chunk = fingerprints[start:start + batch_size]
+        existing.update(session.execute(
+            select(Transakcja.fingerprint, Transakcja.analiza_id).where(Transakcja.fingerprint.in_(chunk))
+        ).all())
+    return existing
+
+def _update_dedup_stats(stats: Optional[Dict[str, Any]], deduplicated: int, existing: Dict[str, int]):
+    """
+    Uzupełnia statystyki save_analysis o pominięte duplikaty i analizy, w których już są
+    """
+    if stats is not None:
+        stats['deduplicated'] = stats.get('deduplicated', 0) + deduplicated
+        stats.setdefault('duplicate_analysis_ids', set()).update(existing.values())
+
+@_timed
 def get_analysis_history(limit: int = 10) -> List[Dict[str, Any]]:
     """
     Pobiera historię analiz z bazy danych
@@ -101,27 +239,21 @@ def get_analysis_history(limit: int = 10) -> List[Dict[str, Any]]:
             AnalizaTygodnia.analysis_date.desc()
         ).limit(limit).all()
         
-        history = []
-        for analiza in analizy:
-            history.append({
-                'id': analiza.id,
-                'week_start': analiza.week_start,
-                'week_end': analiza.week_end,
-                'total_expenses': analiza.total_expenses,
-                'avg_daily_expense': analiza.avg_daily_expense,
-                'transaction_count': analiza.transaction_count,
-                'analysis_date': analiza.analysis_date.isoformat()
-            })
-        
-        return history
+        # Sumy kategorii z tabeli zmaterializowanej - jedno zapytanie dla całej strony
+        category_totals = _load_category_totals(session, [analiza.id for analiza in analizy])
+        
+        return [_analysis_summary(analiza, category_totals.get(analiza.id, {})) for analiza in analizy]
         
     finally:
         session.close()
 
+@_timed
 def get_analysis_by_id(analysis_id: int) -> Optional[Dict[str, Any]]:
     """
     Pobiera szczegółową analizę po ID
     
+    Analiza i jej transakcje są pobierane jednym zapytaniem (joinedload).
+    
     Args:
         analysis_id: ID analizy
         
@@ -131,53 +263,307 @@ def get_analysis_by_id(analysis_id: int) -> Optional[Dict[str, Any]]:
     session = db_manager.get_session()
     
     try:
-        analiza = session.query(AnalizaTygodnia).filter(
-            AnalizaTygodnia.id == analysis_id
-        ).first()
+        analiza = session.get(
+            AnalizaTygodnia, analysis_id, options=[joinedload(AnalizaTygodnia.transakcje)]
+        )
         
         if not analiza:
             return None
         
-        # Pobierz transakcje dla tej analizy
-        transakcje = session.query(Transakcja).filter(
-            Transakcja.analiza_id == analysis_id
-        ).all()
+        return _analysis_to_dict(analiza)
         
-        return {
-            'id': analiza.id,
-            'week_start': analiza.week_start,
-            'week_end': analiza.week_end,
-            'total_expenses': analiza.total_expenses,
-            'avg_daily_expense': analiza.avg_daily_expense,
-            'transaction_count': analiza.transaction_count,
-            'analysis_date': analiza.analysis_date.isoformat(),
-            'transactions': [
-                {
-                    'date': t.date,
-                    'description': t.description,
-                    'amount': t.amount,
-                    'balance': t.balance,
-                    'category': t.category,
-                    'is_manual': t.is_manual
-                }
-                for t in transakcje
-            ]
-        }
+    finally:
+        session.close()
+
+@_timed
+def get_analysis_version(analysis_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Pobiera datę i rewizję analizy (do ETagu) - odczyt jednego wiersza po kluczu
+    
+    Args:
+        analysis_id: ID analizy
+        
+    Returns:
+        Słownik z 'analysis_date' i 'revision' lub None
+    """
+    session = db_manager.get_session()
+    
+    try:
+        row = session.execute(
+            select(AnalizaTygodnia.analysis_date, AnalizaTygodnia.rewizja).where(AnalizaTygodnia.id == analysis_id)
+        ).first()
+        
+        if row is None:
+            return None
+        
+        return {'analysis_date': row.analysis_date.isoformat(), 'revision': row.rewizja}
+        
+    finally:
+        session.close()
+
+@_timed
+def get_analysis_summary(analysis_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Pobiera podsumowanie analizy po ID - bez transakcji, z sumami kategorii
+    
+    Args:
+        analysis_id: ID analizy
+        
+    Returns:
+        Podsumowanie analizy lub None
+    """
+    session = db_manager.get_session()
+    
+    try:
+        analiza = session.get(AnalizaTygodnia, analysis_id)
+        
+        if not analiza:
+            return None
+        
+        return _analysis_summary(analiza, _load_category_totals(session, [analiza.id]).get(analiza.id, {}))
         
     finally:
         session.close()
 
+@_timed
 def get_previous_week_analysis(current_week_start: str) -> Optional[Dict[str, Any]]:
     """
     Pobiera analizę poprzedniego tygodnia dla porównania
     
+    Jeśli tydzień był analizowany kilka razy, zwracana jest najnowsza analiza.
+    
     Args:
         current_week_start: Data rozpoczęcia bieżącego tygodnia
         
     Returns:
         Analiza poprzedniego tygodnia lub None
     """
-    from datetime import datetime, timedelta
+    # Funkcja bez pomiaru - czas całego wywołania mierzy już @_timed tej funkcji
+    previous_weeks = _weeks_with_transactions(current_week_start, weeks_back=1, include_current=False)
+    return previous_weeks.get(_shift_week(current_week_start, -1))
+
+@_timed
+def get_weeks_with_transactions(current_week_start: str, weeks_back: int = 1,
+                                include_current: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Pobiera analizy bieżącego i N poprzednich tygodni razem z transakcjami
+    
+    Analizy pobierane są jednym zapytaniem, a transakcje wszystkich tygodni
+    drugim (selectinload), niezależnie od liczby tygodni.
+    
+    Args:
+        current_week_start: Data rozpoczęcia bieżącego tygodnia
+        weeks_back: Liczba poprzednich tygodni do pobrania
+        include_current: Czy pobrać również bieżący tydzień
+        
+    Returns:
+        Słownik data rozpoczęcia tygodnia -> najnowsza analiza tego tygodnia
+        z transakcjami (tygodnie bez analizy są pomijane)
+    """
+    return _weeks_with_transactions(current_week_start, weeks_back, include_current)
+
+def _weeks_with_transactions(current_week_start: str, weeks_back: int,
+                             include_current: bool) -> Dict[str, Dict[str, Any]]:
+    """
+    Implementacja get_weeks_with_transactions bez pomiaru czasu
+    """
+    first_offset = 0 if include_current else 1
+    week_starts = [_shift_week(current_week_start, -offset) for offset in range(first_offset, weeks_back + 1)]
+    
+    session = db_manager.get_session()
+    
+    try:
+        analizy = session.query(AnalizaTygodnia).options(
+            selectinload(AnalizaTygodnia.transakcje)
+        ).filter(
+            AnalizaTygodnia.week_start.in_(week_starts)
+        ).order_by(
+            AnalizaTygodnia.week_start.desc(), AnalizaTygodnia.analysis_date.desc()
+        ).all()
+        
+        weeks: Dict[str, Dict[str, Any]] = {}
+        for analiza in analizy:
+            if analiza.week_start not in weeks:
+                weeks[analiza.week_start] = _analysis_to_dict(analiza)
+        
+        return weeks
+        
+    finally:
+        session.close()
+
+def _shift_week(week_start: str, weeks: int) -> str:
+    """
+    Przesuwa datę rozpoczęcia tygodnia o podaną liczbę tygodni
+    """
+    from datetime import timedelta
+    
+    shifted = datetime.strptime(week_start, '%Y-%m-%d') + timedelta(days=7 * weeks)
+    return shifted.strftime('%Y-%m-%d')
+
+def _analysis_summary(analiza: AnalizaTygodnia, category_totals: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Zamienia analizę na słownik z podsumowaniem (bez transakcji)
+    """
+    return {
+        'id': analiza.id,
+        'week_start': analiza.week_start,
+        'week_end': analiza.week_end,
+        'total_expenses': analiza.total_expenses,
+        'avg_daily_expense': analiza.avg_daily_expense,
+        'transaction_count': analiza.transaction_count,
+        'category_totals': category_totals,
+        'analysis_date': analiza.analysis_date.isoformat(),
+        'revision': analiza.rewizja
+    }
+
+def _analysis_to_dict(analiza: AnalizaTygodnia) -> Dict[str, Any]:
+    """
+    Zamienia analizę z załadowanymi transakcjami na słownik
+    """
+    return {
+        'id': analiza.id,
+        'week_start': analiza.week_start,
+        'week_end': analiza.week_end,
+        'total_expenses': analiza.total_expenses,
+        'avg_daily_expense': analiza.avg_daily_expense,
+        'transaction_count': analiza.transaction_count,
+        'analysis_date': analiza.analysis_date.isoformat(),
+        'revision': analiza.rewizja,
+        'transactions': [
+            {
+                'date': t.date,
+                'description': t.description,
+                'amount': t.amount,
+                'balance': t.balance,
+                'category': t.category,
+                'is_manual': t.is_manual
+            }
+            for t in analiza.transakcje
+        ]
+    }
+
+@_timed
+def get_transactions_page(analysis_ids: List[int], after: Optional[Tuple[datetime, int]] = None,
+                          limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """
+    Pobiera stronę transakcji z podanych analiz w kolejności (date, id)
+    
+    Stronicowanie kluczem (keyset) zamiast OFFSET - kolejna strona zaczyna się
+    za ostatnią transakcją poprzedniej, więc koszt nie rośnie z numerem strony.
+    
+    Args:
+        analysis_ids: Lista ID analiz
+        after: Klucz (date, id) ostatniej transakcji poprzedniej strony
+        limit: Maksymalna liczba transakcji na stronie
+        
+    Returns:
+        Lista transakcji (słowniki z 'id')
+    """
+    if not analysis_ids:
+        return []
+    
+    query = select(
+        Transakcja.id, Transakcja.analiza_id, Transakcja.date, Transakcja.description,
+        Transakcja.amount, Transakcja.balance, Transakcja.category, Transakcja.is_manual
+    ).where(
+        # "+ 0" wyłącza indeks ix_transakcje_analiza_id - przy wielu analizach (cały plik
+        # to wiele tygodni) SQLite sortowałby wszystkie ich transakcje dla każdej strony.
+        # Indeks na date zwraca wiersze od razu w kolejności (date, id).
+        (Transakcja.analiza_id + 0).in_(analysis_ids),
+        # Zakres dat tygodni analiz ogranicza przeszukiwany fragment indeksu
+        Transakcja.date >= _analyses_bound(func.min(AnalizaTygodnia.week_start), analysis_ids),
+        Transakcja.date < _analyses_bound(func.date(func.max(AnalizaTygodnia.week_end), '+1 day'), analysis_ids)
+    )
+    
+    if after is not None:
+        query = query.where(tuple_(Transakcja.date, Transakcja.id) > tuple_(*after))
+    
+    query = query.order_by(Transakcja.date, Transakcja.id).limit(limit)
+    
+    session = db_manager.get_session()
+    
+    try:
+        return [dict(row) for row in session.execute(query).mappings()]
+        
+    finally:
+        session.close()
+
+def _analyses_bound(expression, analysis_ids: List[int]):
+    """
+    Podzapytanie zwracające skrajną datę tygodni podanych analiz
+    """
+    return select(expression).where(AnalizaTygodnia.id.in_(analysis_ids)).scalar_subquery()
+
+def iter_transactions(analysis_ids: List[int], batch_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Zwraca kolejno wszystkie transakcje z podanych analiz w kolejności (date, id)
+    
+    Transakcje są pobierane stronami po batch_size, każda w osobnej krótkiej
+    sesji, więc pamięć nie zależy od liczby transakcji, a między stronami nie
+    jest trzymane otwarte połączenie.
+    """
+    after = None
+    while True:
+        page = get_transactions_page(analysis_ids, after=after, limit=batch_size)
+        yield from page
+        
+        if len(page) < batch_size:
+            return
+        after = (page[-1]['date'], page[-1]['id'])
+
+@_timed
+def count_transactions(analysis_ids: List[int]) -> int:
+    """
+    Zwraca liczbę transakcji w podanych analizach (z zapisanego transaction_count)
+    """
+    if not analysis_ids:
+        return 0
+    
+    session = db_manager.get_session()
+    
+    try:
+        return session.execute(
+            select(func.coalesce(func.sum(AnalizaTygodnia.transaction_count), 0))
+            .where(AnalizaTygodnia.id.in_(analysis_ids))
+        ).scalar()
+        
+    finally:
+        session.close()
+
+@_timed
+def get_category_totals(analysis_ids: List[int]) -> Dict[int, Dict[str, float]]:
+    """
+    Pobiera sumy wydatków według kategorii dla podanych analiz
+    
+    Args:
+        analysis_ids: Lista ID analiz
+        
+    Returns:
+        Słownik ID analizy -> {kategoria: suma wydatków}
+    """
+    session = db_manager.get_session()
+    
+    try:
+        return _load_category_totals(session, analysis_ids)
+        
+    finally:
+        session.close()
+
+@_timed
+def get_previous_week_summary(current_week_start: str) -> Optional[Dict[str, Any]]:
+    """
+    Pobiera podsumowanie najnowszej analizy poprzedniego tygodnia bez transakcji
+    
+    Sumy kategorii pochodzą z tabeli zmaterializowanej, więc wynik nadaje się
+    wprost do ExpenseAnalyzer.compare_with_previous_week.
+    
+    Args:
+        current_week_start: Data rozpoczęcia bieżącego tygodnia
+        
+    Returns:
+        Podsumowanie analizy poprzedniego tygodnia lub None
+    """
+    from datetime import timedelta
     
     current_date = datetime.strptime(current_week_start, '%Y-%m-%d')
     previous_week_start = (current_date - timedelta(days=7)).strftime('%Y-%m-%d')
@@ -187,53 +573,289 @@ def get_previous_week_analysis(current_week_start: str) -> Optional[Dict[str, An
     try:
         analiza = session.query(AnalizaTygodnia).filter(
             AnalizaTygodnia.week_start == previous_week_start
-        ).first()
+        ).order_by(AnalizaTygodnia.analysis_date.desc()).first()
         
         if not analiza:
             return None
         
-        return get_analysis_by_id(analiza.id)
+        return _analysis_summary(analiza, _load_category_totals(session, [analiza.id]).get(analiza.id, {}))
         
     finally:
         session.close()
 
+def _load_category_totals(session: Session, analysis_ids: List[int]) -> Dict[int, Dict[str, float]]:
+    """
+    Wczytuje sumy kategorii dla listy analiz jednym zapytaniem
+    """
+    if not analysis_ids:
+        return {}
+    
+    rows = session.execute(
+        select(
+            SumaKategoriiTygodnia.analiza_id,
+            SumaKategoriiTygodnia.category,
+            SumaKategoriiTygodnia.total_expenses
+        ).where(SumaKategoriiTygodnia.analiza_id.in_(analysis_ids))
+    )
+    
+    totals: Dict[int, Dict[str, float]] = {}
+    for analiza_id, category, total in rows:
+        totals.setdefault(analiza_id, {})[category] = total
+    return totals
+
+def _bump_analysis_revisions(session: Session, analysis_ids: Iterable[int]):
+    """
+    Zwiększa rewizję analiz, których transakcje zmieniły kategorię
+    """
+    analysis_ids = list(analysis_ids)
+    if analysis_ids:
+        session.execute(
+            AnalizaTygodnia.__table__.update()
+            .where(AnalizaTygodnia.id.in_(analysis_ids))
+            .values(rewizja=AnalizaTygodnia.rewizja + 1)
+        )
+
+def _move_category_total(session: Session, analiza_id: int, amount: float, old_category: str, new_category: str):
+    """
+    Przenosi wydatek z sumy jednej kategorii do drugiej po zmianie kategorii transakcji
+    
+    Zwiększa też rewizję analizy - zmienia się jej ETag w API.
+    """
+    _bump_analysis_revisions(session, [analiza_id])
+    
+    if amount >= 0 or old_category == new_category:
+        return
+    
+    expense = abs(amount)
+    suma = SumaKategoriiTygodnia
+    
+    session.execute(
+        suma.__table__.update()
+        .where(suma.analiza_id == analiza_id, suma.category == old_category)
+        .values(total_expenses=suma.total_expenses - expense, transaction_count=suma.transaction_count - 1)
+    )
+    session.execute(
+        delete(suma)
+        .where(suma.analiza_id == analiza_id, suma.category == old_category, suma.transaction_count <= 0)
+    )
+    
+    week_start = select(AnalizaTygodnia.week_start).where(AnalizaTygodnia.id == analiza_id).scalar_subquery()
+    upsert = sqlite_insert(suma.__table__).values(
+        analiza_id=analiza_id,
+        week_start=week_start,
+        category=new_category,
+        total_expenses=expense,
+        transaction_count=1
+    )
+    session.execute(upsert.on_conflict_do_update(
+        index_elements=['analiza_id', 'category'],
+        set_={
+            'total_expenses': suma.total_expenses + upsert.excluded.total_expenses,
+            'transaction_count': suma.transaction_count + 1
+        }
+    ))
+
+def _rebuild_category_totals(session: Session, analysis_ids: Iterable[int]):
+    """
+    Przelicza od nowa sumy kategorii dla podanych analiz (np. po zbiorczej zmianie kategorii)
+    
+    Zwiększa też rewizję tych analiz - zmienia się ich ETag w API.
+    """
+    analysis_ids = list(analysis_ids)
+    if not analysis_ids:
+        return
+    
+    _bump_analysis_revisions(session, analysis_ids)
+    suma = SumaKategoriiTygodnia
+    session.execute(delete(suma).where(suma.analiza_id.in_(analysis_ids)))
+    session.execute(insert(suma.__table__).from_select(
+        ['analiza_id', 'week_start', 'category', 'total_expenses', 'transaction_count'],
+        select(
+            Transakcja.analiza_id,
+            AnalizaTygodnia.week_start,
+            Transakcja.category,
+            func.sum(-Transakcja.amount),
+            func.count()
+        )
+        .join(AnalizaTygodnia, AnalizaTygodnia.id == Transakcja.analiza_id)
+        .where(Transakcja.analiza_id.in_(analysis_ids), Transakcja.amount < 0)
+        .group_by(Transakcja.analiza_id, Transakcja.category)
+    ))
+
 # Nowe funkcje dla ręcznych kategorii
 
-def zapisz_reczne_kategorie(fraza: str, kategoria: str) -> bool:
+# Klucz jedynego wiersza licznika zmian reguł
+RULES_VERSION_ID = 1
+
+def _bump_rules_version(session: Session):
+    """
+    Zwiększa licznik zmian ręcznych reguł w transakcji sesji zmieniającej reguły
+    """
+    # Nowa baza nie ma jeszcze wiersza licznika - pierwsza zmiana go tworzy
+    session.execute(
+        sqlite_insert(WersjaRegul)
+        .values(id=RULES_VERSION_ID, wersja=1)
+        .on_conflict_do_update(index_elements=[WersjaRegul.id], set_={'wersja': WersjaRegul.wersja + 1})
+    )
+
+@_timed
+def get_rules_version() -> int:
+    """
+    Zwraca numer bieżącego zestawu ręcznych reguł (odczyt jednego wiersza po kluczu)
+    
+    Returns:
+        Licznik zmian reguł (0 - reguły nie były jeszcze zmieniane)
+    """
+    session = db_manager.get_session()
+    
+    try:
+        return session.execute(
+            select(WersjaRegul.wersja).where(WersjaRegul.id == RULES_VERSION_ID)
+        ).scalar() or 0
+        
+    finally:
+        session.close()
+
+class InvalidRuleError(ValueError):
+    """
+    Reguła kategoryzacji, której nie można zapisać - komunikat jest przeznaczony dla użytkownika
+    """
+
+def _rule_error(fraza: str, typ_dopasowania: str) -> Optional[str]:
+    """
+    Sprawdza typ dopasowania reguły i poprawność wyrażenia regularnego
+    
+    Pusta fraza pasowałaby do każdego opisu - taka reguła jest odrzucana.
+    
+    Returns:
+        Opis błędu reguły albo None dla poprawnej reguły
+    """
+    if not fraza or not fraza.strip():
+        return "Fraza reguły nie może być pusta"
+    if typ_dopasowania not in MATCH_TYPES:
+        return f"Nieznany typ dopasowania reguły: {typ_dopasowania}"
+    if typ_dopasowania == MATCH_REGEX:
+        try:
+            re.compile(fraza)
+        except re.error as e:
+            return f"Niepoprawne wyrażenie regularne '{fraza}': {e}"
+    return None
+
+def _is_valid_rule(fraza: str, typ_dopasowania: str) -> bool:
+    """
+    Sprawdza czy regułę można zapisać (szczegóły błędu zwraca _rule_error)
+    """
+    return _rule_error(fraza, typ_dopasowania) is None
+
+def _save_rule(session: Session, fraza: str, kategoria: str, typ_dopasowania: str):
+    """
+    Zapisuje lub aktualizuje regułę w transakcji sesji i zwiększa licznik zmian reguł
+    """
+    # Sprawdź czy reguła już istnieje
+    existing = session.query(ReczneKategorie).filter(
+        ReczneKategorie.fraza == fraza
+    ).first()
+    
+    if existing:
+        # Aktualizuj istniejącą regułę
+        existing.kategoria = kategoria
+        existing.typ_dopasowania = typ_dopasowania
+        existing.liczba_uzyc += 1
+        existing.data_ostatniego_uzycia = datetime.now()
+    else:
+        # Utwórz nową regułę
+        nowa_regula = ReczneKategorie(
+            fraza=fraza,
+            kategoria=kategoria,
+            typ_dopasowania=typ_dopasowania,
+            liczba_uzyc=1,
+            data_utworzenia=datetime.now(),
+            data_ostatniego_uzycia=datetime.now()
+        )
+        session.add(nowa_regula)
+    
+    _bump_rules_version(session)
+
+def _escape_like(value: str) -> str:
+    """
+    Zabezpiecza znaki specjalne LIKE (ESCAPE '\\')
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _apply_rule_to_unassigned(session: Session, fraza: str, kategoria: str, typ_dopasowania: str,
+                              chunk_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Przypisuje kategorię reguły wszystkim pasującym transakcjom 'nieprzypisane'
+    
+    Frazy i prefiksy ze znakami ASCII są dopasowywane jednym UPDATE z LIKE
+    (w SQLite LIKE ignoruje wielkość liter tylko dla ASCII). Wyrażenia
+    regularne i frazy z polskimi znakami sprawdza RuleMatcher - opisy są
+    czytane kawałkami, a pasujące transakcje aktualizowane po chunk_size.
+    Sumy kategorii zmienionych analiz są przeliczane od nowa.
+    
+    Returns:
+        Liczba transakcji, którym przypisano kategorię
+    """
+    transakcje = Transakcja.__table__
+    unassigned = Transakcja.category == 'nieprzypisane'
+    
+    if typ_dopasowania != MATCH_REGEX and fraza.isascii():
+        pattern = _escape_like(fraza.lower())
+        pattern = pattern + '%' if typ_dopasowania == MATCH_PREFIX else '%' + pattern + '%'
+        condition = unassigned & Transakcja.description.like(pattern, escape='\\')
+        
+        analysis_ids = session.execute(select(Transakcja.analiza_id).where(condition).distinct()).scalars().all()
+        if not analysis_ids:
+            return 0
+        updated = session.execute(transakcje.update().where(condition).values(category=kategoria)).rowcount
+    else:
+        matcher = RuleMatcher([(fraza, kategoria, typ_dopasowania)])
+        matching_ids = []
+        analysis_ids = set()
+        
+        rows = session.execute(
+            select(Transakcja.id, Transakcja.analiza_id, Transakcja.description)
+            .where(unassigned)
+            .execution_options(yield_per=chunk_size)
+        )
+        for chunk in rows.partitions():
+            for transaction_id, analiza_id, description in chunk:
+                if matcher.match_priority(description.lower()) is not None:
+                    matching_ids.append(transaction_id)
+                    analysis_ids.add(analiza_id)
+        
+        for start in range(0, len(matching_ids), chunk_size):
+            session.execute(
+                transakcje.update()
+                .where(Transakcja.id.in_(matching_ids[start:start + chunk_size]))
+                .values(category=kategoria)
+            )
+        updated = len(matching_ids)
+    
+    _rebuild_category_totals(session, analysis_ids)
+    return updated
+
+@_timed
+def zapisz_reczne_kategorie(fraza: str, kategoria: str, typ_dopasowania: str = MATCH_LITERAL) -> bool:
     """
     Zapisuje nową regułę ręcznej kategoryzacji
     
     Args:
         fraza: Fraza do dopasowania w opisie transakcji
         kategoria: Kategoria do przypisania
+        typ_dopasowania: 'literal' (fraza w opisie), 'prefix' (początek opisu) lub 'regex'
         
     Returns:
-        True jeśli zapisano pomyślnie, False w przeciwnym razie
+        True jeśli zapisano pomyślnie, False w przeciwnym razie (także dla
+        nieznanego typu i niepoprawnego wyrażenia regularnego)
     """
+    if not _is_valid_rule(fraza, typ_dopasowania):
+        return False
+    
     session = db_manager.get_session()
     
     try:
-        # Sprawdź czy reguła już istnieje
-        existing = session.query(ReczneKategorie).filter(
-            ReczneKategorie.fraza == fraza
-        ).first()
-        
-        if existing:
-            # Aktualizuj istniejącą regułę
-            existing.kategoria = kategoria
-            existing.liczba_uzyc += 1
-            existing.data_ostatniego_uzycia = datetime.now()
-        else:
-            # Utwórz nową regułę
-            nowa_regula = ReczneKategorie(
-                fraza=fraza,
-                kategoria=kategoria,
-                liczba_uzyc=1,
-                data_utworzenia=datetime.now(),
-                data_ostatniego_uzycia=datetime.now()
-            )
-            session.add(nowa_regula)
-        
+        _save_rule(session, fraza, kategoria, typ_dopasowania)
         session.commit()
         return True
         
@@ -243,6 +865,7 @@ def zapisz_reczne_kategorie(fraza: str, kategoria: str) -> bool:
     finally:
         session.close()
 
+@_timed
 def wczytaj_reczne_kategorie() -> List[Dict[str, Any]]:
     """
     Wczytuje wszystkie reguły ręcznej kategoryzacji
@@ -262,6 +885,7 @@ def wczytaj_reczne_kategorie() -> List[Dict[str, Any]]:
                 'id': regula.id,
                 'fraza': regula.fraza,
                 'kategoria': regula.kategoria,
+                'typ_dopasowania': regula.typ_dopasowania,
                 'liczba_uzyc': regula.liczba_uzyc,
                 'data_utworzenia': regula.data_utworzenia.isoformat(),
                 'data_ostatniego_uzycia': regula.data_ostatniego_uzycia.isoformat()
@@ -272,6 +896,7 @@ def wczytaj_reczne_kategorie() -> List[Dict[str, Any]]:
     finally:
         session.close()
 
+@_timed
 def get_nieprzypisane_transakcje() -> List[Dict[str, Any]]:
     """
     Pobiera wszystkie transakcje z kategorią 'nieprzypisane'
@@ -303,18 +928,35 @@ def get_nieprzypisane_transakcje() -> List[Dict[str, Any]]:
     finally:
         session.close()
 
-def przypisz_kategorie_transakcji(transaction_id: int, kategoria: str, fraza: str = None) -> bool:
+@_timed
+def przypisz_kategorie_transakcji(transaction_id: int, kategoria: str, fraza: str = None,
+                                  typ_dopasowania: str = MATCH_LITERAL) -> int:
     """
     Przypisuje kategorię do transakcji i opcjonalnie zapisuje regułę
     
+    Zapisana reguła od razu przypisuje kategorię wszystkim pasującym
+    transakcjom 'nieprzypisane' z wcześniejszych analiz. Całość odbywa się
+    w jednej transakcji bazy.
+    
     Args:
         transaction_id: ID transakcji
         kategoria: Kategoria do przypisania
         fraza: Fraza do zapisania jako reguła (opcjonalna)
+        typ_dopasowania: Typ dopasowania zapisywanej reguły
         
     Returns:
-        True jeśli przypisano pomyślnie, False w przeciwnym razie
+        Liczba transakcji, którym przypisano kategorię (wybrana i pasujące
+        do reguły), 0 jeśli nie przypisano
+        
+    Raises:
+        InvalidRuleError: Gdy podana reguła jest niepoprawna - kategoria
+            transakcji też nie jest wtedy zmieniana
     """
+    if fraza:
+        error = _rule_error(fraza, typ_dopasowania)
+        if error is not None:
+            raise InvalidRuleError(error)
+    
     session = db_manager.get_session()
     
     try:
@@ -324,25 +966,64 @@ def przypisz_kategorie_transakcji(transaction_id: int, kategoria: str, fraza: st
         ).first()
         
         if not transakcja:
-            return False
+            return 0
         
         # Zaktualizuj kategorię
+        poprzednia_kategoria = transakcja.category
         transakcja.category = kategoria
         transakcja.is_manual = True
+        session.flush()
+        
+        # Zaktualizuj sumy kategorii tygodnia
+        _move_category_total(session, transakcja.analiza_id, transakcja.amount, poprzednia_kategoria, kategoria)
+        przypisane = 1
         
-        # Jeśli podano frazę, zapisz regułę
+        # Jeśli podano regułę (sprawdzoną wyżej), zapisz ją i zastosuj do nieprzypisanych transakcji
         if fraza:
-            zapisz_reczne_kategorie(fraza, kategoria)
+            _save_rule(session, fraza, kategoria, typ_dopasowania)
+            przypisane += _apply_rule_to_unassigned(session, fraza, kategoria, typ_dopasowania)
         
         session.commit()
-        return True
+        return przypisane
         
     except Exception as e:
         session.rollback()
-        return False
+        return 0
     finally:
         session.close()
 
+@_timed
+def przypisz_kategorie_wedlug_reguly(fraza: str, kategoria: str, typ_dopasowania: str = MATCH_LITERAL) -> Optional[int]:
+    """
+    Zapisuje regułę i przypisuje kategorię wszystkim pasującym transakcjom 'nieprzypisane'
+    
+    Args:
+        fraza: Fraza do dopasowania w opisie transakcji
+        kategoria: Kategoria do przypisania
+        typ_dopasowania: Typ dopasowania reguły
+        
+    Returns:
+        Liczba transakcji, którym przypisano kategorię, albo None jeśli
+        reguły nie zapisano
+    """
+    if not _is_valid_rule(fraza, typ_dopasowania):
+        return None
+    
+    session = db_manager.get_session()
+    
+    try:
+        _save_rule(session, fraza, kategoria, typ_dopasowania)
+        przypisane = _apply_rule_to_unassigned(session, fraza, kategoria, typ_dopasowania)
+        session.commit()
+        return przypisane
+        
+    except Exception as e:
+        session.rollback()
+        return None
+    finally:
+        session.close()
+
+@_timed
 def usun_regule_kategorii(regula_id: int) -> bool:
     """
     Usuwa regułę ręcznej kategoryzacji
@@ -362,6 +1043,7 @@ def usun_regule_kategorii(regula_id: int) -> bool:
         
         if regula:
             session.delete(regula)
+            _bump_rules_version(session)
             session.commit()
             return True
         
@@ -371,4 +1053,191 @@ def usun_regule_kategorii(regula_id: int) -> bool:
         session.rollback()
         return False
     finally:
-        session.close() 
\ No newline at end of file
+        session.close() 
+
+# Statusy zadań importu, które nie są jeszcze zakończone
+UNFINISHED_JOB_STATUSES = ('queued', 'running')
+
+def _job_to_dict(zadanie: ZadanieImportu) -> Dict[str, Any]:
+    """
+    Konwertuje zadanie importu na słownik
+    """
+    return {
+        'id': zadanie.id,
+        'status': zadanie.status,
+        'stage': zadanie.stage,
+        'rows_parsed': zadanie.rows_parsed,
+        'file_path': zadanie.file_path,
+        'file_name': zadanie.file_name,
+        'file_size': zadanie.file_size,
+        'column_mapping': json.loads(zadanie.column_mapping) if zadanie.column_mapping else None,
+        'analysis_ids': [int(analysis_id) for analysis_id in zadanie.analysis_ids.split(',')] if zadanie.analysis_ids else [],
+        'deduplicated': zadanie.deduplicated,
+        'detected_columns': zadanie.detected_columns.split(',') if zadanie.detected_columns else [],
+        'error': zadanie.error,
+        'created_at': zadanie.created_at.isoformat(),
+        'updated_at': zadanie.updated_at.isoformat(),
+        'finished_at': zadanie.finished_at.isoformat() if zadanie.finished_at else None
+    }
+
+@_timed
+def create_job(job_id: str, file_path: str, file_name: Optional[str], file_size: int,
+               column_mapping: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Zapisuje nowe zadanie importu w kolejce
+    
+    Args:
+        job_id: Identyfikator zadania
+        file_path: Ścieżka do przesłanego pliku na dysku
+        file_name: Nazwa pliku podana przez użytkownika
+        file_size: Rozmiar pliku w bajtach
+        column_mapping: Ręcznie wybrane kolumny (None - wykrywanie z nagłówków)
+        
+    Returns:
+        Zapisane zadanie
+    """
+    session = db_manager.get_session()
+    
+    try:
+        now = datetime.now()
+        zadanie = ZadanieImportu(
+            id=job_id,
+            status='queued',
+            rows_parsed=0,
+            file_path=file_path,
+            file_name=file_name,
+            file_size=file_size,
+            column_mapping=json.dumps(column_mapping, ensure_ascii=False) if column_mapping is not None else None,
+            deduplicated=0,
+            created_at=now,
+            updated_at=now
+        )
+        session.add(zadanie)
+        session.commit()
+        return _job_to_dict(zadanie)
+        
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+@_timed
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Pobiera zadanie importu po ID
+    
+    Returns:
+        Zadanie lub None
+    """
+    session = db_manager.get_session()
+    
+    try:
+        zadanie = session.get(ZadanieImportu, job_id)
+        return _job_to_dict(zadanie) if zadanie else None
+        
+    finally:
+        session.close()
+
+@_timed
+def update_job(job_id: str, **fields) -> bool:
+    """
+    Aktualizuje pola zadania importu jednym zapytaniem UPDATE
+    
+    Listy 'analysis_ids' i 'detected_columns' są zapisywane jako tekst
+    oddzielony przecinkami.
+    
+    Returns:
+        True jeśli zadanie istnieje
+    """
+    if 'analysis_ids' in fields:
+        fields['analysis_ids'] = ','.join(str(analysis_id) for analysis_id in fields['analysis_ids'])
+    if 'detected_columns' in fields:
+        fields['detected_columns'] = ','.join(fields['detected_columns'])
+    fields['updated_at'] = datetime.now()
+    
+    session = db_manager.get_session()
+    
+    try:
+        result = session.execute(update(ZadanieImportu).where(ZadanieImportu.id == job_id).values(**fields))
+        session.commit()
+        return result.rowcount == 1
+        
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+@_timed
+def claim_job(job_id: str) -> bool:
+    """
+    Oznacza zadanie z kolejki jako przetwarzane
+    
+    Returns:
+        True jeśli zadanie czekało w kolejce i zostało przejęte
+    """
+    session = db_manager.get_session()
+    
+    try:
+        result = session.execute(
+            update(ZadanieImportu)
+            .where(ZadanieImportu.id == job_id, ZadanieImportu.status == 'queued')
+            .values(status='running', updated_at=datetime.now())
+        )
+        session.commit()
+        return result.rowcount == 1
+        
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+@_timed
+def count_unfinished_jobs() -> int:
+    """
+    Zwraca liczbę zadań czekających w kolejce lub przetwarzanych
+    """
+    session = db_manager.get_session()
+    
+    try:
+        return session.execute(
+            select(func.count()).select_from(ZadanieImportu).where(ZadanieImportu.status.in_(UNFINISHED_JOB_STATUSES))
+        ).scalar()
+        
+    finally:
+        session.close()
+
+@_timed
+def requeue_unfinished_jobs() -> List[str]:
+    """
+    Wraca do kolejki zadania przerwane restartem aplikacji
+    
+    Zadania przetwarzane w chwili restartu są przetwarzane od początku -
+    transakcje zapisane przed przerwaniem są pomijane jako duplikaty.
+    
+    Returns:
+        ID niedokończonych zadań w kolejności przesłania
+    """
+    session = db_manager.get_session()
+    
+    try:
+        session.execute(
+            update(ZadanieImportu)
+            .where(ZadanieImportu.status == 'running')
+            .values(status='queued', updated_at=datetime.now())
+        )
+        job_ids = session.execute(
+            select(ZadanieImportu.id)
+            .where(ZadanieImportu.status == 'queued')
+            .order_by(ZadanieImportu.created_at)
+        ).scalars().all()
+        session.commit()
+        return list(job_ids)
+        
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
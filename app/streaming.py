@@ -0,0 +1,103 @@
+import codecs
+import csv
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Iterable, Iterator
+
+# Rozmiar kawałka czytanego z przesłanego pliku
+CHUNK_SIZE = 64 * 1024
+
+# Powyżej tego rozmiaru kopia przesłanego pliku trafia do pliku tymczasowego zamiast do RAM
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# Liczba znaków używana przez csv.Sniffer do wykrycia formatu
+SNIFF_SAMPLE_SIZE = 1024
+
+def spool_upload(fileobj: BinaryIO, max_size: int = SPOOL_MAX_SIZE, chunk_size: int = CHUNK_SIZE) -> BinaryIO:
+    """
+    Zwraca obiekt pliku z możliwością przewijania
+
+    Pliki z UploadFile są już buforowane przez Starlette w SpooledTemporaryFile,
+    więc zwracamy je bez kopiowania. Źródła bez seek() są kopiowane kawałkami
+    do SpooledTemporaryFile, który po przekroczeniu max_size zapisuje dane na dysk.
+    """
+    try:
+        if fileobj.seekable():
+            fileobj.seek(0)
+            return fileobj
+    except (AttributeError, OSError):
+        pass
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size, mode='w+b')
+    shutil.copyfileobj(fileobj, spooled, chunk_size)
+    spooled.seek(0)
+    return spooled
+
+def iter_decoded_chunks(fileobj: BinaryIO, encoding: str = 'utf-8', chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Dekoduje plik kawałkami przy użyciu przyrostowego dekodera
+
+    Znaki wielobajtowe przecięte na granicy kawałka są poprawnie sklejane.
+    Błędne bajty zgłaszają UnicodeDecodeError tak jak bytes.decode().
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Skleja kawałki tekstu w pełne linie (z zachowanymi znakami końca linii)
+
+    Linie są dzielone tylko na '\n', tak jak przy iteracji po io.StringIO.
+    csv.reader sam łączy linie należące do pól w cudzysłowach, więc wystarczy
+    przekazywać mu kompletne linie.
+    """
+    pending = ''
+
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+
+        # Ostatni element to niepełna linia - czekamy na kolejny kawałek
+        pending = lines.pop()
+
+        for line in lines:
+            yield line + '\n'
+
+    if pending:
+        yield pending
+
+def read_sample(fileobj: BinaryIO, size: int = SNIFF_SAMPLE_SIZE, encoding: str = 'utf-8') -> str:
+    """
+    Zwraca pierwsze `size` znaków pliku i przewija go na początek
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+    sample = ''
+
+    while len(sample) < size:
+        chunk = fileobj.read(size)
+        if not chunk:
+            sample += decoder.decode(b'', final=True)
+            break
+        sample += decoder.decode(chunk)
+
+    fileobj.seek(0)
+    return sample[:size]
+
+def sniff_dialect(sample: str) -> Any:
+    """
+    Wykrywa format CSV na podstawie próbki, z fallbackiem do csv.excel
+    """
+    try:
+        return csv.Sniffer().sniff(sample)
+    except csv.Error:
+        return csv.excel
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from .streaming import CHUNK_SIZE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Katalog wyników na dysku - w katalogu cache użytkownika aplikacji, nie we współdzielonym /tmp
+UPLOAD_CACHE_DIR = os.environ.get("UPLOAD_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "budget-control", "upload-cache"
+)
+
+# Limity rozmiaru pamięci podręcznej (rozmiar wpisu = rozmiar po serializacji)
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+DISK_CACHE_BYTES = 512 * 1024 * 1024
+
+CACHE_SUFFIX = ".json"
+
+def _dumps(value: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _loads(data: bytes) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def prepare_cache_directory(directory: str) -> bool:
+    """
+    Tworzy katalog pamięci podręcznej (tryb 0o700) i sprawdza, czy należy do aplikacji
+
+    Katalog, który jest dowiązaniem, należy do innego użytkownika albo jest
+    dostępny dla innych użytkowników, nie jest używany - ktoś inny mógłby
+    podmienić w nim wpisy.
+
+    Returns:
+        True jeśli katalog można bezpiecznie używać
+    """
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+    except OSError as e:
+        print(f"Nie udało się utworzyć katalogu pamięci podręcznej {directory}: {e}")
+        return False
+
+    if not stat.S_ISDIR(info.st_mode):
+        problem = "nie jest katalogiem"
+    elif hasattr(os, "getuid") and info.st_uid != os.getuid():
+        problem = "należy do innego użytkownika"
+    elif info.st_mode & 0o077:
+        problem = f"ma zbyt szerokie uprawnienia {stat.S_IMODE(info.st_mode):o}"
+    else:
+        return True
+
+    print(f"Katalog pamięci podręcznej {directory} {problem} - wpisy tylko w pamięci")
+    return False
+
+def upload_digest(source: BinaryIO, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Liczy SHA-256 zawartości pliku i przewija go na początek
+
+    Args:
+        source: Plik binarny z możliwością przewijania
+        chunk_size: Rozmiar kawałka czytanego z pliku
+
+    Returns:
+        Skrót SHA-256 w postaci szesnastkowej
+    """
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+def upload_cache_key(digest: str, column_mapping: Optional[Dict[str, str]], rules_fingerprint: str) -> str:
+    """
+    Buduje klucz wyniku: zawartość pliku, wybrane kolumny i reguły kategoryzacji
+
+    Zmiana reguł zmienia klucz, więc wyniki sprzed zmiany nie są już trafiane
+    i wypadają z pamięci podręcznej przy kolejnych zapisach.
+
+    Args:
+        digest: Skrót SHA-256 pliku
+        column_mapping: Ręcznie wybrane kolumny (None - wykrywanie z nagłówków)
+        rules_fingerprint: Odcisk reguł kategoryzatora
+
+    Returns:
+        Klucz w postaci szesnastkowej
+    """
+    mapping = sorted(column_mapping.items()) if column_mapping is not None else None
+    payload = json.dumps([digest, mapping, rules_fingerprint], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class UploadCache:
+    """
+    Pamięć podręczna wyników przetwarzania plików adresowana zawartością
+
+    Wpisy są trzymane w pamięci (LRU) i na dysku (jeden plik JSON na klucz,
+    najdawniej używane pliki są usuwane). Wpis musi dać się zapisać w JSON -
+    odczyt z dysku nie wykonuje kodu. Oba poziomy mają limit sumarycznego
+    rozmiaru wpisów po serializacji. Zapis na dysk jest atomowy (plik
+    tymczasowy + os.replace), więc kilka procesów może współdzielić katalog.
+    Katalog jest sprawdzany przy pierwszym użyciu (prepare_cache_directory).
+    """
+
+    def __init__(self, directory: Optional[str] = UPLOAD_CACHE_DIR,
+                 memory_bytes: int = MEMORY_CACHE_BYTES, disk_bytes: int = DISK_CACHE_BYTES):
+        """
+        Args:
+            directory: Katalog wpisów na dysku (None - tylko pamięć)
+            memory_bytes: Limit rozmiaru wpisów w pamięci
+            disk_bytes: Limit rozmiaru wpisów na dysku
+        """
+        self.directory = directory
+        self._directory_checked = False
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Zwraca zapisany wynik albo None (najpierw z pamięci, potem z dysku)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        data = self._read_file(key)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            value = _loads(data)
+        except Exception as e:
+            print(f"Uszkodzony wpis pamięci podręcznej {key}: {e}")
+            self._remove_file(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, value, len(data))
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """
+        Zapisuje wynik w pamięci i na dysku
+        """
+        data = _dumps(value)
+
+        with self._lock:
+            self._remember(key, value, len(data))
+
+        if self.prepare() and len(data) <= self.disk_bytes:
+            try:
+                self._write_file(key, data)
+                self._evict_files()
+            except OSError as e:
+                print(f"Nie udało się zapisać wpisu pamięci podręcznej na dysku: {e}")
+
+    def prepare(self) -> bool:
+        """
+        Sprawdza katalog wpisów (raz) - niebezpieczny katalog wyłącza zapis na dysku
+
+        Returns:
+            True jeśli wpisy są zapisywane na dysku
+        """
+        with self._lock:
+            if not self._directory_checked:
+                self._directory_checked = True
+                if self.directory is not None and not prepare_cache_directory(self.directory):
+                    self.directory = None
+            return self.directory is not None
+
+    def clear(self):
+        """
+        Usuwa wszystkie wpisy z pamięci i z dysku
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+        for path, _, _ in self._list_files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def info(self) -> Dict[str, int]:
+        """
+        Zwraca statystyki pamięci podręcznej
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'memory_bytes': self._size,
+                'max_memory_bytes': self.memory_bytes
+            }
+
+    def _remember(self, key: str, value: Dict[str, Any], size: int):
+        """
+        Dodaje wpis do pamięci i usuwa najdawniej używane ponad limit (wywoływane pod blokadą)
+        """
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        if size > self.memory_bytes:
+            return
+
+        self._entries[key] = (value, size)
+        self._size += size
+        while self._size > self.memory_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= evicted
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        if not self.prepare():
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Czas modyfikacji służy jako czas ostatniego użycia przy usuwaniu
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write_file(self, key: str, data: bytes):
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _list_files(self):
+        """
+        Zwraca wpisy na dysku jako krotki (ścieżka, czas użycia, rozmiar)
+        """
+        if not self.prepare():
+            return []
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return []
+
+        files = []
+        for entry in entries:
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((entry.path, stat.st_mtime, stat.st_size))
+        return files
+
+    def _evict_files(self):
+        """
+        Usuwa najdawniej używane pliki, dopóki katalog przekracza limit
+        """
+        files = sorted(self._list_files(), key=lambda item: item[1])
+        total = sum(size for _, _, size in files)
+        for path, _, size in files:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+upload_cache = UploadCache()
@@ -0,0 +1,111 @@
+import importlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+from jinja2 import Environment
+
+from . import storage
+from .parser import parse_date
+from .rule_cache import manual_rules_cache
+from .upload_cache import upload_cache
+
+# Moduły importowane leniwie przy pierwszym użyciu (parsowanie kolumnowe, nietypowe daty)
+HEAVY_MODULES = ("numpy", "pandas", "dateutil.parser")
+
+# Czy po starcie importować HEAVY_MODULES w tle, zanim trafi się pierwszy duży plik
+PRELOAD_HEAVY_MODULES = os.environ.get("PRELOAD_HEAVY_MODULES", "1") == "1"
+
+def warm_up(environment: Environment) -> Dict[str, float]:
+    """
+    Przygotowuje aplikację do obsługi pierwszego żądania
+
+    Otwiera pierwsze połączenie z puli i wczytuje ręczne reguły, kompiluje
+    reguły kategoryzatora współdzielonego przez przesyłane pliki i wszystkie
+    szablony Jinja2, tworzy i sprawdza katalog pamięci podręcznej plików oraz
+    ładuje formaty dat używane przez strptime. Pierwsze żądanie nie płaci
+    wtedy za żaden z tych kroków.
+    Schemat bazy musi być już zmigrowany (storage.init_db).
+
+    Args:
+        environment: Środowisko szablonów aplikacji
+
+    Returns:
+        Czas każdego kroku w sekundach
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    manual_rules_cache.get()
+    timings['database'] = time.perf_counter() - started
+
+    # Ten sam kategoryzator dostaje potem pierwszy przesłany plik
+    started = time.perf_counter()
+    manual_rules_cache.get_categorizer().compile_rules()
+    timings['categorizer'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for name in environment.list_templates(extensions=["html"]):
+        environment.get_template(name)
+    timings['templates'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    upload_cache.prepare()
+    timings['upload_cache'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parse_date("2024-01-15")
+    timings['dates'] = time.perf_counter() - started
+
+    print("WARM-UP: " + " ".join(f"{name}={elapsed * 1000:.1f}ms" for name, elapsed in timings.items()))
+    return timings
+
+def warm_up_in_background(environment: Environment, on_ready: Callable[[], None]) -> threading.Thread:
+    """
+    Rozgrzewa aplikację w wątku w tle i wywołuje on_ready po zakończeniu
+
+    Zdarzenia startup kończą się, zanim uvicorn zacznie przyjmować połączenia,
+    więc gotowość zgłoszona w samym startup nie byłaby nigdy widoczna dla
+    /health. Błąd rozgrzewania zostawia aplikację niegotową.
+
+    Args:
+        environment: Środowisko szablonów aplikacji
+        on_ready: Wywoływane w wątku w tle po udanym rozgrzaniu
+
+    Returns:
+        Wątek rozgrzewania
+    """
+    def run():
+        try:
+            warm_up(environment)
+            on_ready()
+        except Exception as e:
+            print(f"WARM-UP: błąd rozgrzewania aplikacji: {e}")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def preload_modules(modules: Sequence[str] = HEAVY_MODULES) -> Optional[threading.Thread]:
+    """
+    Importuje ciężkie moduły w wątku w tle, nie opóźniając gotowości aplikacji
+
+    Returns:
+        Wątek importu albo None, gdy wstępny import jest wyłączony
+    """
+    if not PRELOAD_HEAVY_MODULES:
+        return None
+
+    def run():
+        started = time.perf_counter()
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"Nie udało się zaimportować {name}: {e}")
+        print(f"WARM-UP: moduły {', '.join(modules)} zaimportowane w {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    thread = threading.Thread(target=run, name="preload-modules", daemon=True)
+    thread.start()
+    return thread
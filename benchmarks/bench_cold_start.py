@@ -0,0 +1,84 @@
+"""
+Benchmark zimnego startu: czas importu app.main i czas do pierwszej odpowiedzi
+
+Import jest mierzony w nowym interpreterze z leniwymi importami i - dla
+porównania - z pandas importowanym z góry (jak przed leniwymi importami).
+Czas do pierwszej odpowiedzi to czas od uruchomienia procesu uvicorn do
+odpowiedzi 200 z /health (po rozgrzaniu aplikacji) i z / (szablon strony).
+
+Uruchomienie:
+    python -m benchmarks.bench_cold_start [liczba_powtórzeń]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_import(code: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url: str, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+def measure_first_response(runs: int):
+    health, index = [], []
+    for _ in range(runs):
+        # Osobny katalog roboczy - świeża baza SQLite przy każdym starcie
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("static", "templates"):
+                os.symlink(os.path.join(ROOT, name), os.path.join(directory, name))
+            port = free_port()
+            env = dict(os.environ, PYTHONPATH=ROOT, PRELOAD_HEAVY_MODULES="0")
+
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=directory, env=env, stdout=subprocess.DEVNULL
+            )
+            try:
+                wait_for(f"http://127.0.0.1:{port}/health")
+                health.append(time.perf_counter() - started)
+                wait_for(f"http://127.0.0.1:{port}/")
+                index.append(time.perf_counter() - started)
+            finally:
+                process.terminate()
+                process.wait()
+    return statistics.median(health), statistics.median(index)
+
+def run(runs: int):
+    baseline = measure_import("pass", runs)
+    lazy = measure_import("import app.main", runs) - baseline
+    eager = measure_import("import pandas, dateutil.parser, app.main", runs) - baseline
+    print(f"import app.main: {lazy * 1000:.0f} ms (z pandas importowanym z góry: {eager * 1000:.0f} ms)")
+
+    health, index = measure_first_response(runs)
+    print(f"pierwsza odpowiedź /health: {health * 1000:.0f} ms, /: {index * 1000:.0f} ms od uruchomienia procesu")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,33 @@
+"""
+Benchmark parsowania wyciągu: wiersz po wierszu (csv.DictReader) vs kolumnowo (pandas)
+
+Uruchomienie:
+    python -m benchmarks.bench_columnar_parse [liczba_wierszy]
+"""
+import csv
+import io
+import sys
+import time
+
+from app.columnar import parse_csv_columnar
+from app.parser import parse_transaction_rows
+from benchmarks.bench_parallel_parse import make_csv
+
+def run(rows: int):
+    csv_text = make_csv(rows)
+    dialect = csv.Sniffer().sniff(csv_text[:1024])
+    mapping = {'data': 'Data operacji', 'kwota': 'Kwota', 'opis': 'Tytuł'}
+
+    started = time.perf_counter()
+    expected = parse_transaction_rows(csv.DictReader(io.StringIO(csv_text), dialect=dialect), mapping)
+    per_row = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = parse_csv_columnar(io.BytesIO(csv_text.encode('utf-8')), dialect, mapping)
+    columnar = time.perf_counter() - started
+
+    assert result == expected
+    print(f"{rows} wierszy: wierszami {per_row:.3f} s, kolumnowo {columnar:.3f} s (x{per_row / columnar:.1f})")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
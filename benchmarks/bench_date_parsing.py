@@ -0,0 +1,34 @@
+"""
+Benchmark parsowania dat: próbowanie formatów dla każdego wiersza vs format wykryty dla pliku
+
+Uruchomienie:
+    python -m benchmarks.bench_date_parsing [liczba_wierszy]
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+from app.parser import DateParser, infer_date_format, parse_date
+
+def make_column(rows: int, date_format: str):
+    start = date(2023, 1, 1)
+    return [(start + timedelta(days=i % 365)).strftime(date_format) for i in range(rows)]
+
+def run(rows: int):
+    for name, date_format in (('ISO (YYYY-MM-DD)', '%Y-%m-%d'), ('DD.MM.YYYY', '%d.%m.%Y')):
+        values = make_column(rows, date_format)
+
+        started = time.perf_counter()
+        expected = [parse_date(value) for value in values]
+        per_row = time.perf_counter() - started
+
+        started = time.perf_counter()
+        parser = DateParser(infer_date_format(values[:50]))
+        result = [parser.parse(value) for value in values]
+        inferred = time.perf_counter() - started
+
+        assert result == expected
+        print(f"{name:>16}: parse_date {per_row:.3f} s, DateParser {inferred:.3f} s (x{per_row / inferred:.1f})")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
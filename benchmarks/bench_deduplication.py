@@ -0,0 +1,71 @@
+"""
+Benchmark zapisu wyciągu nakładającego się na dużą historię transakcji
+
+Połowa transakcji wyciągu jest już w bazie - duplikaty są wykrywane
+zapytaniami IN po unikalnym indeksie odcisków.
+
+Uruchomienie:
+    python -m benchmarks.bench_deduplication [liczba_transakcji_w_historii] [liczba_transakcji_w_wyciągu]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import storage
+from app.storage import DatabaseManager
+
+WEEK = 5000
+
+def make_week(week: int, first: int, count: int):
+    start = datetime(2020, 1, 6) + timedelta(weeks=week)
+    transactions = [
+        {
+            'date': start + timedelta(minutes=i % 10000),
+            'description': f'BIEDRONKA {i % 500} WARSZAWA',
+            'amount': -(i % 300) / 7,
+            'balance': 1000.0 - i,
+            'category': 'jedzenie',
+            'is_manual': False
+        }
+        for i in range(first, first + count)
+    ]
+    return {
+        'week_start': start.strftime('%Y-%m-%d'),
+        'week_end': (start + timedelta(days=6)).strftime('%Y-%m-%d'),
+        'total_expenses': sum(-t['amount'] for t in transactions),
+        'avg_daily_expense': 0.0,
+        'transaction_count': count,
+        'transactions': transactions,
+        'analysis_date': datetime.now().isoformat()
+    }
+
+def run(history: int, upload: int):
+    with tempfile.TemporaryDirectory() as directory:
+        storage.db_manager = DatabaseManager(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        storage.init_db()
+
+        started = time.perf_counter()
+        weeks = history // WEEK
+        for week in range(weeks):
+            storage.save_analysis(make_week(week, week * WEEK, WEEK))
+        print(f"historia: {weeks * WEEK} transakcji w {time.perf_counter() - started:.1f} s")
+
+        # Ostatni tydzień historii: połowa wyciągu to duplikaty
+        last = weeks - 1
+        overlapping = make_week(last, last * WEEK + WEEK - upload // 2, upload)
+
+        stats = {}
+        started = time.perf_counter()
+        storage.save_analysis(overlapping, stats=stats)
+        elapsed = time.perf_counter() - started
+        print(f"wyciąg: {upload} transakcji, {stats['deduplicated']} duplikatów pominiętych w {elapsed:.3f} s")
+
+        storage.db_manager.engine.dispose()
+
+if __name__ == '__main__':
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    )
@@ -0,0 +1,56 @@
+"""
+Benchmark kategoryzacji z rosnącą liczbą ręcznych reguł
+
+Te same reguły (frazy i prefiksy) są zapisane raz z typem 'literal'/'prefix',
+a raz jako 'regex' - tak jak kategoryzator traktował każdą ręczną regułę,
+zanim reguły dostały typ dopasowania. Frazy i prefiksy sprawdza automat
+i drzewo prefiksów w jednym przejściu po opisie, więc czas nie rośnie
+z liczbą reguł; wyrażenia regularne są sprawdzane po kolei.
+
+Uruchomienie:
+    python -m benchmarks.bench_manual_rules [liczba_opisów]
+"""
+import re
+import sys
+import time
+
+from app.categorizer import TransactionCategorizer
+from app.matcher import MATCH_LITERAL, MATCH_PREFIX, MATCH_REGEX
+
+def make_rules(count: int, typed: bool):
+    rules = []
+    for i in range(count):
+        if i % 2:
+            fraza, typ = f"sklep nr {i}", MATCH_LITERAL
+        else:
+            fraza, typ = f"terminal {i} ", MATCH_PREFIX
+        if not typed:
+            # Ta sama reguła jako wyrażenie regularne
+            fraza = re.escape(fraza) if typ == MATCH_LITERAL else '^' + re.escape(fraza)
+            typ = MATCH_REGEX
+        rules.append({'fraza': fraza, 'kategoria': 'inne', 'typ_dopasowania': typ})
+    return rules
+
+def make_descriptions(count: int):
+    # Większość opisów nie pasuje do żadnej ręcznej reguły - najgorszy przypadek dla regex
+    return [{'description': f"PLATNOSC KARTA {i} SKLEP INTERNETOWY ZAMOWIENIE {i % 977}"} for i in range(count)]
+
+def measure(rules, descriptions) -> float:
+    categorizer = TransactionCategorizer(rules, cache_size=0)
+    categorizer.compile_rules()
+    started = time.perf_counter()
+    for transaction in descriptions:
+        categorizer._categorize_description(transaction['description'])
+    return time.perf_counter() - started
+
+def run(count: int):
+    descriptions = make_descriptions(count)
+    print(f"{count} opisów:")
+    for rule_count in (10, 100, 500):
+        typed = measure(make_rules(rule_count, typed=True), descriptions)
+        regex = measure(make_rules(rule_count, typed=False), descriptions)
+        print(f"  {rule_count:>3} reguł: frazy/prefiksy {typed:.3f} s, te same reguły jako regex {regex:.3f} s "
+              f"(x{regex / typed:.1f})")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,51 @@
+"""
+Benchmark parsowania dużego wyciągu: jeden proces vs pula procesów
+
+Uruchomienie:
+    python -m benchmarks.bench_parallel_parse [liczba_wierszy] [liczba_procesów]
+"""
+import csv
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.parallel import parse_csv_parallel
+from app.parser import parse_transaction_rows
+from app.streaming import iter_lines
+
+def make_csv(rows: int) -> str:
+    lines = ['Data operacji;Tytuł;Kwota']
+    for i in range(rows):
+        lines.append(f'{(i % 28) + 1:02d}.{(i % 12) + 1:02d}.2024;"BIEDRONKA {i % 900}\nWARSZAWA";-{i % 500},{i % 100:02d}')
+    return '\n'.join(lines) + '\n'
+
+def run(rows: int, workers: int):
+    csv_text = make_csv(rows)
+    dialect = csv.Sniffer().sniff(csv_text[:1024])
+    mapping = {'data': 'Data operacji', 'kwota': 'Kwota', 'opis': 'Tytuł'}
+
+    started = time.perf_counter()
+    serial = parse_transaction_rows(csv.DictReader(io.StringIO(csv_text), dialect=dialect), mapping)
+    serial_time = time.perf_counter() - started
+    print(f"  1 proces: {rows} wierszy w {serial_time:.3f} s")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Rozgrzanie puli - start procesów nie jest kosztem pojedynczego żądania
+        list(executor.map(abs, range(workers)))
+
+        started = time.perf_counter()
+        lines = iter_lines([csv_text])
+        fieldnames = csv.DictReader(lines, dialect=dialect).fieldnames
+        parallel = parse_csv_parallel(lines, fieldnames, dialect, mapping, executor=executor)
+        parallel_time = time.perf_counter() - started
+
+    assert parallel == serial
+    print(f"{workers:>3} proc.: {rows} wierszy w {parallel_time:.3f} s (x{serial_time / parallel_time:.2f})")
+
+if __name__ == '__main__':
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    )
@@ -0,0 +1,87 @@
+"""
+Benchmark zapisu analizy: obiekt ORM na każdy wiersz vs paczki insert()
+
+Uruchomienie:
+    python -m benchmarks.bench_save_analysis [liczba_transakcji]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import storage
+from app.models import AnalizaTygodnia, Transakcja
+from app.storage import DatabaseManager
+
+def make_analysis(count: int):
+    start = datetime(2024, 1, 1)
+    transactions = [
+        {
+            'date': start + timedelta(minutes=i),
+            'description': f'BIEDRONKA {i % 500} WARSZAWA',
+            'amount': -(i % 300) / 7,
+            'balance': 1000.0 - i,
+            'category': 'jedzenie',
+            'is_manual': False
+        }
+        for i in range(count)
+    ]
+    return {
+        'week_start': '2024-01-01',
+        'week_end': '2024-01-07',
+        'total_expenses': 0.0,
+        'avg_daily_expense': 0.0,
+        'transaction_count': count,
+        'transactions': transactions,
+        'analysis_date': datetime.now().isoformat()
+    }
+
+def save_analysis_orm(analysis_result):
+    """
+    Dawna implementacja - jeden obiekt Transakcja i session.add na wiersz
+    """
+    session = storage.db_manager.get_session()
+    try:
+        analiza = AnalizaTygodnia(
+            week_start=analysis_result['week_start'],
+            week_end=analysis_result['week_end'],
+            total_expenses=analysis_result['total_expenses'],
+            avg_daily_expense=analysis_result['avg_daily_expense'],
+            transaction_count=analysis_result['transaction_count'],
+            analysis_date=datetime.fromisoformat(analysis_result['analysis_date'])
+        )
+        session.add(analiza)
+        session.flush()
+        for transaction_data in analysis_result['transactions']:
+            session.add(Transakcja(
+                analiza_id=analiza.id,
+                date=transaction_data['date'],
+                description=transaction_data['description'],
+                amount=transaction_data['amount'],
+                balance=transaction_data['balance'],
+                category=transaction_data['category'],
+                is_manual=transaction_data.get('is_manual', False)
+            ))
+        session.commit()
+        return analiza.id
+    finally:
+        session.close()
+
+def run(count: int):
+    analysis = make_analysis(count)
+
+    for name, save in (('orm', save_analysis_orm), ('bulk', storage.save_analysis)):
+        with tempfile.TemporaryDirectory() as directory:
+            storage.db_manager = DatabaseManager(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+            storage.init_db()
+
+            started = time.perf_counter()
+            save(analysis)
+            elapsed = time.perf_counter() - started
+
+            storage.db_manager.engine.dispose()
+            print(f"{name:>5}: {count} transakcji w {elapsed:.3f} s ({count / elapsed:,.0f} wierszy/s)")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,62 @@
+"""
+Benchmark pamięci i czasu: słownik na transakcję vs TransactionBatch
+
+Transakcje mają format analyzer.py (data, opis, kwota, saldo, kategoria).
+Opisy powtarzają się jak w wyciągach (kilkaset sklepów), ale każdy wiersz
+pliku daje osobny napis - tak jak przy czytaniu przez csv.
+
+Uruchomienie:
+    python -m benchmarks.bench_transaction_batch [liczba_transakcji]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.analyzer import ExpenseAnalyzer
+from app.batch import TransactionBatch
+from app.categorizer import TransactionCategorizer
+
+def raw_rows(count: int):
+    start = datetime(2024, 1, 1)
+    return [
+        (start + timedelta(days=i % 365), ''.join(['BIEDRONKA ', str(i % 700), ' WARSZAWA']), -(i % 300) / 7, 1000.0 - i)
+        for i in range(count)
+    ]
+
+def build_dicts(rows):
+    return [
+        {'date': date, 'description': description, 'amount': amount, 'balance': balance, 'category': None, 'is_manual': False}
+        for date, description, amount, balance in rows
+    ]
+
+def build_batch(rows):
+    batch = TransactionBatch()
+    for date, description, amount, balance in rows:
+        batch.append(date.toordinal(), description, amount, balance)
+    return batch
+
+def measure(build, rows):
+    tracemalloc.start()
+    started = time.perf_counter()
+    transactions = build(rows)
+    elapsed = time.perf_counter() - started
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    categorized, _ = TransactionCategorizer().categorize_transactions(transactions)
+    ExpenseAnalyzer().analyze_all_weeks(categorized)
+    return size, elapsed, time.perf_counter() - started
+
+def run(count: int):
+    dict_size, dict_build, dict_stages = measure(build_dicts, raw_rows(count))
+    batch_size, batch_build, batch_stages = measure(build_batch, raw_rows(count))
+
+    print(f"{count} transakcji:")
+    print(f"  słowniki: {dict_size / count:.0f} B/transakcję, budowa {dict_build:.3f} s, kategoryzacja + analiza {dict_stages:.3f} s")
+    print(f"  TransactionBatch: {batch_size / count:.0f} B/transakcję, budowa {batch_build:.3f} s, "
+          f"kategoryzacja + analiza {batch_stages:.3f} s (pamięć x{dict_size / batch_size:.1f} mniej)")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -1,6 +1,8 @@
 import unittest
 from datetime import datetime, timedelta
+from unittest.mock import patch
 from app.analyzer import ExpenseAnalyzer
+from app.batch import TransactionBatch
 
 class TestExpenseAnalyzer(unittest.TestCase):
     """
@@ -68,6 +70,123 @@ class TestExpenseAnalyzer(unittest.TestCase):
         self.assertEqual(category_totals['paliwo'], 100.0)
         self.assertEqual(category_totals['chemia'], 30.0)
     
+    def test_columnar_path_matches_dict_path(self):
+        """
+        Test zgodności kolumnowej analizy paczki z analizą w pętli
+        """
+        start = datetime(2024, 1, 1, 9, 30)
+        transactions = [
+            {
+                'date': start + timedelta(hours=7 * i),
+                'description': f'transakcja {i}',
+                'amount': (-1) ** i * (i % 17 + 0.1),
+                'balance': 0.0,
+                'category': ['jedzenie', 'paliwo', 'nieprzypisane', 'inne'][(i * i) % 4]
+            }
+            for i in range(200)
+        ]
+        transactions.append(dict(transactions[0], date=datetime(2024, 3, 20), category='chemia'))
+        batch = TransactionBatch.from_dicts(transactions)
+
+        columnar = ExpenseAnalyzer(columnar_threshold=1)
+        with patch.object(columnar, '_calculate_batch_category_totals', side_effect=AssertionError):
+            result = columnar.analyze_all_weeks(batch)
+        expected = ExpenseAnalyzer(columnar_threshold=None).analyze_all_weeks(batch)
+
+        self.assertEqual(len(result['weeks']), len(expected['weeks']))
+        for week, expected_week in zip(result['weeks'], expected['weeks']):
+            week.pop('analysis_date')
+            expected_week.pop('analysis_date')
+            self.assertEqual(week, expected_week)
+            self.assertEqual(list(week['category_totals']), list(expected_week['category_totals']))
+        self.assertEqual(result['comparisons'], expected['comparisons'])
+
+    def test_columnar_week_matches_row_path(self):
+        """
+        Test zgodności kolumnowej analizy tygodnia paczki z analizą w pętli
+        """
+        start = datetime(2024, 1, 1, 9, 30)
+        batch = TransactionBatch.from_dicts([
+            {
+                'date': start + timedelta(hours=5 * i),
+                'description': f'transakcja {i}',
+                'amount': (-1) ** i * (i % 13 + 0.3),
+                'balance': 0.0,
+                'category': ['jedzenie', None, 'paliwo', 'inne', 'nieprzypisane'][(i * 7) % 5]
+            }
+            for i in range(300)
+        ])
+
+        columnar = ExpenseAnalyzer(columnar_threshold=1)
+        row = ExpenseAnalyzer(columnar_threshold=None)
+
+        # Tydzień od najwcześniejszej daty, od środy i tydzień bez transakcji
+        for week_start_date in (None, '2024-01-10', '2024-03-04'):
+            with patch.object(columnar, '_calculate_category_totals', side_effect=AssertionError):
+                result = columnar.analyze_expenses(batch, week_start_date)
+            expected = row.analyze_expenses(batch, week_start_date)
+
+            result.pop('analysis_date')
+            expected.pop('analysis_date')
+            self.assertEqual(result, expected)
+            self.assertEqual(list(result['category_totals']), list(expected['category_totals']))
+
+    def test_analyze_all_weeks(self):
+        """
+        Test analizy wszystkich tygodni w jednym przebiegu
+        """
+        start = datetime(2024, 1, 3, 12, 0)
+        transactions = [
+            {
+                'date': start + timedelta(days=(i * 5) % 30),
+                'description': f'transakcja {i}',
+                'amount': -(i % 7 + 1.25),
+                'balance': 0.0,
+                'category': ['jedzenie', 'paliwo', 'chemia'][i % 3]
+            }
+            for i in range(60)
+        ]
+        transactions.append({
+            'date': datetime(2024, 2, 14),
+            'description': 'po przerwie',
+            'amount': -10.0,
+            'balance': 0.0,
+            'category': 'inne'
+        })
+
+        result = self.analyzer.analyze_all_weeks(transactions)
+        weeks = result['weeks']
+
+        # Tygodnie bez transakcji pomiędzy też mają raport
+        self.assertEqual([week['week_start'] for week in weeks], [
+            '2024-01-01', '2024-01-08', '2024-01-15', '2024-01-22',
+            '2024-01-29', '2024-02-05', '2024-02-12'
+        ])
+        self.assertEqual(weeks[4]['transaction_count'], 0)
+        self.assertEqual(weeks[0]['iso_week'], '2024-W01')
+        self.assertEqual(sum(week['transaction_count'] for week in weeks), len(transactions))
+        self.assertEqual(len(result['comparisons']), len(weeks) - 1)
+
+        # Raport każdego tygodnia jest taki sam jak z analyze_expenses
+        for week in weeks:
+            expected = self.analyzer.analyze_expenses(transactions, week['week_start'])
+            expected.pop('analysis_date')
+            self.assertEqual({k: v for k, v in week.items() if k != 'analysis_date'}, expected)
+
+        self.assertEqual(
+            result['comparisons'][0],
+            dict(self.analyzer.compare_with_previous_week(weeks[1], weeks[0]),
+                 week_start='2024-01-08', previous_week_start='2024-01-01')
+        )
+
+        # Zapytanie o dowolny zakres dat
+        index = result['index']
+        selected = index.between(datetime(2024, 1, 5), datetime(2024, 1, 9))
+        self.assertEqual(selected, sorted(
+            (t for t in transactions if datetime(2024, 1, 5) <= t['date'] < datetime(2024, 1, 9)),
+            key=lambda t: t['date']
+        ))
+
     def test_calculate_percentage_change(self):
         """
         Test obliczania procentowej zmiany
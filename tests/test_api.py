@@ -0,0 +1,129 @@
+import json
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import api, storage
+from tests.test_storage import StorageTestCase
+
+def make_request(if_none_match=None):
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers, 'query_string': b''})
+
+class TestSerializer(unittest.TestCase):
+    """
+    Testy serializacji JSON
+    """
+
+    def test_datetime_in_both_variants(self):
+        """
+        Test takiego samego wyniku z orjson i z modułem json
+        """
+        from datetime import datetime
+
+        data = {'date': datetime(2024, 1, 15, 10, 30), 'opis': 'Żabka', 'kwota': -1.5}
+        expected = {'date': '2024-01-15T10:30:00', 'opis': 'Żabka', 'kwota': -1.5}
+
+        self.assertEqual(json.loads(api.dumps(data)), expected)
+        with mock.patch.object(api, 'orjson', None):
+            self.assertEqual(json.loads(api.dumps(data)), expected)
+
+class TestAnalysisApi(StorageTestCase):
+    """
+    Testy endpointów JSON i warunkowych żądań GET
+    """
+
+    def test_analysis_etag_and_not_modified(self):
+        """
+        Test 304 dla aktualnego ETagu bez wczytywania transakcji
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=2))
+
+        response = api.get_analysis(make_request(), analysis_id)
+        body = json.loads(response.body)
+        etag = response.headers['etag']
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['transactions'][0]['date'], '2024-01-01T00:00:00')
+        self.assertFalse(etag.startswith('W/'))
+
+        response, statements = self.capture_selects(api.get_analysis, make_request(etag), analysis_id)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('transakcje', statements[0][0])
+
+        response = api.get_analysis(make_request('"inny"'), analysis_id)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertRaises(HTTPException):
+            api.get_analysis(make_request(), analysis_id + 1)
+
+    def test_etag_changes_with_transaction_category(self):
+        """
+        Test zmiany ETagu analizy, historii i porównania po zmianie kategorii transakcji
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=2))
+        etag = api.get_analysis(make_request(), analysis_id).headers['etag']
+        history_etag = api.list_analyses(make_request()).headers['etag']
+        comparison_etag = api.compare_analysis(make_request(), analysis_id).headers['etag']
+
+        transaction_id = storage.get_nieprzypisane_transakcje()[0]['id']
+        self.assertTrue(storage.przypisz_kategorie_transakcji(transaction_id, 'zakupy'))
+
+        response = api.get_analysis(make_request(etag), analysis_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['etag'], etag)
+        self.assertIn('zakupy', [t['category'] for t in json.loads(response.body)['transactions']])
+        self.assertEqual(api.list_analyses(make_request(history_etag)).status_code, 200)
+        self.assertEqual(api.compare_analysis(make_request(comparison_etag), analysis_id).status_code, 200)
+
+    def test_etag_changes_after_rule_is_applied(self):
+        """
+        Test zmiany ETagu analiz przekategoryzowanych zapisaną regułą
+        """
+        first_id = storage.save_analysis(self.make_analysis('2024-01-01', count=2))
+        second_id = storage.save_analysis(self.make_analysis('2024-01-08', count=2))
+        etags = {analysis_id: api.get_analysis(make_request(), analysis_id).headers['etag'] for analysis_id in (first_id, second_id)}
+
+        self.assertEqual(storage.przypisz_kategorie_wedlug_reguly('sklep', 'zakupy'), 2)
+
+        for analysis_id, etag in etags.items():
+            response = api.get_analysis(make_request(etag), analysis_id)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual({t['category'] for t in json.loads(response.body)['transactions']}, {'zakupy', 'jedzenie'})
+
+    def test_history_etag_changes_with_new_analysis(self):
+        """
+        Test ETagu historii zmieniającego się po zapisaniu nowej analizy
+        """
+        storage.save_analysis(self.make_analysis('2024-01-01'))
+        response = api.list_analyses(make_request())
+        etag = response.headers['etag']
+
+        self.assertEqual(api.list_analyses(make_request(etag)).status_code, 304)
+
+        newer = self.make_analysis('2024-01-08')
+        newer['analysis_date'] = '2024-01-20T10:00:00'
+        storage.save_analysis(newer)
+        response = api.list_analyses(make_request(etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.body)), 2)
+
+    def test_comparison(self):
+        """
+        Test porównania z poprzednim tygodniem
+        """
+        storage.save_analysis(self.make_analysis('2024-01-01', count=3))
+        current_id = storage.save_analysis(self.make_analysis('2024-01-08', count=5))
+
+        response = api.compare_analysis(make_request(), current_id)
+        body = json.loads(response.body)
+        self.assertEqual(body['comparison']['total_change'], 20.0)
+        self.assertEqual(body['previous_analysis']['week_start'], '2024-01-01')
+
+        etag = response.headers['etag']
+        self.assertEqual(api.compare_analysis(make_request(f'W/{etag}'), current_id).status_code, 304)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import pickle
+import unittest
+from datetime import datetime, timedelta
+
+from app.analyzer import ExpenseAnalyzer
+from app.batch import TransactionBatch, TransactionRow
+from app.categorizer import TransactionCategorizer
+
+def make_transactions(count=60):
+    start = datetime(2024, 1, 3)
+    return [
+        {
+            'date': start + timedelta(days=i % 20),
+            'description': ['BIEDRONKA', 'ORLEN', 'Nieznany sklep', 'Wpłata'][i % 4],
+            'amount': -(i % 7) - 0.1 if i % 4 != 3 else 100.0,
+            'balance': 1000.0 - i,
+            'category': None,
+            'is_manual': False
+        }
+        for i in range(count)
+    ]
+
+class TestTransactionBatch(unittest.TestCase):
+    """
+    Testy kolumnowej paczki transakcji i widoków wierszy
+    """
+
+    def test_row_behaves_like_transaction_dict(self):
+        """
+        Test odczytu i zapisu pól widoku tak jak w słowniku transakcji
+        """
+        batch = TransactionBatch.from_dicts(make_transactions(2))
+        row = batch[-1]
+
+        self.assertEqual(row, make_transactions(2)[1])
+        self.assertIs(row['date'], batch.date(1))
+        self.assertIsNone(row.get('fraza'))
+
+        row['category'] = 'paliwo'
+        row['is_manual'] = True
+        self.assertEqual((batch.categories[1], batch.manual[1]), ('paliwo', 1))
+        with self.assertRaises(KeyError):
+            row['amount'] = 1.0
+        with self.assertRaises(IndexError):
+            batch[2]
+
+    def test_missing_balance(self):
+        """
+        Test salda bez wartości i zastępowania brakujących sald
+        """
+        batch = TransactionBatch()
+        batch.append(datetime(2024, 1, 15).toordinal(), 'Sklep', -1.0)
+        self.assertIsNone(batch[0]['balance'])
+
+        batch.fill_missing_balances(0.0)
+        self.assertEqual(batch[0]['balance'], 0.0)
+
+    def test_pickle_keeps_columns(self):
+        """
+        Test serializacji paczki i widoków (pamięć podręczna, pula procesów)
+        """
+        batch = TransactionBatch.from_dicts(make_transactions())
+        restored_batch, restored_row = pickle.loads(pickle.dumps((batch, batch[5]), protocol=pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(restored_batch, batch)
+        self.assertIs(restored_row.batch, restored_batch)
+        self.assertEqual(restored_row, batch[5])
+
+    def test_stages_match_dicts(self):
+        """
+        Test identycznej kategoryzacji i analizy paczki oraz listy słowników
+        """
+        transactions = make_transactions()
+        batch = TransactionBatch.from_dicts(transactions)
+
+        categorized, unassigned = TransactionCategorizer().categorize_transactions(transactions)
+        categorized_batch, unassigned_batch = TransactionCategorizer().categorize_transactions(batch)
+
+        self.assertIs(categorized_batch, batch)
+        self.assertIsInstance(unassigned_batch[0], TransactionRow)
+        self.assertEqual(batch.to_dicts(), categorized)
+        self.assertEqual(list(unassigned_batch), unassigned)
+
+        expected = ExpenseAnalyzer().analyze_all_weeks(categorized)
+        result = ExpenseAnalyzer().analyze_all_weeks(batch)
+
+        for week, expected_week in zip(result['weeks'], expected['weeks']):
+            self.assertEqual(week['category_totals'], expected_week['category_totals'])
+            self.assertEqual(list(week['transactions']), expected_week['transactions'])
+        self.assertEqual(result['comparisons'], expected['comparisons'])
+
+        for start, end in [(datetime(2024, 1, 5), datetime(2024, 1, 9)), (datetime(2024, 1, 5, 12), datetime(2024, 1, 9, 0, 1))]:
+            self.assertEqual(list(result['index'].between(start, end)), expected['index'].between(start, end))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import re
+import unittest
+
+from app.categorizer import TransactionCategorizer
+from app.matcher import MATCH_LITERAL, MATCH_PREFIX, MATCH_REGEX, RuleMatcher
+
+def reference_category(categorizer, description):
+    """
+    Kategoryzacja regułą "pierwsze dopasowanie wygrywa" wywołująca re.search dla każdego wzorca
+    """
+    description = description.lower()
+    for rule in categorizer.manual_categories:
+        if re.search(rule['fraza'], description, re.IGNORECASE):
+            return rule['kategoria']
+    for category, patterns in categorizer.category_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, description, re.IGNORECASE):
+                return category
+    return 'nieprzypisane'
+
+class TestTransactionCategorizer(unittest.TestCase):
+    """
+    Testy dla klasy TransactionCategorizer
+    """
+
+    def setUp(self):
+        self.categorizer = TransactionCategorizer([
+            {'fraza': 'allegro', 'kategoria': 'inne'},
+            {'fraza': r'orlen\s+kawa', 'kategoria': 'jedzenie'},
+            {'fraza': 'Apteka Gemini', 'kategoria': 'zdrowie'},
+        ])
+        self.descriptions = [
+            'BIEDRONKA 1234 WARSZAWA',
+            'ORLEN STACJA 55',
+            'Orlen  kawa i hot-dog',
+            'APTEKA GEMINI 12',
+            'apteka dbam o zdrowie',
+            'ALLEGRO - zakup rossmann',
+            'H&M POLSKA',
+            'Circle K Kraków',
+            'przelew własny',
+            'kebab bar u Aliego',
+            'ubezpieczenie domu',
+            '',
+        ]
+
+    def test_matches_reference_first_match_order(self):
+        """
+        Test zgodności z kolejnością "pierwsze dopasowanie wygrywa"
+        """
+        for description in self.descriptions:
+            result = self.categorizer._categorize_single_transaction({'description': description})
+            self.assertEqual(result, reference_category(self.categorizer, description), description)
+
+    def test_rule_changes_rebuild_matcher(self):
+        """
+        Test przebudowy skompilowanych reguł po ich zmianie
+        """
+        transaction = {'description': 'Ubezpieczenie domu'}
+        self.assertEqual(self.categorizer._categorize_single_transaction(transaction), 'nieprzypisane')
+
+        self.categorizer.add_custom_pattern('rachunki', 'ubezpieczenie')
+        self.assertEqual(self.categorizer._categorize_single_transaction(transaction), 'rachunki')
+
+        self.categorizer.update_manual_categories([{'fraza': 'domu', 'kategoria': 'inne'}])
+        self.assertEqual(self.categorizer._categorize_single_transaction(transaction), 'inne')
+
+    def test_cache_counts_hits_and_invalidates_on_rule_change(self):
+        """
+        Test pamięci podręcznej opisów i jej unieważniania po zmianie reguł
+        """
+        transactions = [{'description': 'BIEDRONKA 1234 WARSZAWA'} for _ in range(5)]
+        self.categorizer.categorize_transactions(transactions)
+
+        info = self.categorizer.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (4, 1, 1))
+
+        version = info['rules_version']
+        self.categorizer.update_manual_categories([{'fraza': 'warszawa', 'kategoria': 'inne'}])
+
+        info = self.categorizer.cache_info()
+        self.assertEqual(info['size'], 0)
+        self.assertEqual(info['rules_version'], version + 1)
+        self.assertEqual(self.categorizer._categorize_single_transaction(transactions[0]), 'inne')
+
+    def test_cache_is_bounded(self):
+        """
+        Test usuwania najdawniej używanych opisów po przekroczeniu rozmiaru
+        """
+        categorizer = TransactionCategorizer(cache_size=2)
+        for description in ['lidl', 'orlen', 'lidl', 'zara']:
+            categorizer._categorize_single_transaction({'description': description})
+
+        self.assertEqual(list(categorizer._cache), ['lidl', 'zara'])
+        self.assertEqual(categorizer.cache_info()['hits'], 1)
+
+    def test_matcher_prefers_priority_over_position(self):
+        """
+        Test rozstrzygania po priorytecie reguły, a nie pozycji w tekście
+        """
+        matcher = RuleMatcher([('she', 'a'), ('he', 'b'), ('hers', 'c'), (r'u\w+s', 'd')])
+
+        self.assertEqual(matcher.match('ushers'), 'a')
+        self.assertEqual(matcher.match('uhers'), 'b')
+        self.assertEqual(matcher.match('urs'), 'd')
+        self.assertIsNone(matcher.match('xyz'))
+
+    def test_literal_rules_with_metacharacters(self):
+        """
+        Test fraz z metaznakami - dopasowanie dosłowne, bez błędu kompilacji regex
+        """
+        categorizer = TransactionCategorizer([
+            {'fraza': 'SKLEP (CENTRUM', 'kategoria': 'inne', 'typ_dopasowania': MATCH_LITERAL},
+            {'fraza': 'a*b', 'kategoria': 'rachunki', 'typ_dopasowania': MATCH_LITERAL},
+        ])
+
+        self.assertEqual(categorizer._categorize_single_transaction({'description': 'Sklep (Centrum) 12'}), 'inne')
+        self.assertEqual(categorizer._categorize_single_transaction({'description': 'oplata a*b'}), 'rachunki')
+        self.assertEqual(categorizer._categorize_single_transaction({'description': 'oplata aab'}), 'nieprzypisane')
+
+    def test_prefix_rules_match_only_at_start(self):
+        """
+        Test prefiksów - dopasowanie tylko na początku opisu
+        """
+        matcher = RuleMatcher([('zabka', 'jedzenie', MATCH_PREFIX), ('zabka z', 'inne', MATCH_PREFIX)])
+
+        self.assertEqual(matcher.match('zabka z1234 krakow'), 'jedzenie')
+        self.assertIsNone(matcher.match('platnosc zabka'))
+        self.assertIsNone(matcher.match('zab'))
+
+    def test_priority_across_match_types(self):
+        """
+        Test rozstrzygania po priorytecie między frazami, prefiksami i wyrażeniami regularnymi
+        """
+        matcher = RuleMatcher([
+            (r'orlen\s+kawa', 'jedzenie', MATCH_REGEX),
+            ('orlen', 'transport', MATCH_PREFIX),
+            ('kawa', 'inne', MATCH_LITERAL),
+        ])
+
+        self.assertEqual(matcher.match('orlen  kawa'), 'jedzenie')
+        self.assertEqual(matcher.match('orlen paliwo kawa'), 'transport')
+        self.assertEqual(matcher.match('stacja orlen, kawa'), 'inne')
+
+    def test_invalid_regex_rule_is_skipped(self):
+        """
+        Test pominięcia niepoprawnego wyrażenia regularnego i błędu dla nieznanego typu
+        """
+        matcher = RuleMatcher([('sklep(', 'inne', MATCH_REGEX), ('sklep', 'jedzenie', MATCH_LITERAL)])
+        self.assertEqual(matcher.match('sklep (1)'), 'jedzenie')
+
+        with self.assertRaises(ValueError):
+            RuleMatcher([('sklep', 'inne', 'glob')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import csv
+import io
+import math
+import unittest
+from datetime import datetime
+
+from app.columnar import parse_amount_column, parse_date_column, parse_csv_columnar, parse_transaction_columns
+from app.parser import clean_amount, parse_date, parse_transaction_rows
+from tests.test_parser import AMOUNT_CORPUS, DATE_CORPUS
+
+class TestColumnarParsing(unittest.TestCase):
+    """
+    Testy kolumnowego parsowania - wyniki muszą być identyczne z parsowaniem wierszami
+    """
+
+    def test_amounts_match_clean_amount(self):
+        """
+        Test zgodności kwot z clean_amount na wspólnym korpusie
+        """
+        amounts, invalid = parse_amount_column(AMOUNT_CORPUS * 2)
+
+        for value, amount, is_invalid in zip(AMOUNT_CORPUS * 2, amounts, invalid):
+            expected = clean_amount(value)
+            if expected is None:
+                self.assertTrue(is_invalid, value)
+            else:
+                self.assertFalse(is_invalid, value)
+                self.assertEqual(math.copysign(1, amount), math.copysign(1, expected), value)
+                self.assertEqual(amount, expected, value)
+
+    def test_dates_match_parse_date(self):
+        """
+        Test zgodności dat z parse_date niezależnie od formatu
+        """
+        for date_format in [None, '%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y']:
+            dates, invalid = parse_date_column(DATE_CORPUS * 2, date_format)
+
+            self.assertEqual(list(dates), [parse_date(value) for value in DATE_CORPUS * 2], date_format)
+            self.assertEqual(list(invalid), [parse_date(value) is None for value in DATE_CORPUS * 2])
+
+    def test_empty_columns(self):
+        """
+        Test pustych kolumn i kolumn z samymi brakującymi wartościami
+        """
+        self.assertEqual(len(parse_amount_column([])[0]), 0)
+        self.assertEqual(list(parse_amount_column([None, None])[0]), [0.0, 0.0])
+        self.assertEqual(list(parse_date_column([None])[1]), [True])
+
+    def test_transactions_match_rows(self):
+        """
+        Test zgodności transakcji i maski pominiętych wierszy z parse_transaction_rows
+        """
+        rows = [
+            {'d': date, 'k': amount, 'o': f' Sklep {i} '}
+            for i, (date, amount) in enumerate(zip(DATE_CORPUS * 2, AMOUNT_CORPUS * 2))
+        ]
+        columns = {name: [row[name] for row in rows] for name in 'dko'}
+        mapping = {'data': 'd', 'kwota': 'k', 'opis': 'o'}
+
+        transactions, invalid = parse_transaction_columns(columns, mapping)
+
+        self.assertEqual(transactions, parse_transaction_rows(rows, mapping))
+        self.assertEqual(int((~invalid).sum()), len(transactions))
+
+    def test_csv_file_matches_rows(self):
+        """
+        Test parsowania całego pliku z polami wieloliniowymi i krótkimi wierszami
+        """
+        csv_text = (
+            'Data operacji;Tytuł;Kwota;Saldo\n'
+            '15.01.2024;"Sklep\nWarszawa; ""A""";-1 234,50;10\n'
+            '16.01.2024;Apteka;-12,00\n'
+            'zła data;Kino;-30,00;5\n'
+            '17.01.2024;Bank;;5\n'
+        )
+        dialect = csv.Sniffer().sniff(csv_text[:1024])
+        mapping = {'data': 'Data operacji', 'kwota': 'Kwota', 'opis': 'Tytuł', 'saldo': 'Saldo'}
+
+        expected = parse_transaction_rows(csv.DictReader(io.StringIO(csv_text), dialect=dialect), mapping)
+        result = parse_csv_columnar(io.BytesIO(csv_text.encode('utf-8')), dialect, mapping)
+
+        self.assertEqual(result, expected)
+        self.assertEqual(result[0], {
+            'date': datetime(2024, 1, 15), 'description': 'Sklep\nWarszawa; "A"', 'amount': -1234.5,
+            'balance': 10.0, 'category': None, 'is_manual': False
+        })
+        self.assertEqual(result[1]['balance'], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
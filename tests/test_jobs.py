@@ -0,0 +1,91 @@
+import io
+import os
+import tempfile
+import unittest
+
+from app import storage
+from app.jobs import JobQueue, JobQueueFullError
+from tests.test_pipeline import CSV_TEXT
+from tests.test_storage import StorageTestCase
+
+class TestJobQueue(StorageTestCase):
+    """
+    Testy kolejki zadań importu przetwarzanych w tle
+    """
+
+    def setUp(self):
+        super().setUp()
+        self._jobs_directory = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(workers=1, directory=self._jobs_directory.name)
+
+    def tearDown(self):
+        self.queue.shutdown(wait=True)
+        self._jobs_directory.cleanup()
+        super().tearDown()
+
+    def submit(self, csv_text=CSV_TEXT, **kwargs):
+        return self.queue.submit(io.BytesIO(csv_text.encode('utf-8')), 'wyciag.csv', **kwargs)
+
+    def wait(self):
+        """
+        Czeka na zakończenie wszystkich przekazanych zadań
+        """
+        self.queue.shutdown(wait=True)
+
+    def test_job_is_processed_in_background(self):
+        """
+        Test przetworzenia zadania: status, postęp, wynik i usunięcie pliku
+        """
+        job = self.submit()
+        self.assertEqual(job['status'], 'queued')
+        self.assertTrue(os.path.exists(job['file_path']))
+
+        self.wait()
+        finished = storage.get_job(job['id'])
+
+        self.assertEqual(finished['status'], 'done')
+        self.assertEqual(finished['rows_parsed'], 4)
+        self.assertEqual(len(finished['analysis_ids']), 2)
+        self.assertEqual(storage.count_transactions(finished['analysis_ids']), 4)
+        self.assertIsNotNone(finished['finished_at'])
+        self.assertFalse(os.path.exists(job['file_path']))
+
+    def test_failed_job_keeps_detected_columns(self):
+        """
+        Test zadania z brakującymi kolumnami
+        """
+        job = self.submit('Data;Coś\n01.01.2024;1\n')
+        self.wait()
+        finished = storage.get_job(job['id'])
+
+        self.assertEqual(finished['status'], 'failed')
+        self.assertIn('kwota', finished['error'])
+        self.assertEqual(finished['detected_columns'], ['Data'])
+
+    def test_unfinished_jobs_are_resumed(self):
+        """
+        Test wznowienia zadań przerwanych restartem aplikacji
+        """
+        path = os.path.join(self._jobs_directory.name, 'przerwane.csv')
+        with open(path, 'wb') as f:
+            f.write(CSV_TEXT.encode('utf-8'))
+        storage.create_job('przerwane', path, 'wyciag.csv', os.path.getsize(path))
+        storage.claim_job('przerwane')
+
+        self.assertEqual(self.queue.resume(), ['przerwane'])
+        self.wait()
+        self.assertEqual(storage.get_job('przerwane')['status'], 'done')
+
+    def test_queue_is_bounded(self):
+        """
+        Test odrzucenia zadania, gdy kolejka jest pełna
+        """
+        self.queue.max_pending = 1
+        storage.create_job('czeka', os.path.join(self._jobs_directory.name, 'czeka.csv'), None, 0)
+
+        with self.assertRaises(JobQueueFullError):
+            self.submit()
+        self.assertEqual(os.listdir(self._jobs_directory.name), [])
+
+if __name__ == '__main__':
+    unittest.main()
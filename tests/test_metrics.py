@@ -0,0 +1,148 @@
+import asyncio
+import io
+import unittest
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app import metrics, storage
+from app.categorizer import TransactionCategorizer
+from app.metrics import Counter, Histogram, MetricsMiddleware
+from app.pipeline import IngestionPipeline
+from tests.test_storage import StorageTestCase
+
+class TestMetricsFormat(unittest.TestCase):
+    """
+    Testy formatu tekstowego Prometheusa
+    """
+
+    def test_counter_and_histogram(self):
+        """
+        Test liczników z etykietami i skumulowanych przedziałów histogramu
+        """
+        counter = Counter('test_total', 'Opis z "cudzysłowem"', ('kind',))
+        counter.inc(kind='a"b')
+        counter.inc(2, kind='a"b')
+        self.assertEqual(counter.render(), [
+            '# HELP test_total Opis z "cudzysłowem"',
+            '# TYPE test_total counter',
+            'test_total{kind="a\\"b"} 3',
+        ])
+
+        histogram = Histogram('test_seconds', 'Czas', buckets=(0.1, 1))
+        self.assertIn('test_seconds_count 0', histogram.render())
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_sum 5.65',
+            'test_seconds_count 4',
+        ])
+
+        with self.assertRaises(ValueError):
+            counter.inc(kind='a', other='b')
+
+    def test_middleware_uses_route_template(self):
+        """
+        Test etykiety trasy: szablon ścieżki zamiast adresu żądania
+        """
+        class Route:
+            path = '/jobs/{job_id}'
+
+        async def app(scope, receive, send):
+            scope['route'] = Route()
+            await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def send(message):
+            pass
+
+        labels = dict(method='GET', route='/jobs/{job_id}', status='404')
+        before = metrics.HTTP_REQUEST_SECONDS.count(**labels)
+        scope = {'type': 'http', 'method': 'GET', 'path': '/jobs/123'}
+        asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+        self.assertEqual(metrics.HTTP_REQUEST_SECONDS.count(**labels), before + 1)
+
+    def test_middleware_uses_mount_path(self):
+        """
+        Test etykiety trasy dla zamontowanej aplikacji (pliki statyczne)
+        """
+        async def endpoint(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def send(message):
+            pass
+
+        app = Starlette(routes=[Mount('/static', app=endpoint)])
+        labels = dict(method='GET', route='/static', status='200')
+        before = metrics.HTTP_REQUEST_SECONDS.count(**labels)
+        scope = {'type': 'http', 'method': 'GET', 'path': '/static/app.css', 'root_path': '', 'headers': [], 'query_string': b''}
+        asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+        self.assertEqual(metrics.HTTP_REQUEST_SECONDS.count(**labels), before + 1)
+
+class TestApplicationMetrics(StorageTestCase):
+    """
+    Testy metryk zbieranych przez parser, kategoryzator i storage.py
+    """
+
+    def test_pipeline_metrics(self):
+        """
+        Test liczników wierszy, źródeł reguł, rozmiaru pliku i czasu funkcji storage.py
+        """
+        csv_text = (
+            'Data;Opis;Kwota\n'
+            '01.01.2024;BIEDRONKA;-1,00\n'
+            '02.01.2024;Kino Helios;-2,00\n'
+            '03.01.2024;Nieznany;-3,00\n'
+            'zła data;Kino;-4,00\n'
+            '04.01.2024;Kino;abc\n'
+        )
+        categorizer = TransactionCategorizer([{'fraza': 'kino', 'kategoria': 'rozrywka'}])
+
+        before = {
+            'parsed': metrics.PARSED_ROWS.value(),
+            'date': metrics.REJECTED_ROWS.value(field='date'),
+            'amount': metrics.REJECTED_ROWS.value(field='amount'),
+            'manual': metrics.CATEGORIZED_TRANSACTIONS.value(category='rozrywka', source='manual'),
+            'builtin': metrics.CATEGORIZED_TRANSACTIONS.value(category='jedzenie', source='builtin'),
+            'none': metrics.CATEGORIZED_TRANSACTIONS.value(category='nieprzypisane', source='none'),
+            'uploads': metrics.UPLOAD_SIZE_BYTES.count(),
+            'saves': metrics.DB_QUERY_SECONDS.count(function='save_analysis'),
+        }
+
+        IngestionPipeline(categorizer=categorizer).run(io.BytesIO(csv_text.encode('utf-8')))
+
+        self.assertEqual(metrics.PARSED_ROWS.value() - before['parsed'], 3)
+        self.assertEqual(metrics.REJECTED_ROWS.value(field='date') - before['date'], 1)
+        self.assertEqual(metrics.REJECTED_ROWS.value(field='amount') - before['amount'], 1)
+        self.assertEqual(metrics.CATEGORIZED_TRANSACTIONS.value(category='rozrywka', source='manual') - before['manual'], 1)
+        self.assertEqual(metrics.CATEGORIZED_TRANSACTIONS.value(category='jedzenie', source='builtin') - before['builtin'], 1)
+        self.assertEqual(metrics.CATEGORIZED_TRANSACTIONS.value(category='nieprzypisane', source='none') - before['none'], 1)
+        self.assertEqual(metrics.UPLOAD_SIZE_BYTES.count() - before['uploads'], 1)
+        self.assertEqual(metrics.DB_QUERY_SECONDS.count(function='save_analysis') - before['saves'], 1)
+
+        rendered = metrics.REGISTRY.render()
+        self.assertIn('# TYPE db_query_duration_seconds histogram', rendered)
+        self.assertIn('db_query_duration_seconds_count{function="save_analysis"}', rendered)
+
+    def test_nested_storage_call_timed_once(self):
+        """
+        Test jednego pomiaru czasu dla funkcji storage.py korzystającej z innej funkcji
+        """
+        before = {
+            'previous': metrics.DB_QUERY_SECONDS.count(function='get_previous_week_analysis'),
+            'weeks': metrics.DB_QUERY_SECONDS.count(function='get_weeks_with_transactions'),
+        }
+
+        self.assertIsNone(storage.get_previous_week_analysis('2024-01-08'))
+
+        self.assertEqual(metrics.DB_QUERY_SECONDS.count(function='get_previous_week_analysis') - before['previous'], 1)
+        self.assertEqual(metrics.DB_QUERY_SECONDS.count(function='get_weeks_with_transactions') - before['weeks'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import csv
+import io
+import unittest
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from app.parallel import close_process_pool, get_process_pool, iter_record_chunks, parse_csv_parallel
+from app.parser import parse_transaction_rows
+from app.streaming import iter_lines
+
+class TestParallelParsing(unittest.TestCase):
+    """
+    Testy równoległego parsowania dużych plików CSV
+    """
+
+    def setUp(self):
+        rows = ['data;opis;kwota']
+        for i in range(250):
+            description = f'"Sklep {i}\nlinia druga; ""cytat"""' if i % 7 == 0 else f'Sklep {i}'
+            date = f'{(i % 28) + 1:02d}.01.2024' if i % 11 != 3 else 'zła data'
+            rows.append(f'{date};{description};-{i},50')
+        self.csv_text = '\n'.join(rows) + '\n'
+        self.dialect = csv.Sniffer().sniff(self.csv_text[:1024])
+        self.mapping = {'data': 'data', 'kwota': 'kwota', 'opis': 'opis'}
+
+    def test_chunks_end_on_record_boundaries(self):
+        """
+        Test podziału na kawałki bez przecinania pól z nową linią
+        """
+        lines = iter_lines([self.csv_text])
+        next(lines)  # nagłówek
+
+        chunks = list(iter_record_chunks(lines, self.dialect, rows_per_chunk=6))
+
+        self.assertEqual(''.join(chunks), self.csv_text.split('\n', 1)[1])
+        for chunk in chunks[:-1]:
+            self.assertEqual(len(list(csv.reader(io.StringIO(chunk), self.dialect))), 6)
+
+    def test_parallel_matches_serial(self):
+        """
+        Test zgodności wyniku równoległego z parsowaniem w jednym procesie
+        """
+        expected = parse_transaction_rows(csv.DictReader(io.StringIO(self.csv_text), dialect=self.dialect), self.mapping)
+
+        lines = iter_lines([self.csv_text])
+        reader = csv.DictReader(lines, dialect=self.dialect)
+        fieldnames = reader.fieldnames
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            result = parse_csv_parallel(lines, fieldnames, self.dialect, self.mapping, executor=executor, rows_per_chunk=17)
+
+        self.assertEqual(result, expected)
+        self.assertEqual(result[0]['date'], datetime(2024, 1, 1))
+        self.assertEqual(result[0]['description'], 'Sklep 0\nlinia druga; "cytat"')
+        self.assertEqual(result[0]['amount'], -0.5)
+
+    def test_shared_pool_does_not_fork(self):
+        """
+        Test współdzielonej puli: procesy robocze uruchamiane bez fork
+        """
+        lines = iter_lines([self.csv_text])
+        reader = csv.DictReader(lines, dialect=self.dialect)
+        try:
+            pool = get_process_pool()
+            self.assertIs(get_process_pool(), pool)
+            self.assertNotEqual(pool._mp_context.get_start_method(), 'fork')
+            result = parse_csv_parallel(lines, reader.fieldnames, self.dialect, self.mapping, rows_per_chunk=50)
+        finally:
+            close_process_pool()
+
+        self.assertEqual(len(result), 250 - 23)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from datetime import datetime
+
+from app.parser import DateParser, clean_amount, infer_date_format, parse_date, parse_transaction_rows
+
+# Wartości z różnych banków, w tym błędne i odstające
+DATE_CORPUS = [
+    '2024-01-15', ' 2024-01-16 ', '15.01.2024', '1.2.2024', '01/31/2024', '31-01-2024',
+    '2024/01/31', '31.02.2024', 'Jan 5 2024', '2024-01-15T10:00:00', '', None, 'zła data',
+    '2024-1-5', '1500-01-01', '15.01.2024 ',
+]
+
+AMOUNT_CORPUS = [
+    '-12,50', '1 234,56', '1,234.56', '"100"', "'7.5'", ' 12.50 ', '-0', '', None, '   ',
+    'abc', '1,2,3', '1.2.3', '1_000', '1e3', 'inf', '.5', '5.', '+3',
+    '1111111111111111111111111', '123456789.123456789',
+]
+
+class TestDateParser(unittest.TestCase):
+    """
+    Testy parsowania dat z formatem wykrywanym dla całego pliku
+    """
+
+    def test_matches_parse_date(self):
+        """
+        Test zgodności z parse_date niezależnie od wykrytego formatu
+        """
+        for date_format in [None, '%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y']:
+            parser = DateParser(date_format)
+            for value in DATE_CORPUS * 2:
+                self.assertEqual(parser.parse(value), parse_date(value), (date_format, value))
+
+    def test_infer_date_format(self):
+        """
+        Test wykrywania formatu z próbki
+        """
+        self.assertEqual(infer_date_format(['15.01.2024', '16.01.2024', '2024-01-17']), '%d.%m.%Y')
+        self.assertEqual(infer_date_format(['2024-01-15', None, '']), '%Y-%m-%d')
+        self.assertIsNone(infer_date_format(['zła data']))
+
+    def test_outliers_fall_back_to_probing(self):
+        """
+        Test pełnego próbowania formatów tylko dla wierszy odstających
+        """
+        parser = DateParser('%d.%m.%Y')
+        for day in range(1, 29):
+            parser.parse(f'{day:02d}.01.2024')
+        parser.parse('2024-01-15')
+
+        self.assertEqual(parser.fallbacks, 1)
+
+    def test_parse_transaction_rows_infers_format(self):
+        """
+        Test parsowania wierszy z formatem wykrytym z próbki
+        """
+        rows = [{'d': '15.01.2024', 'k': '-1,50', 'o': ' Sklep '}, {'d': 'x', 'k': '1', 'o': 'a'}]
+        transactions = parse_transaction_rows(rows, {'data': 'd', 'kwota': 'k', 'opis': 'o'})
+
+        self.assertEqual(transactions.to_dicts(), [{
+            'date': datetime(2024, 1, 15), 'description': 'Sklep', 'amount': -1.5,
+            'balance': None, 'category': None, 'is_manual': False
+        }])
+
+    def test_parse_transaction_rows_with_balance(self):
+        """
+        Test salda dołączanego, gdy mapowanie zawiera kolumnę 'saldo'
+        """
+        rows = [{'d': '15.01.2024', 'k': '-1,50', 'o': 'a', 's': '100,00'}, {'d': '16.01.2024', 'k': '1', 'o': 'b', 's': 'x'}]
+        transactions = parse_transaction_rows(rows, {'data': 'd', 'kwota': 'k', 'opis': 'o', 'saldo': 's'})
+
+        self.assertEqual([t['balance'] for t in transactions], [100.0, None])
+
+class TestCleanAmount(unittest.TestCase):
+    """
+    Testy czyszczenia kwot
+    """
+
+    def test_separators(self):
+        """
+        Test separatorów dziesiętnych i tysięcy
+        """
+        self.assertEqual(clean_amount('-12,50'), -12.5)
+        self.assertEqual(clean_amount('1 234,56'), 1234.56)
+        self.assertEqual(clean_amount('1,234.56'), 1234.56)
+        self.assertEqual(clean_amount(''), 0.0)
+        self.assertIsNone(clean_amount('1,2,3'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+from app import storage
+from app.categorizer import TransactionCategorizer
+from app.matcher import RuleMatcher
+from app.pipeline import IngestionError, IngestionPipeline, MissingColumnsError
+from app.rule_cache import ManualRulesCache
+from app.upload_cache import UploadCache
+from tests.test_storage import StorageTestCase
+
+CSV_TEXT = (
+    'Data operacji;Tytuł;Kwota;Saldo\n'
+    '01.01.2024;BIEDRONKA WARSZAWA;-10,50;100,00\n'
+    '02.01.2024;ORLEN 123;-200,00;89,50\n'
+    '03.01.2024;Przelew przychodzący;1000,00;1089,50\n'
+    'zła data;Kino;-30,00;5\n'
+    '09.01.2024;Nieznany sklep;-5,00;1084,50\n'
+)
+
+class TestIngestionPipeline(StorageTestCase):
+    """
+    Testy potoku przetwarzania przesłanego pliku
+    """
+
+    def run_pipeline(self, csv_text=CSV_TEXT, **kwargs):
+        kwargs.setdefault('categorizer', TransactionCategorizer())
+        return IngestionPipeline(**kwargs).run(io.BytesIO(csv_text.encode('utf-8')))
+
+    def test_stages_are_measured(self):
+        """
+        Test pomiarów wszystkich etapów i wyników kolejnych etapów
+        """
+        result = self.run_pipeline()
+        stages = {stage['stage']: stage for stage in result.metrics()['stages']}
+
+        self.assertEqual(list(stages), IngestionPipeline.STAGES)
+        self.assertEqual(stages['decode']['bytes'], len(CSV_TEXT.encode('utf-8')))
+        self.assertEqual((stages['parse']['rows_in'], stages['parse']['rows_out']), (5, 4))
+        self.assertEqual((stages['categorize']['rows_in'], stages['categorize']['rows_out']), (4, 4))
+        self.assertEqual(stages['analyze']['rows_out'], 2)
+        self.assertEqual(stages['persist']['rows_out'], 4)
+        self.assertTrue(all(stage['seconds'] >= 0 for stage in stages.values()))
+        self.assertIn('persist;dur=', result.server_timing())
+
+        self.assertEqual(result.column_mapping['saldo'], 'Saldo')
+        self.assertEqual([t['category'] for t in result.categorized], ['jedzenie', 'paliwo', 'nieprzypisane', 'nieprzypisane'])
+        self.assertEqual(result.categorized[1]['balance'], 89.5)
+
+    def test_weeks_are_persisted(self):
+        """
+        Test zapisu każdego tygodnia z transakcjami jako osobnej analizy
+        """
+        result = self.run_pipeline()
+
+        self.assertEqual(len(result.analysis_ids), 2)
+        saved = storage.get_analysis_by_id(result.analysis_ids[0])
+        self.assertEqual(saved['week_start'], '2024-01-01')
+        self.assertEqual(saved['total_expenses'], 210.5)
+
+    def test_without_persist(self):
+        """
+        Test potoku bez zapisu do bazy
+        """
+        result = self.run_pipeline(persist=False)
+
+        self.assertEqual(result.analysis_ids, [])
+        self.assertEqual(result.stages[-1].seconds, 0.0)
+        self.assertEqual(storage.get_analysis_history(), [])
+
+    def test_repeated_upload_uses_cache(self):
+        """
+        Test ponownego przesłania pliku: wynik z pamięci podręcznej i te same analizy
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = UploadCache(directory)
+            first = self.run_pipeline(cache=cache)
+            second = self.run_pipeline(cache=cache)
+
+            self.assertFalse(first.cache_hit)
+            self.assertTrue(second.cache_hit)
+            self.assertEqual(second.analysis_ids, first.analysis_ids)
+            self.assertEqual(second.categorized, first.categorized)
+            stages = {stage['stage']: stage for stage in second.metrics()['stages']}
+            self.assertEqual(stages['parse']['rows_out'], 0)
+            self.assertEqual(stages['persist']['rows_out'], 0)
+            self.assertEqual(len(storage.get_analysis_history()), 2)
+
+            # Zmiana reguł unieważnia wynik
+            categorizer = TransactionCategorizer([{'fraza': 'kino', 'kategoria': 'rozrywka'}])
+            changed = self.run_pipeline(cache=cache, categorizer=categorizer)
+            self.assertFalse(changed.cache_hit)
+            self.assertEqual((changed.analysis_ids, changed.deduplicated), ([], 4))
+
+            # Wynik bez zapisu do bazy jest uzupełniany analizami przy kolejnym przesłaniu
+            other = CSV_TEXT.replace('-5,00', '-6,00')
+            self.run_pipeline(other, cache=cache, persist=False)
+            persisted = self.run_pipeline(other, cache=cache)
+            self.assertTrue(persisted.cache_hit)
+            self.assertEqual((len(persisted.analysis_ids), persisted.deduplicated), (1, 3))
+            self.assertTrue(self.run_pipeline(other, cache=cache).cache_hit)
+
+    def test_overlapping_upload_is_deduplicated(self):
+        """
+        Test pominięcia transakcji zapisanych już z nakładającego się wyciągu
+        """
+        first = self.run_pipeline()
+        overlapping = CSV_TEXT + '10.01.2024;ORLEN 123;-100,00;984,50\n'
+        second = self.run_pipeline(overlapping)
+
+        self.assertEqual(second.deduplicated, 4)
+        self.assertEqual(len(second.analysis_ids), 1)
+        self.assertNotIn(first.analysis_ids[0], second.analysis_ids)
+        stages = {stage['stage']: stage for stage in second.metrics()['stages']}
+        self.assertEqual((stages['persist']['rows_in'], stages['persist']['rows_out']), (5, 1))
+
+        saved = storage.get_analysis_by_id(second.analysis_ids[0])
+        self.assertEqual((saved['transaction_count'], saved['total_expenses']), (1, 100.0))
+
+    def test_rules_compiled_once_per_rule_change(self):
+        """
+        Test jednej kompilacji reguł dla kolejnych plików, dopóki reguły się nie zmienią
+        """
+        with mock.patch('app.pipeline.manual_rules_cache', ManualRulesCache()), \
+                mock.patch('app.categorizer.RuleMatcher', wraps=RuleMatcher) as matcher:
+            self.run_pipeline(categorizer=None, persist=False)
+            self.run_pipeline(categorizer=None, persist=False)
+            self.assertEqual(matcher.call_count, 1)
+
+            storage.zapisz_reczne_kategorie('nieznany sklep', 'inne')
+            result = self.run_pipeline(categorizer=None, persist=False)
+            self.assertEqual(matcher.call_count, 2)
+            self.assertEqual(result.categorized[3]['category'], 'inne')
+
+    def test_description_cache_shared_between_uploads(self):
+        """
+        Test pamięci podręcznej opisów zachowanej między plikami do zmiany reguł
+        """
+        rules_cache = ManualRulesCache()
+        with mock.patch('app.pipeline.manual_rules_cache', rules_cache):
+            for _ in range(3):
+                self.run_pipeline(categorizer=None, persist=False)
+            info = rules_cache.get_categorizer().cache_info()
+            self.assertEqual((info['misses'], info['hits']), (4, 8))
+
+            # Po zmianie reguł opisy są kategoryzowane od nowa
+            storage.zapisz_reczne_kategorie('biedronka', 'inne')
+            result = self.run_pipeline(categorizer=None, persist=False)
+            self.assertEqual(rules_cache.get_categorizer().cache_info()['misses'], 4)
+            self.assertEqual(result.categorized[0]['category'], 'inne')
+
+    def test_missing_columns(self):
+        """
+        Test błędów mapowania kolumn wykrywanych i wybranych ręcznie
+        """
+        with self.assertRaises(MissingColumnsError) as context:
+            self.run_pipeline('Data;Coś\n01.01.2024;1\n')
+        self.assertEqual(context.exception.missing, ['kwota', 'opis'])
+        self.assertEqual(context.exception.detected_columns, ['Data'])
+
+        with self.assertRaises(MissingColumnsError) as context:
+            self.run_pipeline(column_mapping={'data': 'Data operacji', 'kwota': 'Kwota', 'opis': 'Opis'})
+        self.assertEqual(context.exception.missing, ['Opis'])
+
+        with self.assertRaises(IngestionError):
+            self.run_pipeline('')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.profiling import PROFILE_ID_HEADER, RequestProfiler
+
+def make_request(profile=None):
+    headers = [(b'x-profile', profile.encode())] if profile else []
+    return Request({'type': 'http', 'method': 'POST', 'path': '/analyze', 'headers': headers, 'query_string': b''})
+
+class TestRequestProfiler(unittest.TestCase):
+    """
+    Testy profilowania żądań na żądanie
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def run_endpoint(self, profiler, request):
+        @profiler.profile("analyze_csv")
+        async def endpoint(request):
+            sum(range(10000))
+            return Response("ok")
+
+        return asyncio.run(endpoint(request=request))
+
+    def test_profile_is_written_with_summary(self):
+        """
+        Test zapisu profilu i podsumowania przy włączonym profilowaniu i nagłówku
+        """
+        profiler = RequestProfiler(enabled=True, directory=self.directory, token="sekret")
+        response = self.run_endpoint(profiler, make_request("sekret"))
+
+        profile_id = response.headers[PROFILE_ID_HEADER]
+        self.assertIn("analyze_csv", profile_id)
+        self.assertEqual(profiler.list_profiles(), [profile_id])
+        with open(os.path.join(self.directory, profile_id + ".txt"), encoding="utf-8") as f:
+            summary = f.read()
+        self.assertIn("Najkosztowniejsze funkcje", summary)
+        self.assertIn("endpoint", summary)
+
+    def test_sync_endpoint_is_profiled(self):
+        """
+        Test profilowania zwykłego endpointu (wykonywanego przez FastAPI w puli wątków)
+        """
+        profiler = RequestProfiler(enabled=True, directory=self.directory)
+
+        @profiler.profile("process_csv")
+        def endpoint(request):
+            sum(range(10000))
+            return Response("ok")
+
+        self.assertFalse(asyncio.iscoroutinefunction(endpoint))
+        response = endpoint(request=make_request("1"))
+        self.assertEqual(profiler.list_profiles(), [response.headers[PROFILE_ID_HEADER]])
+
+    def test_profiling_requires_flag_and_header(self):
+        """
+        Test braku profilu bez flagi, bez nagłówka albo ze złym sekretem
+        """
+        cases = [
+            (RequestProfiler(enabled=False, directory=self.directory), make_request("1")),
+            (RequestProfiler(enabled=True, directory=self.directory), make_request()),
+            (RequestProfiler(enabled=True, directory=self.directory, token="sekret"), make_request("1")),
+        ]
+        for profiler, request in cases:
+            response = self.run_endpoint(profiler, request)
+            self.assertNotIn(PROFILE_ID_HEADER, response.headers)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_old_profiles_are_pruned(self):
+        """
+        Test usuwania najstarszych profili ponad limit
+        """
+        profiler = RequestProfiler(enabled=True, directory=self.directory, max_profiles=2)
+        profile_ids = []
+        for i in range(3):
+            profile_ids.append(self.run_endpoint(profiler, make_request("1")).headers[PROFILE_ID_HEADER])
+            # Kolejność profili wynika z czasu modyfikacji plików
+            for suffix in (".prof", ".txt"):
+                os.utime(os.path.join(self.directory, profile_ids[-1] + suffix), (i, i))
+
+        self.assertEqual(profiler.list_profiles(), [profile_ids[2], profile_ids[1]])
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+if __name__ == '__main__':
+    unittest.main()
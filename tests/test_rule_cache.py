@@ -0,0 +1,71 @@
+import unittest
+
+from app import storage
+from app.rule_cache import ManualRulesCache
+from tests.test_storage import StorageTestCase
+
+class TestManualRulesCache(StorageTestCase):
+    """
+    Testy ręcznych reguł zapamiętanych w procesie i licznika zmian reguł
+    """
+
+    def test_rule_changes_bump_version(self):
+        """
+        Test zwiększania licznika przy zapisie i usunięciu reguły
+        """
+        self.assertEqual(storage.get_rules_version(), 0)
+
+        storage.zapisz_reczne_kategorie('THAI WOK', 'jedzenie')
+        storage.zapisz_reczne_kategorie('THAI WOK', 'inne')
+        self.assertEqual(storage.get_rules_version(), 2)
+
+        # Odrzucona reguła i usunięcie nieistniejącej reguły niczego nie zmieniają
+        storage.zapisz_reczne_kategorie('sklep(', 'inne', 'regex')
+        storage.usun_regule_kategorii(999)
+        self.assertEqual(storage.get_rules_version(), 2)
+
+        regula_id = storage.wczytaj_reczne_kategorie()[0]['id']
+        storage.usun_regule_kategorii(regula_id)
+        self.assertEqual(storage.get_rules_version(), 3)
+
+    def test_rules_reloaded_only_after_change(self):
+        """
+        Test pojedynczego odczytu licznika zamiast wczytywania reguł, dopóki reguły się nie zmienią
+        """
+        cache = ManualRulesCache()
+        storage.zapisz_reczne_kategorie('THAI WOK', 'jedzenie')
+        self.assertEqual([rule['fraza'] for rule in cache.get()], ['THAI WOK'])
+
+        rules, statements = self.capture_selects(cache.get)
+        self.assertEqual([rule['fraza'] for rule in rules], ['THAI WOK'])
+        self.assertEqual(len(statements), 1)
+        self.assertIn('wersja_regul', statements[0][0])
+
+        # Zmiana zapisana przez inny proces jest widoczna tylko przez licznik w bazie
+        storage.zapisz_reczne_kategorie('ZABKA', 'jedzenie', 'prefix')
+        rules, statements = self.capture_selects(cache.get)
+        self.assertEqual(sorted(rule['fraza'] for rule in rules), ['THAI WOK', 'ZABKA'])
+        self.assertEqual(len(statements), 2)
+
+    def test_categorizer_rebuilt_only_after_rule_change(self):
+        """
+        Test jednego skompilowanego kategoryzatora na wersję reguł
+        """
+        cache = ManualRulesCache()
+        storage.zapisz_reczne_kategorie('THAI WOK', 'jedzenie')
+
+        categorizer = cache.get_categorizer()
+        categorizer.compile_rules()
+        matcher = categorizer._get_matcher()
+        self.assertIs(cache.get_categorizer(), categorizer)
+        self.assertIs(cache.get_categorizer()._get_matcher(), matcher)
+
+        # Nowy kategoryzator po zmianie reguł - poprzedni zostaje bez zmian
+        storage.zapisz_reczne_kategorie('ZABKA', 'jedzenie', 'prefix')
+        changed = cache.get_categorizer()
+        self.assertIsNot(changed, categorizer)
+        self.assertEqual(changed._categorize_description('zabka 123'), ('jedzenie', 'manual'))
+        self.assertEqual(len(categorizer.manual_categories), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,574 @@
+import itertools
+import os
+import re
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import event, inspect, update
+from sqlalchemy.schema import CreateTable
+
+from app import storage
+from app.migrations import LATEST_VERSION, get_schema_version, migrate, schema_version_table
+from app.models import Base, Transakcja
+from app.storage import DatabaseManager
+
+class StorageTestCase(unittest.TestCase):
+    """
+    Baza SQLite w katalogu tymczasowym podstawiona pod storage.db_manager
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._previous_manager = storage.db_manager
+        storage.db_manager = DatabaseManager(f"sqlite:///{os.path.join(self._directory.name, 'test.db')}")
+        storage.init_db()
+        self._statements = itertools.count()
+
+    def tearDown(self):
+        storage.db_manager.engine.dispose()
+        storage.db_manager = self._previous_manager
+        self._directory.cleanup()
+
+    def capture_selects(self, func, *args, **kwargs):
+        """
+        Wywołuje funkcję i zwraca jej wynik oraz listę wykonanych zapytań SELECT
+        """
+        engine = storage.db_manager.engine
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        return result, statements
+
+    def make_analysis(self, week_start='2024-01-01', count=5):
+        # Każda analiza pochodzi z osobnego wyciągu - inne saldo, więc nie jest duplikatem
+        start = datetime.strptime(week_start, '%Y-%m-%d')
+        opening_balance = 1000.0 * next(self._statements) + 100.0
+        return {
+            'week_start': week_start,
+            'week_end': (start + timedelta(days=6)).strftime('%Y-%m-%d'),
+            'total_expenses': 10.0 * count,
+            'avg_daily_expense': 10.0 * count / 7,
+            'transaction_count': count,
+            'transactions': [
+                {
+                    'date': start + timedelta(hours=i),
+                    'description': f'Sklep {i}',
+                    'amount': -10.0,
+                    'balance': opening_balance - i,
+                    'category': 'jedzenie' if i % 2 else 'nieprzypisane'
+                }
+                for i in range(count)
+            ],
+            'analysis_date': datetime(2024, 1, 8, 12, 0).isoformat()
+        }
+
+class TestSaveAnalysis(StorageTestCase):
+    """
+    Testy zapisu analizy
+    """
+
+    def test_save_analysis_in_batches(self):
+        """
+        Test zapisu transakcji paczkami mniejszymi niż liczba wierszy
+        """
+        analysis = self.make_analysis(count=7)
+        analysis_id = storage.save_analysis(analysis, batch_size=3)
+
+        saved = storage.get_analysis_by_id(analysis_id)
+        self.assertEqual(saved['transaction_count'], 7)
+        self.assertEqual(
+            [(t['date'], t['description'], t['amount'], t['category'], t['is_manual']) for t in saved['transactions']],
+            [(t['date'], t['description'], t['amount'], t['category'], False) for t in analysis['transactions']]
+        )
+
+    def test_save_analysis_rolls_back_on_error(self):
+        """
+        Test wycofania całej analizy przy błędnym wierszu
+        """
+        analysis = self.make_analysis(count=4)
+        analysis['transactions'][3]['description'] = None
+
+        with self.assertRaises(Exception):
+            storage.save_analysis(analysis, batch_size=2)
+
+        self.assertEqual(storage.get_analysis_history(), [])
+
+    def test_duplicates_are_skipped(self):
+        """
+        Test pominięcia transakcji zapisanych już z nakładającego się wyciągu
+        """
+        analysis = self.make_analysis(count=4)
+        first_id = storage.save_analysis(analysis)
+
+        # Drugi wyciąg: dwie transakcje z pierwszego (inny zapis opisu) i dwie nowe
+        overlapping = self.make_analysis(count=4)
+        overlapping['transactions'][:2] = [dict(t, description=f"  {t['description'].upper()} ") for t in analysis['transactions'][:2]]
+
+        stats = {}
+        second_id, statements = self.capture_selects(storage.save_analysis, overlapping, batch_size=3, stats=stats)
+
+        # Jedno zapytanie o odciski na paczkę, bez zapytań dla pojedynczych wierszy
+        self.assertEqual(sum('fingerprint IN' in statement for statement, _ in statements), 2)
+        self.assertEqual(stats, {'deduplicated': 2, 'duplicate_analysis_ids': {first_id}})
+
+        saved = storage.get_analysis_by_id(second_id)
+        self.assertEqual((saved['transaction_count'], saved['total_expenses']), (2, 20.0))
+        self.assertEqual(len(saved['transactions']), 2)
+
+        # Ten sam wyciąg jeszcze raz - nic nowego, analiza nie jest zapisywana
+        self.assertIsNone(storage.save_analysis(analysis, stats=stats))
+        self.assertEqual(stats['deduplicated'], 6)
+        self.assertEqual(len(storage.get_analysis_history()), 2)
+
+    def test_concurrent_saves_of_same_statement(self):
+        """
+        Test dwóch równoczesnych zapisów tego samego wyciągu - bez IntegrityError
+        """
+        analysis = self.make_analysis(count=4)
+        existing_fingerprints = storage._existing_fingerprints
+        barrier = threading.Barrier(2, timeout=5)
+        checked = set()
+
+        def check_then_wait(*args, **kwargs):
+            # Oba zapisy sprawdzają odciski, zanim którykolwiek wstawi transakcje
+            result = existing_fingerprints(*args, **kwargs)
+            if threading.get_ident() not in checked:
+                checked.add(threading.get_ident())
+                barrier.wait()
+            return result
+
+        results, errors, stats = [], [], [{}, {}]
+
+        def save(index):
+            try:
+                results.append(storage.save_analysis(dict(analysis), stats=stats[index]))
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch.object(storage, '_existing_fingerprints', side_effect=check_then_wait):
+            threads = [threading.Thread(target=save, args=(index,)) for index in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        saved_ids = [analysis_id for analysis_id in results if analysis_id is not None]
+        self.assertEqual(len(saved_ids), 1)
+        self.assertEqual(sorted(s['deduplicated'] for s in stats), [0, 4])
+        self.assertIn({saved_ids[0]}, [s['duplicate_analysis_ids'] for s in stats])
+
+        history = storage.get_analysis_history()
+        self.assertEqual([(a['id'], a['transaction_count']) for a in history], [(saved_ids[0], 4)])
+
+class TestAnalysisFetch(StorageTestCase):
+    """
+    Testy pobierania analiz razem z transakcjami
+    """
+
+    def test_analysis_by_id_in_one_query(self):
+        """
+        Test pobrania analizy z transakcjami jednym zapytaniem
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=4))
+
+        analysis, statements = self.capture_selects(storage.get_analysis_by_id, analysis_id)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([t['description'] for t in analysis['transactions']],
+                         ['Sklep 0', 'Sklep 1', 'Sklep 2', 'Sklep 3'])
+        self.assertIsNone(storage.get_analysis_by_id(analysis_id + 1))
+
+    def test_weeks_in_batch(self):
+        """
+        Test pobrania kilku tygodni dwoma zapytaniami
+        """
+        storage.save_analysis(self.make_analysis('2024-01-01', count=2))
+        storage.save_analysis(self.make_analysis('2024-01-15', count=3))
+        newer = self.make_analysis('2024-01-15', count=1)
+        newer['analysis_date'] = datetime(2024, 1, 20).isoformat()
+        newer_id = storage.save_analysis(newer)
+
+        weeks, statements = self.capture_selects(storage.get_weeks_with_transactions, '2024-01-15', weeks_back=3)
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(list(weeks), ['2024-01-15', '2024-01-01'])
+        self.assertEqual(weeks['2024-01-15']['id'], newer_id)
+        self.assertEqual(len(weeks['2024-01-01']['transactions']), 2)
+
+        previous, statements = self.capture_selects(storage.get_previous_week_analysis, '2024-01-08')
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(previous['week_start'], '2024-01-01')
+        self.assertIsNone(storage.get_previous_week_analysis('2024-01-15'))
+
+class TestTransactionPages(StorageTestCase):
+    """
+    Testy stronicowania transakcji kluczem (date, id)
+    """
+
+    def test_pages_follow_date_and_id(self):
+        """
+        Test kolejnych stron bez powtórzeń i pominięć przy równych datach
+        """
+        first = self.make_analysis('2024-01-08', count=4)
+        second = self.make_analysis('2024-01-01', count=3)
+        for transaction in first['transactions']:
+            transaction['date'] = datetime(2024, 1, 8)
+        ids = [storage.save_analysis(first), storage.save_analysis(second)]
+        storage.save_analysis(self.make_analysis('2024-01-01', count=2))
+
+        pages = []
+        after = None
+        while True:
+            page = storage.get_transactions_page(ids, after=after, limit=3)
+            if not page:
+                break
+            pages.append([t['description'] for t in page])
+            after = (page[-1]['date'], page[-1]['id'])
+
+        self.assertEqual(pages, [['Sklep 0', 'Sklep 1', 'Sklep 2'], ['Sklep 0', 'Sklep 1', 'Sklep 2'], ['Sklep 3']])
+        self.assertEqual([t['id'] for t in storage.iter_transactions(ids, batch_size=2)],
+                         [t['id'] for page in [storage.get_transactions_page(ids, limit=100)] for t in page])
+        self.assertEqual(storage.count_transactions(ids), 7)
+        self.assertEqual(storage.get_transactions_page([]), [])
+
+class TestCategoryTotals(StorageTestCase):
+    """
+    Testy zmaterializowanych sum kategorii tygodnia
+    """
+
+    def test_save_analysis_stores_category_totals(self):
+        """
+        Test zapisu sum kategorii razem z analizą
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=5))
+
+        self.assertEqual(storage.get_category_totals([analysis_id]),
+                         {analysis_id: {'nieprzypisane': 30.0, 'jedzenie': 20.0}})
+        self.assertEqual(storage.get_analysis_history()[0]['category_totals'],
+                         {'nieprzypisane': 30.0, 'jedzenie': 20.0})
+
+    def test_manual_assignment_moves_total(self):
+        """
+        Test przeniesienia wydatku między kategoriami po ręcznym przypisaniu
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=5))
+        nieprzypisane = storage.get_nieprzypisane_transakcje()
+
+        self.assertTrue(storage.przypisz_kategorie_transakcji(nieprzypisane[0]['id'], 'chemia'))
+        self.assertEqual(storage.get_category_totals([analysis_id])[analysis_id],
+                         {'nieprzypisane': 20.0, 'jedzenie': 20.0, 'chemia': 10.0})
+
+        for transakcja in nieprzypisane[1:]:
+            storage.przypisz_kategorie_transakcji(transakcja['id'], 'chemia', fraza=transakcja['description'])
+
+        # Kategoria bez wydatków znika z sum
+        self.assertEqual(storage.get_category_totals([analysis_id])[analysis_id],
+                         {'jedzenie': 20.0, 'chemia': 30.0})
+
+    def test_manual_assignment_with_invalid_rule(self):
+        """
+        Test odrzucenia niepoprawnej reguły razem z przypisaniem kategorii
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=5))
+        transakcja = storage.get_nieprzypisane_transakcje()[0]
+
+        with self.assertRaises(storage.InvalidRuleError) as context:
+            storage.przypisz_kategorie_transakcji(transakcja['id'], 'chemia', fraza='sklep(', typ_dopasowania='regex')
+        self.assertIn('sklep(', str(context.exception))
+
+        with self.assertRaises(storage.InvalidRuleError):
+            storage.przypisz_kategorie_transakcji(transakcja['id'], 'chemia', fraza='   ')
+
+        # Nic nie zostało zapisane - ani kategoria transakcji, ani reguła
+        self.assertEqual(storage.get_category_totals([analysis_id])[analysis_id],
+                         {'nieprzypisane': 30.0, 'jedzenie': 20.0})
+        self.assertEqual(storage.wczytaj_reczne_kategorie(), [])
+        self.assertEqual(storage.get_rules_version(), 0)
+
+    def test_rebuild_after_bulk_change(self):
+        """
+        Test przeliczenia sum po zbiorczej zmianie kategorii
+        """
+        analysis_id = storage.save_analysis(self.make_analysis(count=5))
+
+        session = storage.db_manager.get_session()
+        try:
+            session.execute(update(Transakcja).values(category='inne'))
+            storage._rebuild_category_totals(session, [analysis_id])
+            session.commit()
+        finally:
+            session.close()
+
+        self.assertEqual(storage.get_category_totals([analysis_id])[analysis_id], {'inne': 50.0})
+
+    def test_previous_week_summary(self):
+        """
+        Test podsumowania poprzedniego tygodnia do porównań
+        """
+        previous_id = storage.save_analysis(self.make_analysis('2024-01-01', count=3))
+
+        summary = storage.get_previous_week_summary('2024-01-08')
+        self.assertEqual(summary['id'], previous_id)
+        self.assertEqual(summary['category_totals'], {'nieprzypisane': 20.0, 'jedzenie': 10.0})
+        self.assertNotIn('transactions', summary)
+        self.assertIsNone(storage.get_previous_week_summary('2024-01-01'))
+
+class TestManualRules(StorageTestCase):
+    """
+    Testy reguł ręcznej kategoryzacji
+    """
+
+    def test_match_type_is_saved(self):
+        """
+        Test zapisu i odczytu typu dopasowania reguły
+        """
+        self.assertTrue(storage.zapisz_reczne_kategorie('ZABKA', 'jedzenie', 'prefix'))
+        self.assertTrue(storage.zapisz_reczne_kategorie('Sklep (1)', 'inne'))
+        self.assertTrue(storage.zapisz_reczne_kategorie(r'orlen\s+kawa', 'jedzenie', 'regex'))
+
+        rules = {rule['fraza']: rule['typ_dopasowania'] for rule in storage.wczytaj_reczne_kategorie()}
+        self.assertEqual(rules, {'ZABKA': 'prefix', 'Sklep (1)': 'literal', r'orlen\s+kawa': 'regex'})
+
+        # Ponowny zapis frazy zmienia typ istniejącej reguły
+        self.assertTrue(storage.zapisz_reczne_kategorie('ZABKA', 'jedzenie', 'literal'))
+        rules = {rule['fraza']: rule['typ_dopasowania'] for rule in storage.wczytaj_reczne_kategorie()}
+        self.assertEqual(rules['ZABKA'], 'literal')
+
+    def test_invalid_rules_are_rejected(self):
+        """
+        Test odrzucenia niepoprawnego wyrażenia regularnego i nieznanego typu
+        """
+        self.assertFalse(storage.zapisz_reczne_kategorie('sklep(', 'inne', 'regex'))
+        self.assertFalse(storage.zapisz_reczne_kategorie('sklep', 'inne', 'glob'))
+        self.assertEqual(storage.wczytaj_reczne_kategorie(), [])
+
+    def test_empty_phrase_is_rejected(self):
+        """
+        Test odrzucenia pustej frazy - nie przypisuje kategorii wszystkim transakcjom
+        """
+        storage.save_analysis(self.make_analysis(count=5))
+
+        self.assertFalse(storage.zapisz_reczne_kategorie('', 'inne'))
+        self.assertIsNone(storage.przypisz_kategorie_wedlug_reguly('   ', 'inne'))
+        self.assertIsNone(storage.przypisz_kategorie_wedlug_reguly(' ', 'inne', 'prefix'))
+        self.assertEqual(len(storage.get_nieprzypisane_transakcje()), 3)
+        self.assertEqual(storage.wczytaj_reczne_kategorie(), [])
+
+    def test_saved_rule_is_applied_to_unassigned_history(self):
+        """
+        Test przypisania kategorii pasującym nieprzypisanym transakcjom z wcześniejszych analiz
+        """
+        first_id = storage.save_analysis(self.make_analysis('2024-01-01', count=5))
+        second_id = storage.save_analysis(self.make_analysis('2024-01-08', count=5))
+        clicked = next(t for t in storage.get_nieprzypisane_transakcje() if t['analiza_id'] == first_id)
+
+        # Wybrana transakcja i ta sama fraza w drugiej analizie
+        self.assertEqual(storage.przypisz_kategorie_transakcji(clicked['id'], 'chemia', fraza=clicked['description'].upper()), 2)
+        totals = storage.get_category_totals([first_id, second_id])
+        self.assertEqual(totals[first_id], {'nieprzypisane': 20.0, 'jedzenie': 20.0, 'chemia': 10.0})
+        self.assertEqual(totals[second_id], {'nieprzypisane': 20.0, 'jedzenie': 20.0, 'chemia': 10.0})
+
+        # Prefiks pasuje do wszystkich opisów, ale zmienia tylko nieprzypisane transakcje
+        self.assertEqual(storage.przypisz_kategorie_wedlug_reguly('sklep', 'inne', 'prefix'), 4)
+        self.assertEqual(storage.get_nieprzypisane_transakcje(), [])
+        self.assertEqual(storage.get_category_totals([first_id])[first_id], {'inne': 20.0, 'jedzenie': 20.0, 'chemia': 10.0})
+        self.assertEqual(storage.przypisz_kategorie_wedlug_reguly('sklep', 'inne', 'prefix'), 0)
+
+    def test_rule_matching_follows_categorizer(self):
+        """
+        Test dopasowania jak w kategoryzatorze: znaki LIKE dosłownie, polskie litery, wyrażenia regularne
+        """
+        analysis = self.make_analysis(count=5)
+        for transaction, description in zip(analysis['transactions'], ['ŻABKA Z1', 'żabka 2', 'Zabka 3', '50%_OFF', '50x OFF']):
+            transaction['category'] = 'nieprzypisane'
+            transaction['description'] = description
+        analysis_id = storage.save_analysis(analysis)
+
+        self.assertEqual(storage.przypisz_kategorie_wedlug_reguly('50%_off', 'inne'), 1)
+        self.assertEqual(storage.przypisz_kategorie_wedlug_reguly('żabka', 'jedzenie'), 2)
+        self.assertEqual(storage.przypisz_kategorie_wedlug_reguly(r'zabka \d', 'chemia', 'regex'), 1)
+        self.assertIsNone(storage.przypisz_kategorie_wedlug_reguly('zabka (', 'chemia', 'regex'))
+
+        remaining = [t['description'] for t in storage.get_nieprzypisane_transakcje()]
+        self.assertEqual(remaining, ['50x OFF'])
+        self.assertEqual(storage.get_category_totals([analysis_id])[analysis_id],
+                         {'nieprzypisane': 10.0, 'inne': 10.0, 'jedzenie': 20.0, 'chemia': 10.0})
+
+class TestMigrations(StorageTestCase):
+    """
+    Testy migracji schematu i indeksów
+    """
+
+    def query_plans(self, func, *args):
+        """
+        Wywołuje funkcję z storage.py i zwraca EXPLAIN QUERY PLAN jej zapytań SELECT
+        """
+        engine = storage.db_manager.engine
+        _, statements = self.capture_selects(func, *args)
+
+        plans = []
+        with engine.connect() as connection:
+            for statement, parameters in statements:
+                rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                plans.append(' | '.join(row[-1] for row in rows))
+        return plans
+
+    def assert_uses_indexes(self, plans):
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIsNone(re.search(r'SCAN (transakcje|analiza_tygodnia|suma_kategorii_tygodnia)(?! USING)', plan), plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_hot_queries_use_indexes(self):
+        """
+        Test planów zapytań - żadne gorące zapytanie nie przeszukuje całej tabeli
+        """
+        analysis_id = storage.save_analysis(self.make_analysis('2024-01-01'))
+        storage.save_analysis(self.make_analysis('2024-01-08'))
+
+        self.assert_uses_indexes(self.query_plans(storage.get_nieprzypisane_transakcje))
+        self.assert_uses_indexes(self.query_plans(storage.get_analysis_by_id, analysis_id))
+        self.assert_uses_indexes(self.query_plans(storage.get_previous_week_analysis, '2024-01-08'))
+        self.assert_uses_indexes(self.query_plans(storage.get_analysis_history, 5))
+        self.assert_uses_indexes(self.query_plans(storage.get_category_totals, [analysis_id]))
+        self.assert_uses_indexes(self.query_plans(storage.get_transactions_page, [analysis_id], (datetime(2024, 1, 1), 1)))
+        self.assert_uses_indexes(self.query_plans(storage.save_analysis, self.make_analysis('2024-01-15')))
+
+    def test_new_database_gets_latest_version(self):
+        """
+        Test stemplowania nowej bazy najnowszą wersją
+        """
+        with storage.db_manager.engine.connect() as connection:
+            self.assertEqual(get_schema_version(connection), LATEST_VERSION)
+
+        # Ponowne uruchomienie niczego nie zmienia
+        self.assertEqual(storage.init_db(), LATEST_VERSION)
+
+    def test_legacy_database_is_migrated(self):
+        """
+        Test migracji bazy utworzonej przez create_all bez indeksów i bez wersji
+        """
+        manager = DatabaseManager(f"sqlite:///{os.path.join(self._directory.name, 'legacy.db')}")
+        with manager.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if table.name != 'suma_kategorii_tygodnia':
+                    connection.execute(CreateTable(table))
+            connection.exec_driver_sql(
+                "INSERT INTO analiza_tygodnia (id, week_start, week_end, total_expenses, avg_daily_expense, transaction_count) "
+                "VALUES (1, '2024-01-01', '2024-01-07', 15.0, 2.0, 3)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO transakcje (analiza_id, date, description, amount, balance, category) VALUES "
+                "(1, '2024-01-01 00:00:00', 'a', -5.0, 0, 'jedzenie'), "
+                "(1, '2024-01-02 00:00:00', 'b', -10.0, 0, 'jedzenie'), "
+                "(1, '2024-01-03 00:00:00', 'c', 100.0, 0, 'inne')"
+            )
+
+        self.assertEqual(migrate(manager.engine), LATEST_VERSION)
+
+        indexes = {index['name'] for index in inspect(manager.engine).get_indexes('transakcje')}
+        self.assertIn('ix_transakcje_category_date', indexes)
+        self.assertIn('ix_transakcje_analiza_id', indexes)
+
+        # Sumy kategorii wyliczone z istniejących transakcji
+        with manager.engine.connect() as connection:
+            rows = connection.exec_driver_sql(
+                "SELECT analiza_id, week_start, category, total_expenses, transaction_count FROM suma_kategorii_tygodnia"
+            ).fetchall()
+        self.assertEqual(rows, [(1, '2024-01-01', 'jedzenie', 15.0, 2)])
+        manager.engine.dispose()
+
+    def test_fingerprints_are_backfilled(self):
+        """
+        Test migracji odcisków w bazie sprzed kolumny fingerprint z duplikatami
+        """
+        manager = DatabaseManager(f"sqlite:///{os.path.join(self._directory.name, 'legacy.db')}")
+        with manager.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                connection.execute(CreateTable(table))
+            connection.exec_driver_sql("ALTER TABLE transakcje DROP COLUMN fingerprint")
+            connection.exec_driver_sql(
+                "INSERT INTO analiza_tygodnia (id, week_start, week_end, total_expenses, avg_daily_expense, transaction_count) "
+                "VALUES (1, '2024-01-01', '2024-01-07', 10.0, 1.0, 2), (2, '2024-01-01', '2024-01-07', 5.0, 1.0, 1)"
+            )
+            # Dwie identyczne transakcje w jednym wyciągu i jedna powtórzona w drugim wyciągu
+            connection.exec_driver_sql(
+                "INSERT INTO transakcje (id, analiza_id, date, description, amount, balance, category) VALUES "
+                "(1, 1, '2024-01-01 00:00:00.000000', 'Kawa', -5.0, 0, 'jedzenie'), "
+                "(2, 1, '2024-01-01 00:00:00.000000', 'Kawa', -5.0, 0, 'jedzenie'), "
+                "(3, 2, '2024-01-01 00:00:00.000000', ' KAWA ', -5.0, 0, 'jedzenie')"
+            )
+            connection.execute(CreateTable(schema_version_table))
+            connection.execute(schema_version_table.insert().values(version=3))
+
+        self.assertEqual(migrate(manager.engine), LATEST_VERSION)
+
+        with manager.engine.connect() as connection:
+            fingerprints = connection.exec_driver_sql("SELECT id, fingerprint FROM transakcje ORDER BY id").fetchall()
+        self.assertEqual(len({fingerprint for _, fingerprint in fingerprints[:2]}), 2)
+        self.assertIsNone(fingerprints[2][1])
+
+        indexes = {index['name']: index for index in inspect(manager.engine).get_indexes('transakcje')}
+        self.assertTrue(indexes['ux_transakcje_fingerprint']['unique'])
+        manager.engine.dispose()
+
+    def test_rule_match_types_are_backfilled(self):
+        """
+        Test migracji reguł sprzed kolumny typ_dopasowania - poprawne wyrażenia regularne zostają regex
+        """
+        manager = DatabaseManager(f"sqlite:///{os.path.join(self._directory.name, 'legacy.db')}")
+        with manager.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                connection.execute(CreateTable(table))
+            connection.exec_driver_sql("ALTER TABLE reczne_kategorie DROP COLUMN typ_dopasowania")
+            connection.exec_driver_sql(
+                "INSERT INTO reczne_kategorie (id, fraza, kategoria, liczba_uzyc, data_utworzenia, data_ostatniego_uzycia) VALUES "
+                "(1, 'orlen\\s+kawa', 'jedzenie', 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00'), "
+                "(2, 'THAI WOK', 'jedzenie', 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00'), "
+                "(3, 'Sklep (1', 'inne', 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00')"
+            )
+            connection.execute(CreateTable(schema_version_table))
+            connection.execute(schema_version_table.insert().values(version=5))
+
+        self.assertEqual(migrate(manager.engine), LATEST_VERSION)
+
+        with manager.engine.connect() as connection:
+            rows = connection.exec_driver_sql("SELECT fraza, typ_dopasowania FROM reczne_kategorie ORDER BY id").fetchall()
+        self.assertEqual(rows, [('orlen\\s+kawa', 'regex'), ('THAI WOK', 'literal'), ('Sklep (1', 'literal')])
+        manager.engine.dispose()
+
+    def test_analysis_revision_is_added(self):
+        """
+        Test migracji analiz sprzed kolumny rewizja
+        """
+        manager = DatabaseManager(f"sqlite:///{os.path.join(self._directory.name, 'legacy.db')}")
+        with manager.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                connection.execute(CreateTable(table))
+            connection.exec_driver_sql("ALTER TABLE analiza_tygodnia DROP COLUMN rewizja")
+            connection.exec_driver_sql(
+                "INSERT INTO analiza_tygodnia (id, week_start, week_end, total_expenses, avg_daily_expense, transaction_count) "
+                "VALUES (1, '2024-01-01', '2024-01-07', 10.0, 1.0, 2)"
+            )
+            connection.execute(CreateTable(schema_version_table))
+            connection.execute(schema_version_table.insert().values(version=6))
+
+        self.assertEqual(migrate(manager.engine), LATEST_VERSION)
+
+        with manager.engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql("SELECT rewizja FROM analiza_tygodnia").fetchall(), [(0,)])
+        manager.engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import csv
+import io
+import unittest
+
+from app.streaming import iter_decoded_chunks, iter_lines, read_sample, sniff_dialect, spool_upload
+
+class NonSeekable(io.RawIOBase):
+    """
+    Strumień bez możliwości przewijania (np. gniazdo sieciowe)
+    """
+
+    def __init__(self, data: bytes):
+        self._buffer = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, b):
+        chunk = self._buffer.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+class TestStreaming(unittest.TestCase):
+    """
+    Testy strumieniowego wczytywania CSV
+    """
+
+    def setUp(self):
+        self.csv_text = (
+            'data;opis;kwota\n'
+            '2024-01-15;"Żabka, zakupy";-12,50\n'
+            '2024-01-16;"Opis\nw dwóch liniach";-3,00\n'
+            '2024-01-17;Orlen – paliwo;-100,00\n'
+        )
+        self.csv_bytes = self.csv_text.encode('utf-8')
+
+    def test_decoding_splits_multibyte_characters(self):
+        """
+        Test dekodowania znaków wielobajtowych przeciętych na granicy kawałka
+        """
+        chunks = list(iter_decoded_chunks(io.BytesIO(self.csv_bytes), chunk_size=3))
+        self.assertEqual(''.join(chunks), self.csv_text)
+
+    def test_rows_match_in_memory_reader(self):
+        """
+        Test zgodności wierszy z csv.DictReader na całym tekście
+        """
+        expected = list(csv.DictReader(io.StringIO(self.csv_text), delimiter=';'))
+
+        for chunk_size in (1, 2, 7, 64 * 1024):
+            lines = iter_lines(iter_decoded_chunks(io.BytesIO(self.csv_bytes), chunk_size=chunk_size))
+            rows = list(csv.DictReader(lines, delimiter=';'))
+            self.assertEqual(rows, expected)
+
+    def test_non_seekable_source(self):
+        """
+        Test buforowania źródła bez seek() i wykrywania dialektu
+        """
+        source = spool_upload(NonSeekable(self.csv_bytes), chunk_size=5)
+        dialect = sniff_dialect(read_sample(source))
+        rows = list(csv.DictReader(iter_lines(iter_decoded_chunks(source, chunk_size=5)), dialect=dialect))
+
+        self.assertEqual(dialect.delimiter, ';')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1]['opis'], 'Opis\nw dwóch liniach')
+
+        # Źródło można przewinąć, np. dla ścieżki debugowania
+        source.seek(0)
+        self.assertEqual(source.read(), self.csv_bytes)
+
+    def test_read_sample_rewinds(self):
+        """
+        Test odczytu próbki do wykrycia formatu
+        """
+        source = io.BytesIO(self.csv_bytes)
+        self.assertEqual(read_sample(source, size=10), self.csv_text[:10])
+        self.assertEqual(source.tell(), 0)
+
+    def test_invalid_utf8_raises(self):
+        """
+        Test zgłaszania błędu dekodowania tak jak bytes.decode()
+        """
+        with self.assertRaises(UnicodeDecodeError):
+            list(iter_decoded_chunks(io.BytesIO(b'data\n\xff\xfe\n')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import os
+import tempfile
+import unittest
+
+from app.categorizer import TransactionCategorizer
+from app.batch import TransactionBatch
+from app.upload_cache import UploadCache, upload_cache_key, upload_digest
+
+class TestUploadCache(unittest.TestCase):
+    """
+    Testy pamięci podręcznej wyników przetwarzania plików
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_key_depends_on_content_mapping_and_rules(self):
+        """
+        Test klucza: zawartość pliku, wybrane kolumny i reguły kategoryzacji
+        """
+        source = io.BytesIO(b'data;opis;kwota\n01.01.2024;Sklep;-1,00\n')
+        digest = upload_digest(source, chunk_size=7)
+        self.assertEqual(source.tell(), 0)
+
+        categorizer = TransactionCategorizer()
+        key = upload_cache_key(digest, None, categorizer.rules_fingerprint())
+
+        self.assertEqual(key, upload_cache_key(digest, None, TransactionCategorizer().rules_fingerprint()))
+        self.assertNotEqual(key, upload_cache_key(upload_digest(io.BytesIO(b'inny plik')), None, categorizer.rules_fingerprint()))
+        self.assertNotEqual(key, upload_cache_key(digest, {'data': 'data', 'kwota': 'kwota', 'opis': 'opis'}, categorizer.rules_fingerprint()))
+
+        categorizer.update_manual_categories([{'fraza': 'sklep', 'kategoria': 'jedzenie', 'liczba_uzyc': 1}])
+        self.assertNotEqual(key, upload_cache_key(digest, None, categorizer.rules_fingerprint()))
+
+        # Liczniki użyć nie zmieniają wyniku kategoryzacji
+        fingerprint = categorizer.rules_fingerprint()
+        categorizer.update_manual_categories([{'fraza': 'sklep', 'kategoria': 'jedzenie', 'liczba_uzyc': 5}])
+        self.assertEqual(fingerprint, categorizer.rules_fingerprint())
+
+    def test_entries_survive_on_disk(self):
+        """
+        Test odczytu wpisu z dysku przez nową instancję (np. inny proces)
+        """
+        UploadCache(self.directory).put('klucz', {'transactions': [1, 2, 3]})
+
+        cache = UploadCache(self.directory)
+        self.assertEqual(cache.get('klucz'), {'transactions': [1, 2, 3]})
+        self.assertIsNone(cache.get('inny'))
+        self.assertEqual((cache.info()['hits'], cache.info()['misses']), (1, 1))
+
+        cache.clear()
+        self.assertIsNone(UploadCache(self.directory).get('klucz'))
+
+    def test_size_bounded_eviction(self):
+        """
+        Test usuwania najdawniej używanych wpisów z pamięci i z dysku
+        """
+        value = {'data': 'x' * 1000}
+        cache = UploadCache(self.directory, memory_bytes=2500, disk_bytes=2500)
+
+        cache.put('a', value)
+        cache.put('b', value)
+        os.utime(os.path.join(self.directory, 'a.json'), (1, 1))
+        os.utime(os.path.join(self.directory, 'b.json'), (2, 2))
+        cache.put('c', value)
+
+        self.assertEqual(sorted(os.listdir(self.directory)), ['b.json', 'c.json'])
+        self.assertEqual(cache.info()['entries'], 2)
+        self.assertLessEqual(cache.info()['memory_bytes'], 2500)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), value)
+
+        # Wpis większy od limitu nie jest zapamiętywany
+        cache.put('duzy', {'data': 'x' * 5000})
+        self.assertIsNone(cache.get('duzy'))
+
+    def test_shared_directory_is_refused(self):
+        """
+        Test odrzucenia katalogu dostępnego dla innych użytkowników - wpisy tylko w pamięci
+        """
+        directory = os.path.join(self.directory, 'shared')
+        os.mkdir(directory)
+        os.chmod(directory, 0o777)
+
+        cache = UploadCache(directory)
+        self.assertFalse(cache.prepare())
+        cache.put('klucz', {'transactions': [1]})
+        self.assertEqual(os.listdir(directory), [])
+        self.assertEqual(cache.get('klucz'), {'transactions': [1]})
+
+        # Nowy katalog jest tworzony tylko dla właściciela
+        owned = UploadCache(os.path.join(self.directory, 'owned'))
+        self.assertTrue(owned.prepare())
+        self.assertEqual(os.stat(owned.directory).st_mode & 0o777, 0o700)
+
+    def test_batch_entry_is_json(self):
+        """
+        Test zapisu paczki transakcji kolumnami w JSON i jej odtworzenia
+        """
+        batch = TransactionBatch()
+        batch.append(738000, 'Sklep', -5.5, None, 'jedzenie')
+        batch.append(738001, 'Kino', -20.0, 100.0, 'rozrywka', True)
+        UploadCache(self.directory).put('klucz', {'batch': batch.to_columns()})
+
+        with open(os.path.join(self.directory, 'klucz.json'), 'rb') as f:
+            self.assertTrue(f.read().startswith(b'{'))
+        cached = UploadCache(self.directory).get('klucz')
+        self.assertEqual(TransactionBatch.from_columns(cached['batch']), batch)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from jinja2 import DictLoader, Environment
+
+from app import storage
+from app.pipeline import IngestionPipeline
+from app.rule_cache import ManualRulesCache
+from app.upload_cache import UploadCache
+from app.warmup import warm_up, warm_up_in_background
+from tests.test_storage import StorageTestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestWarmUp(StorageTestCase):
+    """
+    Testy szybkiego startu: leniwe importy i rozgrzewanie aplikacji
+    """
+
+    def test_warm_up_compiles_templates(self):
+        """
+        Test rozgrzania bazy, reguł i szablonów przed pierwszym żądaniem
+        """
+        storage.zapisz_reczne_kategorie("kino", "rozrywka")
+        environment = Environment(loader=DictLoader({'index.html': '{{ x }}', 'notes.txt': '{{ y }}'}))
+        compiled = []
+        environment.get_template = lambda name: compiled.append(name)
+
+        rules_cache = ManualRulesCache()
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = UploadCache(os.path.join(directory, 'upload-cache'))
+            with mock.patch('app.warmup.upload_cache', cache), mock.patch('app.warmup.manual_rules_cache', rules_cache):
+                timings = warm_up(environment)
+            self.assertEqual(os.stat(cache.directory).st_mode & 0o777, 0o700)
+
+        self.assertEqual(set(timings), {'database', 'categorizer', 'templates', 'upload_cache', 'dates'})
+        self.assertEqual(compiled, ['index.html'])
+
+        # Pierwszy plik dostaje rozgrzany kategoryzator z już skompilowanymi regułami
+        categorizer = rules_cache.get_categorizer()
+        self.assertIsNotNone(categorizer._matcher)
+        with mock.patch('app.pipeline.manual_rules_cache', rules_cache):
+            IngestionPipeline(persist=False).run(io.BytesIO('data;opis;kwota\n2024-01-15;Kino;-30,00\n'.encode('utf-8')))
+        self.assertEqual(categorizer.cache_info()['misses'], 1)
+
+    def test_ready_after_background_warm_up(self):
+        """
+        Test zgłoszenia gotowości dopiero po rozgrzaniu w tle i braku gotowości po błędzie
+        """
+        environment = Environment(loader=DictLoader({'index.html': '{{ x }}'}))
+        ready = []
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = UploadCache(os.path.join(directory, 'upload-cache'))
+            with mock.patch('app.warmup.upload_cache', cache):
+                warm_up_in_background(environment, on_ready=lambda: ready.append(cache.directory)).join()
+        self.assertEqual(ready, [cache.directory])
+
+        with mock.patch('app.warmup.warm_up', side_effect=RuntimeError('brak bazy')):
+            warm_up_in_background(environment, on_ready=lambda: ready.append(None)).join()
+        self.assertEqual(len(ready), 1)
+
+    def test_main_does_not_import_heavy_modules(self):
+        """
+        Test startu aplikacji bez importu pandas, NumPy i dateutil
+        """
+        code = (
+            "import sys, app.main; "
+            "print(','.join(m for m in ('pandas', 'numpy', 'dateutil') if m in sys.modules))"
+        )
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), '')
+
+if __name__ == '__main__':
+    unittest.main()